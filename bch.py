@@ -1,5 +1,9 @@
 #!/usr/bin/python
 # vim: set ts=4 sw=4 tw=0 et pm=:
+import os
+import atexit
+import pickle
+import tempfile
 from fec import stringify, listify
 
 def nndivide(poly,num): # both args as int
@@ -103,27 +107,172 @@ def repair(a,b): # "repair" two bit errors by brute force.
     return(-1,b)
 
 def nrepair(a,b): # "repair" two bit errors by brute force.
-    r=ndivide(a,b)
-    if(r==0):
-        return (0,b)
     blen=len(b)
-    bnum=int(b,2)
-    for b1 in range(len(b)):
-        bnum1=bnum^(1<<b1)
-        r=nndivide(a,bnum1)
-        if(r==0):
-            bnum1str=("{0:0%db}"%blen).format(bnum1)
-            return (1,bnum1str)
-    for b1 in range(len(b)):
-        bnum1=bnum^(1<<b1)
-        for b2 in range(b1+1,len(b)):
+    (errs,bnum)=nnrepair(a,int(b,2),blen)
+    if errs<=0:
+        return (errs,b)
+    return (errs,("{0:0%db}"%blen).format(bnum))
+
+def syndrome(poly,num,nbits): # nndivide() via per-byte remainder tables
+    tbl=syndrome_tables(poly,nbits)
+    s=0
+    for t in tbl:
+        s^=t[num&0xff]
+        num>>=8
+    if num: # wider than nbits
+        s^=nndivide(poly,num<<(8*len(tbl)))
+    return s
+
+def syndrome_tables(poly,nbits):
+    key=(poly,nbits)
+    if key not in _stables:
+        _stables[key]=[[nndivide(poly,b<<x) for b in range(256)] for x in range(0,nbits,8)]
+    return _stables[key]
+
+def error_table(poly,nbits): # syndrome -> (errs,pattern), first hit in brute force order wins
+    key=(poly,nbits)
+    if key in _etables:
+        return _etables[key]
+    if table_file is not None and _load_tables():
+        if key in _etables:
+            return _etables[key]
+    tbl={}
+    for b1 in range(nbits):
+        s=nndivide(poly,1<<b1)
+        if s not in tbl:
+            tbl[s]=(1,1<<b1)
+    for b1 in range(nbits):
+        for b2 in range(b1+1,nbits):
+            e=(1<<b1)|(1<<b2)
+            s=nndivide(poly,e)
+            if s not in tbl:
+                tbl[s]=(2,e)
+    tbl.pop(0,None)
+    _etables[key]=tbl
+    if table_file is not None:
+        _changed()
+    return tbl
+
+_stables={}
+_etables={}
+table_file=None
+_loaded=False
+_dirty=False
+
+def set_table_file(fname): # keep the error tables in fname across runs
+    global table_file,_loaded
+    table_file=fname
+    _loaded=False
+
+def _load_tables():
+    global _loaded
+    if _loaded:
+        return False
+    _loaded=True
+    try:
+        with open(table_file,"rb") as f:
+            tables=pickle.load(f)
+    except Exception: # it's only a cache
+        return False
+    if not isinstance(tables,dict):
+        return False
+    for key in tables:
+        _etables.setdefault(key,tables[key])
+    return True
+
+def _changed(): # new tables get written out once, at exit
+    global _dirty
+    if not _dirty:
+        _dirty=True
+        atexit.register(_save_tables)
+
+def _save_tables():
+    global _dirty
+    if not _dirty or table_file is None:
+        return
+    _dirty=False
+    tmp=None
+    try: # own temp file per process, --jobs workers may all get here
+        (fd,tmp)=tempfile.mkstemp(dir=os.path.dirname(table_file) or ".",prefix=os.path.basename(table_file)+".")
+        with os.fdopen(fd,"wb") as f:
+            pickle.dump(_etables,f,2)
+        os.rename(tmp,table_file)
+    except (IOError,OSError):
+        if tmp is not None and os.path.exists(tmp):
+            os.unlink(tmp)
+
+def nnrepair(poly,num,nbits): # nrepair on an int of nbits bits
+    return repair_syndrome(poly,num,nbits,syndrome(poly,num,nbits))
+
+def repair_syndrome(poly,num,nbits,s): # nnrepair with the syndrome of num already known
+    if s==0:
+        return (0,num)
+    hit=error_table(poly,nbits).get(s)
+    if hit is None:
+        return (-1,num)
+    return (hit[0],num^hit[1])
+
+def syndromes(poly,nums,nbits): # syndrome() of many ints
+    tbl=syndrome_tables(poly,nbits)
+    res=[]
+    for num in nums:
+        s=0
+        for t in tbl:
+            s^=t[num&0xff]
+            num>>=8
+        if num:
+            s^=nndivide(poly,num<<(8*len(tbl)))
+        res.append(s)
+    return res
+
+class SyndromeCache(object):
+    # Syndromes of the blocks looked at while detecting the frame type,
+    # kept for the decode steps that look at the same blocks again.
+    def __init__(self):
+        self.synd={}
+
+    def clear(self):
+        self.synd.clear()
+
+    def add(self,poly,nums,nbits): # work out the syndromes of many blocks in one go
+        for (num,s) in zip(nums,syndromes(poly,nums,nbits)):
+            self.synd[(poly,nbits,num)]=s
+
+    def syndrome(self,poly,num,nbits):
+        key=(poly,nbits,num)
+        s=self.synd.get(key)
+        if s is None:
+            s=self.synd[key]=syndrome(poly,num,nbits)
+        return s
+
+    def repair(self,poly,num,nbits): # nnrepair()
+        return repair_syndrome(poly,num,nbits,self.syndrome(poly,num,nbits))
+
+    def bch_repair(self,poly,num,nbits): # nbch_repair()
+        (errs,repaired)=self.repair(poly,num,nbits)
+        plen=poly.bit_length()-1
+        return (errs,repaired>>plen,repaired&((1<<plen)-1))
+
+def nnrepair_brute(poly,num,nbits): # reference version of nnrepair
+    if nndivide(poly,num)==0:
+        return (0,num)
+    for b1 in range(nbits):
+        bnum1=num^(1<<b1)
+        if nndivide(poly,bnum1)==0:
+            return (1,bnum1)
+    for b1 in range(nbits):
+        bnum1=num^(1<<b1)
+        for b2 in range(b1+1,nbits):
             bnum2=bnum1^(1<<b2)
-            r=nndivide(a,bnum2)
-            if(r==0):
-                bnum2str=("{0:0%db}"%blen).format(bnum2)
-                return (2,bnum2str)
-    return(-1,b)
+            if nndivide(poly,bnum2)==0:
+                return (2,bnum2)
+    return (-1,num)
 
 def bch_repair(poly,bits):
     (errs,repaired)=nrepair(poly,bits)
-    return (errs,repaired[:-poly.bit_length()+1],repaired[-poly.bit_length()+1:])
\ No newline at end of file
+    return (errs,repaired[:-poly.bit_length()+1],repaired[-poly.bit_length()+1:])
+
+def nbch_repair(poly,num,nbits): # bch_repair on an int, returns (errs,data,bchs) as ints
+    (errs,repaired)=nnrepair(poly,num,nbits)
+    plen=poly.bit_length()-1
+    return (errs,repaired>>plen,repaired&((1<<plen)-1))
@@ -0,0 +1,190 @@
+#!/usr/bin/python
+# vim: set ts=4 sw=4 tw=0 et pm=:
+
+# Bit strings packed into a python int (MSB first) plus their length.
+# Used by the parser instead of '0'/'1' text, text is only created for output.
+
+
+class BitStream(object):
+    __slots__ = ('value', 'length')
+
+    def __init__(self, value=0, length=0):
+        self.value = value
+        self.length = length
+
+    @classmethod
+    def from_str(cls, bits):
+        if not bits:
+            return cls()
+        return cls(int(bits, 2), len(bits))
+
+    def __len__(self):
+        return self.length
+
+    def __int__(self):
+        return self.value
+
+    def __str__(self):
+        if self.length == 0:
+            return ""
+        return "{0:0{1}b}".format(self.value, self.length)
+
+    def __repr__(self):  # as the '0'/'1' string it replaces, e.g. in --format lists
+        return repr(str(self))
+
+    def __eq__(self, other):
+        if not isinstance(other, BitStream):
+            return NotImplemented
+        return self.value == other.value and self.length == other.length
+
+    def __ne__(self, other):
+        if not isinstance(other, BitStream):
+            return NotImplemented
+        return self.value != other.value or self.length != other.length
+
+    def __hash__(self):
+        return hash((self.value, self.length))
+
+    def __getitem__(self, key):
+        n = self.length
+        if isinstance(key, slice):
+            start, end, step = key.indices(n)
+            if step != 1:
+                raise ValueError("BitStream slices need step 1")
+            if end <= start:
+                return BitStream()
+            return BitStream((self.value >> (n - end)) & ((1 << (end - start)) - 1), end - start)
+        if key < 0:
+            key += n
+        if key < 0 or key >= n:
+            raise IndexError("BitStream index out of range")
+        return (self.value >> (n - 1 - key)) & 1
+
+    def __add__(self, other):
+        return BitStream((self.value << other.length) | other.value, self.length + other.length)
+
+    def get(self, start, end):  # bits [start:end] as int
+        n = self.length
+        if end > n:
+            end = n
+        if end <= start:
+            return 0
+        return (self.value >> (n - end)) & ((1 << (end - start)) - 1)
+
+    def startswith(self, prefix):
+        return prefix.length <= self.length and (self.value >> (self.length - prefix.length)) == prefix.value
+
+    def count(self):  # number of set bits
+        return bin(self.value).count('1')
+
+    def reverse(self):
+        if self.length == 8:
+            return BitStream(REV8[self.value], 8)
+        return BitStream.from_str(str(self)[::-1])
+
+    def chunks(self, n):  # like slice(): all n-bit pieces, last one may be shorter
+        return [self[x:x + n] for x in range(0, self.length, n)]
+
+    def tobytes(self):  # the 8-bit pieces of chunks(8) as bytes
+        full = self.length // 8
+        rest = self.length - full * 8
+        b = (self.value >> rest).to_bytes(full, 'big')
+        if rest:
+            b += bytes([self.value & ((1 << rest) - 1)])
+        return b
+
+    def chunks_extra(self, n):  # like slice_extra(): full n-bit pieces and the rest
+        full = self.length // n
+        blocks = [self[x * n:x * n + n] for x in range(full)]
+        return (blocks, self[full * n:])
+
+
+REV8 = [int("{0:08b}".format(x)[::-1], 2) for x in range(256)]
+
+
+def symbol_swap(bits):  # swap each pair of bits, drops an odd trailing bit
+    n = bits.length & ~1
+    v = bits.value >> (bits.length - n)
+    lo = ((1 << n) - 1) // 3  # 0b0101...01
+    return BitStream(((v & lo) << 1) | ((v >> 1) & lo), n)
+
+
+def concat(parts):
+    value = 0
+    length = 0
+    for p in parts:
+        value = (value << p.length) | p.value
+        length += p.length
+    return BitStream(value, length)
+
+
+class Permutation(object):
+    # Reorders the bits of a fixed length int. order[i] is the (MSB first)
+    # input bit that ends up at output position i. Applied with one table
+    # lookup per input byte.
+    def __init__(self, order):
+        self.order = order
+        self.length = n = len(order)
+        dest = [0] * n
+        for i, src in enumerate(order):
+            dest[src] = i
+        self.tables = []
+        for shift in range(0, n, 8):
+            width = min(8, n - shift)
+            tbl = [0] * (1 << width)
+            for byte in range(1 << width):
+                out = 0
+                for b in range(width):
+                    if (byte >> b) & 1:
+                        out |= 1 << (n - 1 - dest[n - 1 - (shift + b)])
+                tbl[byte] = out
+            self.tables.append((shift, (1 << width) - 1, tbl))
+
+    def apply(self, value):
+        out = 0
+        for shift, mask, tbl in self.tables:
+            out |= tbl[(value >> shift) & mask]
+        return out
+
+    def split(self, bits, lengths):  # permute and cut into pieces of the given lengths
+        v = self.apply(bits.value)
+        res = []
+        rest = self.length
+        for l in lengths:
+            rest -= l
+            res.append(BitStream((v >> rest) & ((1 << l) - 1), l))
+        return res
+
+    def apply_matrix(self, m):  # permute the columns of a bit matrix (one value per row)
+        return m[:, self.order]
+
+    def split_batch(self, values, lengths):  # split() of many int values at once, needs numpy
+        m = self.apply_matrix(bit_matrix(values, self.length))
+        cols = []
+        pos = 0
+        for l in lengths:
+            cols.append(matrix_values(m[:, pos:pos + l]))
+            pos += l
+        return [[BitStream(v, l) for (v, l) in zip(row, lengths)] for row in zip(*cols)]
+
+
+def bit_matrix(values, n):  # uint8 matrix of 0/1, row i holds the n bits of values[i] MSB first
+    import numpy as np
+    nbytes = (n + 7) // 8
+    pad = nbytes * 8 - n
+    buf = b"".join([(v << pad).to_bytes(nbytes, 'big') for v in values])
+    m = np.frombuffer(buf, dtype=np.uint8).reshape(len(values), nbytes)
+    return np.unpackbits(m, axis=1)[:, :n]
+
+
+def matrix_values(m):  # the rows of a bit matrix as ints, inverse of bit_matrix()
+    import numpy as np
+    n = m.shape[1]
+    if n == 0:
+        return [0] * m.shape[0]
+    if n <= 64:
+        weights = np.left_shift(np.uint64(1), np.arange(n - 1, -1, -1, dtype=np.uint64))
+        return m.astype(np.uint64).dot(weights).tolist()
+    pad = (-n) % 8
+    packed = np.packbits(m, axis=1)
+    return [int.from_bytes(row.tobytes(), 'big') >> pad for row in packed]
@@ -4,29 +4,63 @@
 import re
 import datetime
 import fileinput
+import functools
 
 
-def extract_timestamp(filename, dt):
-    mm = re.match("i-(\d+(?:\.\d+)?)-[vbsrtl]1.([a-z])([a-z])", filename)
+line_re = re.compile(r'(RAW|RWA): ([^ ]*) ([\d.]+) (\d+) A:(\w+) [IL]:(\w+) +(\d+)% ([\d.]+|inf|nan) +(\d+) ([\[\]<> 01]+)(.*)')
+
+
+def _isnum(s):
+    return s.replace('.', '', 1).isdigit()
+
+
+def tokenize_line(line):
+    # Fields of a "RAW:" line, the same as line_re.match(line).groups().
+    # Well-formed lines are split directly, anything odd goes through the regex.
+    p = line.split(None, 9)
+    if (len(p) == 10 and p[0] in ('RAW:', 'RWA:') and line.isascii() and not p[9].strip('01')
+            and _isnum(p[2]) and p[3].isdigit() and p[4][:2] == 'A:' and p[4][2:].isalnum()
+            and p[5][:2] in ('I:', 'L:') and p[5][2:].isalnum() and p[6][-1:] == '%' and p[6][:-1].isdigit()
+            and (_isnum(p[7]) or p[7] in ('inf', 'nan')) and p[8].isdigit()):
+        prefix = ' '.join(p[:6])
+        tail = ' ' + p[8] + ' ' + p[9]
+        if line.startswith(prefix) and line.endswith(tail) and \
+                line[len(prefix):len(line) - len(tail)].strip(' ') == p[6] + ' ' + p[7]:
+            return (p[0][:3], p[1], p[2], p[3], p[4][2:], p[5][2:], p[6][:-1], p[7], p[8], p[9], '')
+    m = line_re.match(line)
+    if not m:
+        return None
+    return m.groups()
+
+
+@functools.lru_cache(maxsize=64)
+def filename_start(filename):  # (start time, b26) of a recording by its name, None if it has none
+    mm = re.match(r"i-(\d+(?:\.\d+)?)-[vbsrtl]1.([a-z])([a-z])", filename)
     if mm:
         b26 = (ord(mm.group(2)) - ord('a')) * 26 + ord(mm.group(3)) - ord('a')
-        timestamp = float(mm.group(1)) + float(dt) / 1000 + b26 * 600
-        return timestamp
+        return (float(mm.group(1)), b26)
 
-    mm = re.match("i-(\d+(?:\.\d+)?)-[vbsrtl]1(?:-o[+-]\d+)?$", filename)
+    mm = re.match(r"i-(\d+(?:\.\d+)?)-[vbsrtl]1(?:-o[+-]\d+)?$", filename)
     if mm:
-        timestamp = float(mm.group(1)) + float(dt) / 1000
-        return timestamp
+        return (float(mm.group(1)), None)
 
-    mm = re.match("(\d\d)-(\d\d)-(20\d\d)T(\d\d)-(\d\d)-(\d\d)-[sr]1", filename)
+    mm = re.match(r"(\d\d)-(\d\d)-(20\d\d)T(\d\d)-(\d\d)-(\d\d)-[sr]1", filename)
     if mm:
         month, day, year, hour, minute, second = map(int, mm.groups())
         timestamp = datetime.datetime(year, month, day, hour, minute, second)
-        timestamp = (timestamp - datetime.datetime(1970, 1, 1)).total_seconds()
-        timestamp += float(dt) / 1000
-        return timestamp
+        return ((timestamp - datetime.datetime(1970, 1, 1)).total_seconds(), None)
+
+    return None
 
-    return 0
+
+def extract_timestamp(filename, dt):
+    start = filename_start(filename)
+    if start is None:
+        return 0
+    timestamp = start[0] + float(dt) / 1000
+    if start[1] is not None:
+        timestamp += start[1] * 600
+    return timestamp
 
 
 def parse_line_to_message(line):
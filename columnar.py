@@ -0,0 +1,189 @@
+#!/usr/bin/python
+# vim: set ts=4 sw=4 tw=0 et pm=:
+
+# Columnar storage for parsed frames, written by "iridium-parser.py -o columnar".
+#
+# A store is a directory with one .npy file per message class, column and
+# chunk (<class>.<column>.<chunk>.npy) plus meta.json describing them.
+# Readers only open the columns they ask for, memory-mapped chunk by chunk.
+#
+#   r = columnar.ColumnarReader("parsed.col")
+#   for ra in r.chunks("IridiumRAMessage", ["globaltime", "ra_sat", "ra_lat", "ra_lon"]):
+#       print(ra["ra_lat"].mean())
+#
+# load() returns the whole class as one array per column. That is only
+# memory-mapped if the class fits into one chunk (chunk_rows, 65536 rows by
+# default), otherwise the chunks are copied into memory.
+
+from __future__ import print_function
+import os
+import json
+import numpy as np
+
+VERSION = 1
+
+common_columns = [
+    ('globaltime', 'f8'),
+    ('frequency', 'i8'),
+    ('confidence', 'i2'),
+    ('level', 'f8'),
+    ('uplink', 'i1'),
+    ('lineno', 'i8'),
+]
+
+type_columns = {
+    'IridiumRAMessage': [
+        ('ra_sat', 'i2'), ('ra_cell', 'i2'),
+        ('ra_pos_x', 'i4'), ('ra_pos_y', 'i4'), ('ra_pos_z', 'i4'),
+        ('ra_lat', 'f8'), ('ra_lon', 'f8'), ('ra_alt', 'f8'),
+        ('ra_int', 'i2'), ('ra_ts', 'i1'), ('ra_eip', 'i1'), ('ra_bc_sb', 'i2'),
+        ('page_len', 'i2'),
+    ],
+    'IridiumBCMessage': [
+        ('bc_type', 'i2'), ('sv_id', 'i2'), ('beam_id', 'i2'), ('slot', 'i1'), ('sv_blocking', 'i1'),
+        ('type', 'i2'), ('iri_time', 'i8'), ('iri_time_ux', 'f8'), ('iri_time_diff', 'f8'),
+    ],
+    'IridiumLCWMessage': [
+        ('da_ctr', 'i1'), ('da_len', 'i1'), ('crc_ok', '?'),
+        ('data', 'u1', (20,)),
+    ],
+}
+
+
+def column_spec(name):  # [(column, dtype[, shape])] stored for a message class
+    return common_columns + type_columns.get(name, [])
+
+
+def _missing(col):  # value for fields a frame does not have
+    kind = np.dtype(col[1]).kind
+    if len(col) > 2:
+        return [0] * col[2][0]
+    if kind == 'f':
+        return float('nan')
+    if kind == 'b':
+        return False
+    return -1
+
+
+def frame_row(q):  # (class name, row tuple) of a parsed message
+    name = type(q).__name__
+    row = []
+    d = q.__dict__
+    for col in column_spec(name):
+        v = d.get(col[0])
+        if v is None:
+            v = _missing(col)
+        elif len(col) > 2:
+            v = list(v[:col[2][0]]) + [0] * (col[2][0] - len(v))
+        row.append(v)
+    return (name, tuple(row))
+
+
+class RowCollector(object):
+    # Collects rows without writing them, e.g. in --jobs workers
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, q):
+        (name, row) = frame_row(q)
+        self.add_row(name, row)
+
+    def add_row(self, name, row):
+        if name not in self.rows:
+            self.rows[name] = []
+        self.rows[name].append(row)
+
+
+class ColumnarWriter(RowCollector):
+    def __init__(self, path, chunk_rows=1 << 16):
+        super(ColumnarWriter, self).__init__()
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.chunks = {}
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def add_row(self, name, row):
+        super(ColumnarWriter, self).add_row(name, row)
+        if len(self.rows[name]) >= self.chunk_rows:
+            self._flush(name)
+
+    def add_rows(self, rows):  # rows as collected by a RowCollector
+        for name in rows:
+            for row in rows[name]:
+                self.add_row(name, row)
+
+    def _flush(self, name):
+        rows = self.rows.pop(name, None)
+        if not rows:
+            return
+        cols = column_spec(name)
+        arr = np.array(rows, dtype=[tuple(c) for c in cols])
+        chunks = self.chunks.setdefault(name, [])
+        for col in cols:
+            np.save(os.path.join(self.path, "%s.%s.%d.npy" % (name, col[0], len(chunks))),
+                    np.ascontiguousarray(arr[col[0]]))
+        chunks.append(len(rows))
+
+    def close(self):
+        for name in list(self.rows):
+            self._flush(name)
+        meta = {'version': VERSION, 'types': {}}
+        for name in self.chunks:
+            meta['types'][name] = {
+                'columns': [[c[0], c[1]] + ([list(c[2])] if len(c) > 2 else []) for c in column_spec(name)],
+                'chunks': self.chunks[name],
+            }
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=1, sort_keys=True)
+
+
+class ColumnarReader(object):
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != VERSION:
+            raise ValueError("%s: unsupported columnar version %s" % (path, self.meta.get('version')))
+
+    def types(self):
+        return sorted(self.meta['types'])
+
+    def columns(self, name):
+        return [c[0] for c in self.meta['types'][name]['columns']]
+
+    def rows(self, name):
+        if name not in self.meta['types']:
+            return 0
+        return sum(self.meta['types'][name]['chunks'])
+
+    def chunks(self, name, columns=None, mmap=True):  # yields {column: memory-mapped array} per chunk
+        if name not in self.meta['types']:
+            return
+        if columns is None:
+            columns = self.columns(name)
+        for n in range(len(self.meta['types'][name]['chunks'])):
+            yield dict((c, self._array(name, c, n, mmap)) for c in columns)
+
+    def load(self, name, columns=None, mmap=True):
+        # {column: array} of all chunks, copied into memory if there are
+        # several of them; use chunks() on large stores
+        if columns is None:
+            columns = self.columns(name) if name in self.meta['types'] else []
+        parts = list(self.chunks(name, columns, mmap))
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            known = dict((c[0], c) for c in column_spec(name))
+            return dict((c, np.zeros(0, dtype=_dtype(known[c]))) for c in columns)
+        return dict((c, np.concatenate([p[c] for p in parts])) for c in columns)
+
+    def _array(self, name, column, n, mmap):
+        fname = os.path.join(self.path, "%s.%s.%d.npy" % (name, column, n))
+        return np.load(fname, mmap_mode='r' if mmap else None)
+
+
+def _dtype(col):
+    if len(col) > 2:
+        return (col[1], col[2])
+    return col[1]
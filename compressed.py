@@ -0,0 +1,139 @@
+#!/usr/bin/python
+# vim: set ts=4 sw=4 tw=0 et pm=:
+
+# Transparent gzip/xz/bz2 files for the parser and the reassembler.
+#
+# Input is recognised by its magic bytes, not by the file name, and is
+# decompressed on a thread a few MB ahead of the reader, so decompression
+# and parsing overlap. Output is compressed if the name ends in
+# .gz/.xz/.bz2.
+
+import io
+import sys
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+BUFSIZE = 1 << 20
+py3 = sys.version_info[0] >= 3  # python2 scripts read and write str, i.e. bytes
+
+magics = [
+    (b"\x1f\x8b", "gz"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"BZh", "bz2"),
+]
+
+
+def kind(head):  # "gz", "xz", "bz2" or None for the first bytes of a file
+    for (magic, k) in magics:
+        if head.startswith(magic):
+            return k
+    return None
+
+
+def is_compressed(fname):
+    try:
+        with open(fname, "rb") as f:
+            return kind(f.read(6)) is not None
+    except IOError:
+        return False
+
+
+def _decompressor(k, f):
+    if k == "gz":
+        import gzip
+        return gzip.GzipFile(fileobj=f, mode="rb")
+    if k == "xz":
+        import lzma
+        return lzma.LZMAFile(f, "rb")
+    import bz2
+    return bz2.BZ2File(f, "rb")
+
+
+class ThreadedReader(io.RawIOBase):
+    # Reads src on a thread, up to depth chunks ahead
+    def __init__(self, src, chunk=BUFSIZE, depth=4):
+        self.src = src
+        self.queue = queue.Queue(depth)
+        self.buf = memoryview(b"")
+        self.eof = False
+        self.thread = threading.Thread(target=self._run, args=(chunk,))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self, chunk):
+        try:
+            while True:
+                b = self.src.read(chunk)
+                self.queue.put(b)
+                if not b:
+                    break
+        except Exception as e:
+            self.queue.put(e)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if not self.buf:
+            if self.eof:
+                return 0
+            data = self.queue.get()
+            if isinstance(data, Exception):
+                raise data
+            if not data:
+                self.eof = True
+                return 0
+            self.buf = memoryview(data)
+        n = min(len(b), len(self.buf))
+        b[:n] = self.buf[:n]
+        self.buf = self.buf[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self.src.close()
+        super(ThreadedReader, self).close()
+
+
+def open_input(fname, mode="r", encoding=None, errors=None):
+    # open() for reading that decompresses gz/xz/bz2 files, "-" is stdin
+    text = "b" not in mode and py3
+    if fname == "-":
+        f = sys.stdin.buffer
+    else:
+        f = io.open(fname, "rb", BUFSIZE)
+    k = kind(f.peek(6)[:6])
+    if k is None and fname == "-" and text:
+        return sys.stdin  # keeps its line buffering for pipes
+    if k is not None:
+        f = io.BufferedReader(ThreadedReader(_decompressor(k, f)), BUFSIZE)
+    if not text:
+        return f
+    return io.TextIOWrapper(f, encoding=encoding, errors=errors)
+
+
+def hook(fname, mode, encoding=None, errors=None):  # openhook for fileinput.input()
+    return open_input(fname, mode, encoding, errors)
+
+
+def open_output(fname, mode="w"):
+    # open() for writing, compressed if fname ends in .gz, .xz or .bz2
+    text = "b" not in mode and py3
+    if fname.endswith(".gz"):
+        import gzip
+        f = gzip.open(fname, "wb")
+    elif fname.endswith(".xz"):
+        import lzma
+        f = lzma.open(fname, "wb")
+    elif fname.endswith(".bz2"):
+        import bz2
+        f = bz2.open(fname, "wb")
+    else:
+        return open(fname, mode)
+    f = io.BufferedWriter(f, BUFSIZE)
+    if text:
+        return io.TextIOWrapper(f)
+    return f
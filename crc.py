@@ -0,0 +1,109 @@
+#!/usr/bin/python
+# vim: set ts=4 sw=4 tw=0 et pm=:
+
+# Table driven CRCs on bytes/bytearray/memoryview input.
+#
+# Each Crc keeps "slicing" tables: table[k][v] is the register after
+# feeding byte v followed by k zero bytes, so a whole word of input is
+# folded into the register with one lookup per byte and no shifting in
+# between. Results are the same as the crcmod functions they replace.
+
+
+class Crc(object):
+    slices = 8  # bytes per table step, registers up to 64 bits
+
+    def __init__(self, width, poly, init, reflect, xorout):
+        # poly without the x^width term, init is the register value before the first byte
+        self.width = width
+        self.mask = (1 << width) - 1
+        self.init = init
+        self.reflect = reflect
+        self.xorout = xorout
+        self.table = self._table(poly)
+        tables = [self.table]
+        for k in range(1, self.slices):
+            tables.append([self._byte(r, 0) for r in tables[-1]])
+        # in the order the bytes of a word are taken off its low end
+        if reflect:
+            self.tables = tables[::-1]
+        else:
+            self.tables = tables
+
+    def _table(self, poly):
+        tbl = []
+        for v in range(256):
+            if self.reflect:
+                rpoly = int("{0:0{1}b}".format(poly, self.width)[::-1], 2)
+                r = v
+                for _ in range(8):
+                    r = (r >> 1) ^ rpoly if r & 1 else r >> 1
+            else:
+                r = v << (self.width - 8)
+                for _ in range(8):
+                    r = ((r << 1) ^ poly) & self.mask if r & (1 << (self.width - 1)) else (r << 1) & self.mask
+            tbl.append(r)
+        return tbl
+
+    def _byte(self, crc, b):  # feed one byte
+        t = self.table
+        if self.reflect:
+            return t[(crc ^ b) & 0xff] ^ (crc >> 8)
+        return t[((crc >> (self.width - 8)) ^ b) & 0xff] ^ ((crc << 8) & self.mask)
+
+    def __call__(self, data):
+        return self.update(self.init, data) ^ self.xorout
+
+    def update(self, crc, data):  # register after feeding data, without the final xor
+        if not isinstance(data, (bytes, bytearray)):
+            data = bytes(data)
+        end = len(data) & ~7
+        (t0, t1, t2, t3, t4, t5, t6, t7) = self.tables
+        if self.reflect:
+            for i in range(0, end, 8):
+                x = crc ^ int.from_bytes(data[i:i + 8], 'little')
+                crc = (t0[x & 0xff] ^ t1[(x >> 8) & 0xff] ^ t2[(x >> 16) & 0xff] ^ t3[(x >> 24) & 0xff] ^
+                       t4[(x >> 32) & 0xff] ^ t5[(x >> 40) & 0xff] ^ t6[(x >> 48) & 0xff] ^ t7[x >> 56])
+            t = self.table
+            for b in data[end:]:
+                crc = t[(crc ^ b) & 0xff] ^ (crc >> 8)
+        else:
+            shift = 64 - self.width
+            for i in range(0, end, 8):
+                x = (crc << shift) ^ int.from_bytes(data[i:i + 8], 'big')
+                crc = (t0[x & 0xff] ^ t1[(x >> 8) & 0xff] ^ t2[(x >> 16) & 0xff] ^ t3[(x >> 24) & 0xff] ^
+                       t4[(x >> 32) & 0xff] ^ t5[(x >> 40) & 0xff] ^ t6[(x >> 48) & 0xff] ^ t7[x >> 56])
+            t = self.table
+            top = self.width - 8
+            mask = self.mask
+            for b in data[end:]:
+                crc = t[((crc >> top) ^ b) & 0xff] ^ ((crc << 8) & mask)
+        return crc
+
+    def batch(self, payloads):
+        # CRC of many payloads, payloads of the same length are done
+        # together one byte column at a time with numpy
+        import numpy as np
+        payloads = [p if isinstance(p, (bytes, bytearray)) else bytes(p) for p in payloads]
+        res = [None] * len(payloads)
+        bylen = {}
+        for i in range(len(payloads)):
+            bylen.setdefault(len(payloads[i]), []).append(i)
+        table = np.array(self.table, dtype=np.uint64)
+        top = np.uint64(self.width - 8)
+        mask = np.uint64(self.mask)
+        eight = np.uint64(8)
+        for (n, idx) in bylen.items():
+            m = np.frombuffer(b"".join([payloads[i] for i in idx]), dtype=np.uint8).reshape(len(idx), n)
+            crc = np.full(len(idx), self.init, dtype=np.uint64)
+            for col in m.T.astype(np.uint64):
+                if self.reflect:
+                    crc = table[(crc ^ col) & np.uint64(0xff)] ^ (crc >> eight)
+                else:
+                    crc = table[((crc >> top) ^ col) & np.uint64(0xff)] ^ ((crc << eight) & mask)
+            for (i, v) in zip(idx, (crc ^ np.uint64(self.xorout)).tolist()):
+                res[i] = v
+        return res
+
+
+iip_crc24 = Crc(24, 0xBBA1B5, 0xffffff, True, 0x0c91b6)
+ida_crc16 = Crc(16, 0x1021, 0xffff, False, 0)  # crc-ccitt-false
@@ -0,0 +1,442 @@
+#!/usr/bin/python
+# vim: set ts=4 sw=4 tw=0 et pm=:
+
+# Frame store for parsed messages, written by "iridium-parser.py -o store"
+# and replayed with "-i store" without decoding the frames again.
+#
+# <name>:     header (magic, version), then one record per frame:
+#             uint32 length, class number and globaltime, the fields of
+#             that class that are set (bitmap) and their values
+# <name>.idx: header (magic, version, class names), then one entry per
+#             record: globaltime, offset, length, class number
+#
+# The fields of each class are listed in SCHEMA below, values are packed
+# with struct according to their type code. On replay the messages are
+# rebuilt from these fields, nothing else is stored.
+#
+# The index allows selecting frames by time range and class without
+# reading the whole store. If it is missing it is rebuilt from the records.
+
+from __future__ import print_function
+import os
+import struct
+import bisect
+from bitstream import BitStream
+
+VERSION = 2
+MAGIC = b"IRFS"
+IDX_MAGIC = b"IRFI"
+
+header = struct.Struct("<4sH")
+reclen = struct.Struct("<I")
+entry = struct.Struct("<dQIH")
+rechead = struct.Struct("<Bd")  # class number, globaltime (NaN if unset)
+
+# Type codes:
+#   ? bool  i int32  q int64  d float  s str  b BitStream  y bytearray
+#   l list of ints  S list of str  v any of these, None, list or dict
+FIELDS = {  # class: (parent class, fields the decoder of that class sets)
+    'Message': (None, [
+        ('parse_error', '?'), ('error', '?'), ('error_msg', 'S'), ('lineno', 'q'), ('line', 's'),
+        ('swapped', '?'), ('filename', 's'), ('timestamp', 'd'), ('frequency', 'q'), ('fchan', 'i'),
+        ('foff', 'd'), ('freq_print', 's'), ('confidence', 'i'), ('level', 'd'), ('bitstream_raw', 'b'),
+        ('symbols', 'd'), ('extra_data', 's'), ('b26', 'i'), ('uplink', 'i'), ('ec_uw', 'i'), ('satno', 'i'),
+    ]),
+    'IridiumMessage': ('Message', [
+        ('msgtype', 's'), ('header', 'v'), ('descrambled', 'v'), ('descramble_extra', 'v'),
+        ('lead_out_ok', '?'), ('ft', 'i'), ('ec_lcw', 'i'), ('lcw1', 'b'), ('lcw2', 'b'), ('lcw3', 'b'),
+        ('lcw_code', 'i'), ('lcw_ft', 'i'), ('bc_type', 'i'), ('sync', 'l'), ('payload6', 'l'),
+        ('payload8', 'l'), ('payload_6', 'l'), ('payload_f', 'l'), ('payload_r', 'l'),
+    ]),
+    'IridiumSYMessage': ('IridiumMessage', []),
+    'IridiumSTLMessage': ('IridiumMessage', []),
+    'IridiumLCW3Message': ('IridiumMessage', [
+        ('utype', 's'), ('csum', 'i'), ('fixederrs', 'i'), ('oddbyte', 'i'), ('rs6', '?'), ('rs6p', '?'),
+        ('rs6c', 'y'), ('rs6m', 'y'), ('rs8', '?'), ('rs8p', '?'), ('rs8c', 'y'), ('rs8m', 'y'),
+    ]),
+    'IridiumVOMessage': ('IridiumMessage', [
+        ('vtype', 's'), ('crcval', 'q'), ('vdata', 'l'), ('rs6', '?'), ('rs6p', '?'), ('rs6c', 'y'),
+        ('rs6m', 'y'),
+    ]),
+    'IridiumIPMessage': ('IridiumMessage', [
+        ('itype', 's'), ('crcval', 'q'), ('idata', 'y'), ('iiqcsum', 'i'), ('ip_hdr', 'i'), ('ip_seq', 'i'),
+        ('ip_ack', 'i'), ('ip_cs', 'i'), ('ip_cs_ok', 'i'), ('ip_len', 'i'), ('ip_data', 'l'),
+        ('ip_cksum', 'q'), ('oddbyte', 'i'),
+    ]),
+    'IridiumECCMessage': ('IridiumMessage', [
+        ('bitstream_bch', 'b'), ('bitstream_messaging', 'b'), ('fixederrs', 'i'), ('oddbits', 'b'),
+        ('poly', 'i'),
+    ]),
+    'IridiumLCWMessage': ('IridiumECCMessage', [
+        ('flags1', 'b'), ('flag1b', 'b'), ('flags2', 'b'), ('flags3', 'i'), ('zero1', 'v'), ('zero2', 'i'),
+        ('da_ctr', 'i'), ('da_len', 'i'), ('da_crc', 'i'), ('da_ta', 'l'), ('data', 'l'), ('the_crc', 'i'),
+        ('crc_ok', '?'),
+    ]),
+    'IridiumBCMessage': ('IridiumECCMessage', [
+        ('sv_id', 'i'), ('beam_id', 'i'), ('unknown01', 'b'), ('slot', 'i'), ('sv_blocking', 'i'),
+        ('acqu_classes', 'b'), ('acqu_subband', 'i'), ('acqu_channels', 'i'), ('unknown02', 'b'),
+        ('type', 'i'), ('unknown11', 'b'), ('max_uplink_pwr', 'i'), ('unknown21', 'b'), ('unknown31', 'b'),
+        ('tmsi_expiry', 'q'), ('tmsi_expiry_ux', 'd'), ('iri_time', 'q'), ('iri_time_ux', 'd'),
+        ('iri_time_diff', 'd'), ('iri_time_str', 's'), ('readable', 's'), ('trailer', 's'),
+    ]),
+    'IridiumRAMessage': ('IridiumECCMessage', [
+        ('ra_sat', 'i'), ('ra_cell', 'i'), ('ra_pos_x', 'i'), ('ra_pos_y', 'i'), ('ra_pos_z', 'i'),
+        ('ra_lat', 'd'), ('ra_lon', 'd'), ('ra_alt', 'd'), ('ra_int', 'i'), ('ra_ts', 'i'), ('ra_eip', 'i'),
+        ('ra_bc_sb', 'i'), ('ra_msg', '?'), ('ra_extra', 'b'), ('page_len', 'v'), ('paging', 'v'),
+    ]),
+    'IridiumMSMessage': ('IridiumECCMessage', [
+        ('group', 'v'), ('agroup', 'i'), ('tdiff', 'i'), ('frame', 'i'), ('bch_blocks', 'i'),
+        ('secondary', 'i'), ('unknown1', 'i'), ('ctr1', 'i'), ('block', 'i'), ('zero1', 'v'),
+        ('msg_pre', 'b'), ('msg_ric', 'i'), ('msg_format', 'i'), ('msg_data', 'b'), ('msg_trailer', 'b'),
+    ]),
+    'IridiumMessagingAscii': ('IridiumMSMessage', [
+        ('msg_seq', 'i'), ('msg_zero1', 'i'), ('msg_unknown1', 'b'), ('msg_msgdata', 'b'), ('msg_len_bit', 'i'),
+        ('msg_len_field_len', 'i'), ('msg_len', 'i'), ('msg_ctr', 'i'), ('msg_ctr_max', 'i'),
+        ('msg_zero2', 'i'), ('msg_checksum', 'i'), ('msg_rest', 'b'), ('msg_ascii', 's'),
+    ]),
+    'IridiumMessagingUnknown': ('IridiumMSMessage', [
+        ('msg_seq', 'i'), ('msg_zero1', 'i'), ('msg_unknown1', 'b'), ('msg_unknown2', 'b'), ('msg_msgdata', 'b'),
+    ]),
+}
+
+# class numbers in the records, only append to keep old stores readable
+CLASSES = ('Message', 'IridiumMessage', 'IridiumSYMessage', 'IridiumSTLMessage', 'IridiumLCW3Message',
+           'IridiumVOMessage', 'IridiumIPMessage', 'IridiumECCMessage', 'IridiumLCWMessage', 'IridiumBCMessage',
+           'IridiumRAMessage', 'IridiumMSMessage', 'IridiumMessagingAscii', 'IridiumMessagingUnknown')
+
+
+def _schema(name):
+    # A decoder that fails part way leaves its fields on the message it
+    # was upgrading, so a class also gets the fields of its subclasses.
+    # Own and inherited fields come first, they are the ones usually set.
+    chain = []
+    c = name
+    while c is not None:
+        chain.insert(0, c)
+        c = FIELDS[c][0]
+    below = [c for c in CLASSES if c not in chain and name in _ancestors(c)]
+    fields = []
+    codes = {}
+    for c in chain + below:
+        for (f, code) in FIELDS[c][1]:
+            if f not in codes:
+                codes[f] = code
+                fields.append((f, code))
+    return fields
+
+
+def _ancestors(name):
+    res = []
+    while FIELDS[name][0] is not None:
+        name = FIELDS[name][0]
+        res.append(name)
+    return res
+
+
+SCHEMA = dict((name, _schema(name)) for name in CLASSES)
+TAGS = dict((CLASSES[i], i) for i in range(len(CLASSES)))
+
+fixed = dict((c, struct.Struct("<" + c)) for c in "?iqd")
+u16 = struct.Struct("<H")
+u32 = struct.Struct("<I")
+intlist = struct.Struct("<HB")  # count, element size
+
+
+def _put(out, code, v):
+    if code in fixed:
+        out.append(fixed[code].pack(v))
+    elif code == 's':
+        b = v.encode("utf-8")
+        out.append(u16.pack(len(b)) + b)
+    elif code == 'b':
+        out.append(u32.pack(v.length) + v.value.to_bytes((v.length + 7) // 8, 'big'))
+    elif code == 'y':
+        out.append(u16.pack(len(v)) + bytes(v))
+    elif code == 'l':
+        c = 'B' if all(0 <= x < 256 for x in v) else 'q'
+        out.append(intlist.pack(len(v), struct.calcsize(c)) + struct.pack("<%d%s" % (len(v), c), *v))
+    elif code == 'S':
+        out.append(u16.pack(len(v)))
+        for s in v:
+            _put(out, 's', s)
+    elif code == 'v':
+        _put_any(out, v)
+    else:
+        raise ValueError("unknown type code %r" % code)
+
+
+def _put_any(out, v):
+    if v is None:
+        out.append(b"N")
+    elif isinstance(v, bool):
+        out.append(b"?" + fixed['?'].pack(v))
+    elif isinstance(v, int):
+        out.append(b"q" + fixed['q'].pack(v))
+    elif isinstance(v, float):
+        out.append(b"d" + fixed['d'].pack(v))
+    elif isinstance(v, str):
+        out.append(b"s")
+        _put(out, 's', v)
+    elif isinstance(v, BitStream):
+        out.append(b"b")
+        _put(out, 'b', v)
+    elif isinstance(v, (bytes, bytearray)):
+        out.append(b"y")
+        _put(out, 'y', v)
+    elif isinstance(v, list):
+        out.append(b"L" + u16.pack(len(v)))
+        for x in v:
+            _put_any(out, x)
+    elif isinstance(v, dict):
+        out.append(b"M" + u16.pack(len(v)))
+        for (k, x) in v.items():
+            _put(out, 's', k)
+            _put_any(out, x)
+    else:
+        raise ValueError("can't store a %s" % type(v).__name__)
+
+
+def _get(data, pos, code):  # (value, new position)
+    if code in fixed:
+        return (fixed[code].unpack_from(data, pos)[0], pos + fixed[code].size)
+    elif code == 's':
+        (n,) = u16.unpack_from(data, pos)
+        pos += u16.size
+        return (data[pos:pos + n].decode("utf-8"), pos + n)
+    elif code == 'b':
+        (n,) = u32.unpack_from(data, pos)
+        pos += u32.size
+        nb = (n + 7) // 8
+        return (BitStream(int.from_bytes(data[pos:pos + nb], 'big'), n), pos + nb)
+    elif code == 'y':
+        (n,) = u16.unpack_from(data, pos)
+        pos += u16.size
+        return (bytearray(data[pos:pos + n]), pos + n)
+    elif code == 'l':
+        (n, size) = intlist.unpack_from(data, pos)
+        pos += intlist.size
+        c = 'B' if size == 1 else 'q'
+        return (list(struct.unpack_from("<%d%s" % (n, c), data, pos)), pos + n * size)
+    elif code == 'S':
+        (n,) = u16.unpack_from(data, pos)
+        pos += u16.size
+        res = []
+        for _ in range(n):
+            (s, pos) = _get(data, pos, 's')
+            res.append(s)
+        return (res, pos)
+    elif code == 'v':
+        return _get_any(data, pos)
+    raise ValueError("unknown type code %r" % code)
+
+
+def _get_any(data, pos):
+    tag = data[pos:pos + 1].decode("ascii")
+    pos += 1
+    if tag == 'N':
+        return (None, pos)
+    elif tag in "?qdsby":
+        return _get(data, pos, tag)
+    elif tag == 'L':
+        (n,) = u16.unpack_from(data, pos)
+        pos += u16.size
+        res = []
+        for _ in range(n):
+            (x, pos) = _get_any(data, pos)
+            res.append(x)
+        return (res, pos)
+    elif tag == 'M':
+        (n,) = u16.unpack_from(data, pos)
+        pos += u16.size
+        res = {}
+        for _ in range(n):
+            (k, pos) = _get(data, pos, 's')
+            (res[k], pos) = _get_any(data, pos)
+        return (res, pos)
+    raise ValueError("bad value tag %r" % tag)
+
+
+def encode(q):  # (class name, globaltime, record payload)
+    name = type(q).__name__
+    if name not in SCHEMA:
+        raise ValueError("can't store a %s" % name)
+    d = q.__dict__
+    globaltime = d.get('globaltime', float('nan'))
+    fields = SCHEMA[name]
+    unknown = set(d) - set(f for (f, _) in fields) - set(['globaltime'])
+    if unknown:
+        raise ValueError("%s: no store field for %s" % (name, ", ".join(sorted(unknown))))
+    present = 0
+    out = []
+    for i in range(len(fields)):
+        (f, code) = fields[i]
+        if f in d:
+            present |= 1 << i
+            try:
+                _put(out, code, d[f])
+            except (struct.error, AttributeError, TypeError) as e:
+                raise ValueError("%s.%s: can't store %r: %s" % (name, f, d[f], e))
+    bitmap = present.to_bytes((present.bit_length() + 7) // 8, 'little')
+    return (name, globaltime, rechead.pack(TAGS[name], globaltime) + struct.pack("<B", len(bitmap)) + bitmap +
+            b"".join(out))
+
+
+def decode(payload):  # (class name, message __dict__)
+    (tag, globaltime) = rechead.unpack_from(payload, 0)
+    name = CLASSES[tag]
+    fields = SCHEMA[name]
+    pos = rechead.size
+    n = payload[pos]
+    present = int.from_bytes(payload[pos + 1:pos + 1 + n], 'little')
+    pos += 1 + n
+    d = {}
+    if globaltime == globaltime:  # not NaN
+        d['globaltime'] = globaltime
+    for i in range(len(fields)):
+        if present >> i & 1:
+            (f, code) = fields[i]
+            (d[f], pos) = _get(payload, pos, code)
+    return (name, d)
+
+
+class RecordCollector(object):
+    # Keeps encoded records in memory, e.g. in --jobs workers
+    def __init__(self):
+        self.records = []
+
+    def add(self, q):
+        self.records.append(encode(q))
+
+
+class StoreWriter(object):
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(header.pack(MAGIC, VERSION))
+        self.offset = header.size
+        self.types = {}
+        self.index = []
+
+    def add(self, q):
+        self.add_encoded(*encode(q))
+
+    def add_records(self, records):
+        for r in records:
+            self.add_encoded(*r)
+
+    def add_encoded(self, name, globaltime, payload):
+        if name not in self.types:
+            self.types[name] = len(self.types)
+        self.file.write(reclen.pack(len(payload)))
+        self.file.write(payload)
+        self.index.append((float(globaltime), self.offset + reclen.size, len(payload), self.types[name]))
+        self.offset += reclen.size + len(payload)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+        write_index(self.path + ".idx", sorted(self.types, key=self.types.get), self.index)
+
+
+def write_index(fname, names, index):
+    with open(fname, "wb") as f:
+        f.write(header.pack(IDX_MAGIC, VERSION))
+        f.write(struct.pack("<H", len(names)))
+        for name in names:
+            b = name.encode("ascii")
+            f.write(struct.pack("<B", len(b)) + b)
+        f.write(struct.pack("<Q", len(index)))
+        for e in index:
+            f.write(entry.pack(*e))
+
+
+class FrameStore(object):
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        (magic, version) = header.unpack(self.file.read(header.size))
+        if magic != MAGIC:
+            raise ValueError("%s: not a frame store" % path)
+        if version != VERSION:
+            raise ValueError("%s: unsupported frame store version %d" % (path, version))
+        if os.path.exists(path + ".idx"):
+            self._read_index(path + ".idx")
+        else:
+            self._rebuild_index()
+        timed = [i for i in range(len(self.index)) if self.index[i][0] == self.index[i][0]]  # not NaN
+        self.by_time = sorted(timed, key=lambda i: self.index[i][0])
+        self.times = [self.index[i][0] for i in self.by_time]
+
+    def _read_index(self, fname):
+        with open(fname, "rb") as f:
+            data = f.read()
+        (magic, version) = header.unpack_from(data, 0)
+        if magic != IDX_MAGIC or version != VERSION:
+            raise ValueError("%s: unsupported index" % fname)
+        pos = header.size
+        (ntypes,) = struct.unpack_from("<H", data, pos)
+        pos += 2
+        self.names = []
+        for _ in range(ntypes):
+            (l,) = struct.unpack_from("<B", data, pos)
+            self.names.append(data[pos + 1:pos + 1 + l].decode("ascii"))
+            pos += 1 + l
+        (count,) = struct.unpack_from("<Q", data, pos)
+        pos += 8
+        self.index = list(entry.iter_unpack(data[pos:pos + count * entry.size]))
+
+    def _rebuild_index(self):
+        self.names = []
+        self.index = []
+        offset = header.size
+        while True:
+            b = self.file.read(reclen.size)
+            if len(b) < reclen.size:
+                break
+            (l,) = reclen.unpack(b)
+            payload = self.file.read(l)
+            if len(payload) < l:
+                break  # truncated by an interrupted writer
+            (tag, globaltime) = rechead.unpack_from(payload, 0)
+            name = CLASSES[tag]
+            if name not in self.names:
+                self.names.append(name)
+            self.index.append((globaltime, offset + reclen.size, l, self.names.index(name)))
+            offset += reclen.size + l
+
+    def __len__(self):
+        return len(self.index)
+
+    def types(self):
+        return list(self.names)
+
+    def select(self, types=None, start=None, end=None):  # record numbers in store order
+        if start is None and end is None:
+            sel = range(len(self.index))
+        else:
+            lo = 0 if start is None else bisect.bisect_left(self.times, start)
+            hi = len(self.times) if end is None else bisect.bisect_left(self.times, end)
+            sel = sorted(self.by_time[lo:hi])
+        if types is not None:
+            wanted = set(self.names.index(t) for t in types if t in self.names)
+            sel = [i for i in sel if self.index[i][3] in wanted]
+        return sel
+
+    def read(self, i):  # (class name, message __dict__)
+        (_, offset, l, _) = self.index[i]
+        self.file.seek(offset)
+        return decode(self.file.read(l))
+
+    def frames(self, classes, types=None, start=None, end=None):
+        # message objects, classes maps class names to classes
+        for i in self.select(types, start, end):
+            (name, d) = self.read(i)
+            cls = classes[name]
+            q = cls.__new__(cls)
+            q.__dict__ = d
+            yield q
+
+    def close(self):
+        self.file.close()
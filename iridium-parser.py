@@ -2,19 +2,30 @@
 # vim: set ts=4 sw=4 tw=0 et pm=:
 from __future__ import print_function
 import sys
+import os
 import re
 import struct
 import fileinput
 import getopt
+import ast
+import io
 import types
 import datetime
+import collections
 import collections.abc
 import math
+import heapq
+import json
+import time
+import builtins
 
 import bch
-import crcmod
+import bitutils
+import compressed
+import crc
 import rs
 import rs6
+from bitstream import BitStream, Permutation, symbol_swap, concat
 
 izip = zip
 # from itertools import izip
@@ -44,14 +55,32 @@ options, remainder = getopt.getopt(sys.argv[1:], 'vgi:o:pes', [
     'forcetype=',
     'globaltime',
     'channelize',
+    'bch-tables=',
+    'jobs=',
+    'columnar-dir=',
+    'store=',
+    'timerange=',
+    'batch=',
+    'decode-cache=',
+    'merge',
+    'dedupe=',
+    'checkpoint=',
+    'follow',
+    'output-file=',
+    'split-prefix=',
+    'split-format=',
+    'profile-stages',
+    'profile-json=',
+    'profile-interval=',
+    'reassemble=',
 ])
 '''
 good: min_confidence = 90 /confidence in percent, signal with less confidence will be discarded
 uw-ec: it will make preamble back qbsk and undo differential decode, it allows 4 bits error but it only use in test
 harder: it will do a more bch test in lcw
 confidence: min_confidence = arg
-input: input = arg, raw/dump
-output: output = arg, line/dump/plot/err/msg/sat/rxstats
+input: input = arg, raw/store (dump is the old name of store)
+output: output = arg, line/store/plot/err/msg/sat/rxstats/columnar/split/reassemble
 perfect: show the number of error which was fixed 
 errorfree: discard the line which are error in it
 interesting: do not process some kinds of frame
@@ -65,6 +94,24 @@ errorstats: statistic the errors
 forcetype: make the massage type in your input type, but the file don't provide the arg for it
 globaltime: change the time to globaltime
 channelize: calculate the channel is the which channel 
+bch-tables: keep the precomputed bch error tables in this file between runs
+jobs: parse with this many processes, output keeps the input order
+columnar-dir: directory the columnar output is written to, default parsed.col
+store: frame store file for -i/-o store, default frames.store
+timerange: start:end globaltime of the frames replayed from a store, either may be empty
+batch: decode this many lines at a time with numpy, default 1 (off)
+decode-cache: remember this many decoded bursts for repeated ones (several receivers), default 4096, 0 is off
+merge: read all input files at once and decode their lines in globaltime order, each file has to be in order
+dedupe: with --merge, drop lines with the same bits as one up to this many seconds before
+checkpoint: keep the read position and time state of the input files in this file, the next run continues there
+follow: with --checkpoint, keep waiting for new lines (gr-iridium still writing), also after the file was rotated
+output-file: write the output to this file instead of stdout, compressed if it ends in .gz/.xz/.bz2
+split-prefix: -o split writes the lines of each frame type to <prefix>.<type>, default the input file name without extension
+split-format: TYPE:field,field,... like --format but only for the -o split file of TYPE (e.g. IRA), can be given several times
+profile-stages: time spent and calls per decoding stage, frames per class and error reasons, to stderr at the end
+profile-json: write the --profile-stages numbers to this json file at the end
+profile-interval: with --profile-json, also rewrite the file every this many seconds
+reassemble: hand the decoded frames to this reassembler.py mode (ida/idapp/sbd/page/msg/stats) instead of printing them, sets -o reassemble
 '''
 
 iridium_access = "001100000011000011110011"  # Actually 0x789h in BPSK
@@ -82,6 +129,15 @@ messaging_bch_poly = 1897
 ringalert_bch_poly = 1207
 acch_bch_poly = 3545  # 1207 also works?
 hdr_poly = 29  # IBC header
+iridium_access_bits = BitStream.from_str(iridium_access)
+uplink_access_bits = BitStream.from_str(uplink_access)
+header_messaging_bits = BitStream.from_str(header_messaging)
+header_time_location_bits = BitStream.from_str(header_time_location)
+iridium_lead_out_bits = BitStream.from_str(iridium_lead_out)
+bc_type4_bits = BitStream.from_str("000100000000100001110000110000110011110000")
+bc_assignment_empty_bits = BitStream.from_str("111000000000000000000000000000000000000000")
+ra_page_none_bits = BitStream.from_str("111111111111111111111111111111111111111111")
+ra_page_fill_bits = BitStream.from_str("101000100111001110111010101000100010111000")
 base_freq = 1616e6
 channel_width = 41667
 
@@ -104,6 +160,24 @@ errorstats = None
 forcetype = None
 globaltime = False
 channelize = False
+jobs = 1
+columnar_dir = "parsed.col"
+storefile = "frames.store"
+timerange = (None, None)
+batchsize = 1
+decode_cache_size = 4096
+merge = False
+dedupe = None
+checkpoint_file = None
+follow = False
+outfile = None
+split_prefix = None
+split_formats = {}
+profile_stages = False
+profile_json = None
+profile_interval = None
+reassemble_mode = None
+profile = None
 
 for opt, arg in options:
     if opt in ('-v', '--verbose'):
@@ -118,7 +192,7 @@ for opt, arg in options:
     elif opt in ('--confidence'):
         good = True
         min_confidence = int(arg)
-    elif opt in ('--interesting'):
+    elif opt == '--interesting':
         interesting = True
     elif opt in ('-p', '--perfect'):
         perfect = True
@@ -152,13 +226,93 @@ for opt, arg in options:
         ofmt = arg.split(',')
     elif opt in ('--globaltime'):
         globaltime = True
+    elif opt in ('--bch-tables'):
+        bch.set_table_file(arg)
+    elif opt in ('--jobs'):
+        jobs = int(arg)
+    elif opt in ('--columnar-dir'):
+        columnar_dir = arg
+    elif opt in ('--store'):
+        storefile = arg
+    elif opt in ('--timerange'):
+        timerange = tuple(float(x) if x else None for x in arg.split(':', 1))
+    elif opt in ('--batch'):
+        batchsize = int(arg)
+    elif opt in ('--decode-cache'):
+        decode_cache_size = int(arg)
+    elif opt == '--merge':
+        merge = True
+    elif opt in ('--dedupe'):
+        dedupe = float(arg)
+    elif opt in ('--checkpoint'):
+        checkpoint_file = arg
+    elif opt == '--follow':
+        follow = True
+    elif opt in ('--output-file'):
+        outfile = arg
+    elif opt in ('--split-prefix'):
+        split_prefix = arg
+    elif opt in ('--split-format'):
+        (tag, fmt) = arg.split(':', 1)
+        split_formats[tag] = fmt.split(',')
+    elif opt == '--profile-stages':
+        profile_stages = True
+    elif opt == '--profile-json':
+        profile_json = arg
+    elif opt == '--profile-interval':
+        profile_interval = float(arg)
+    elif opt == '--reassemble':
+        output = "reassemble"
+        reassemble_mode = arg
     else:
         raise Exception("unknown argument?")
 
-if input == "dump" or output == "dump":
-    import cPickle as pickle
+if input == "dump":
+    input = "store"
+if output == "dump":
+    output = "store"
+if input == "store" or output == "store":
+    import framestore
+
+if checkpoint_file is not None and (merge or not remainder or "-" in remainder):
+    print("--checkpoint needs input files and can not be used with --merge", file=sys.stderr)
+    exit(1)
+if checkpoint_file is not None and any(compressed.is_compressed(f) for f in remainder):
+    print("--checkpoint can not be used with compressed input files", file=sys.stderr)
+    exit(1)
+if follow and checkpoint_file is None:
+    print("--follow needs --checkpoint", file=sys.stderr)
+    exit(1)
+if follow:
+    jobs = 1
+    batchsize = 1
+
+if profile_interval is not None and profile_json is None:
+    print("--profile-interval needs --profile-json", file=sys.stderr)
+    exit(1)
+
+if batchsize > 1:
+    try:
+        import numpy
+    except ImportError:
+        batchsize = 1
+
+if output == "columnar":
+    import columnar
+
+if output == "reassemble":
+    import reassembler
+    if reassemble_mode not in ('ida', 'idapp', 'sbd', 'page', 'msg', 'stats'):
+        print("--reassemble: unknown or unsupported mode " + reassemble_mode, file=sys.stderr)
+        exit(1)
 
-    dumpfile = "pickle.dump"
+if output == "split" and split_prefix is None:
+    if input == "store":
+        split_prefix = re.sub(r'\.[^.]*$', '', storefile)
+    elif remainder and remainder[0] != "-":
+        split_prefix = re.sub(r'\.[^.]*$', '', re.sub(r'\.(gz|xz|bz2)$', '', remainder[0]))
+    else:
+        split_prefix = "stdin"
 
 if dosatclass:
     import satclass
@@ -166,10 +320,16 @@ if dosatclass:
     satclass.init()
 
 if vdumpfile != None:
-    vdumpfile = open(vdumpfile, "wb")
+    vdumpfile = compressed.open_output(vdumpfile, "wb")
 
 if errorfile != None:
-    errorfile = open(errorfile, "w")
+    errorfile = compressed.open_output(errorfile)
+
+if outfile != None:
+    sys.stdout = compressed.open_output(outfile)
+
+if input == "raw" and (not remainder or "-" in remainder):
+    sys.stdin = compressed.open_input("-")
 
 
 class ParserError(Exception):
@@ -189,6 +349,7 @@ class Zulu(datetime.tzinfo):
 
 Z = Zulu()
 tswarning = False
+merge_dups = 0
 tsoffset = 0
 maxts = 0
 
@@ -206,27 +367,112 @@ def fmt_iritime(iritime):
     return (uxtime, strtime)
 
 
+def filename_globaltime(filename, timestamp):  # (globaltime, b26) if the filename carries a start time
+    start = bitutils.filename_start(filename)
+    if start is None:
+        return None
+    ts = start[0] + float(timestamp) / 1000
+    if start[1] is not None:
+        ts += start[1] * 600
+    return (ts, start[1])
+
+
+def fallback_globaltime(timestamp):  # keeps time monotonic over files without a start time
+    global tswarning, tsoffset, maxts
+    if not tswarning:
+        print("Warning: no timestamp found in filename", file=sys.stderr)
+        tswarning = True
+    ts = tsoffset + float(timestamp) / 1000
+    if ts < maxts:
+        tsoffset = maxts
+        ts = tsoffset + float(timestamp) / 1000
+    maxts = ts
+    return ts
+
+
+def filter_msgtypes(name):
+    # Which msgtypes (after the LCW, by frame type) a frame of this class can be
+    # decoded from. Frames of other types are not decoded further when filtering.
+    return {
+        'IridiumECCMessage': ('MS', 'RA', 'BC', 'DA'),
+        'IridiumMSMessage': ('MS',),
+        'IridiumMessagingAscii': ('MS',),
+        'IridiumMessagingUnknown': ('MS',),
+        'IridiumRAMessage': ('RA',),
+        'IridiumBCMessage': ('BC',),
+        'IridiumLCWMessage': ('DA',),
+        'IridiumVOMessage': ('VO',),
+        'IridiumIPMessage': ('IP',),
+        'IridiumSYMessage': ('SY',),
+        'IridiumLCW3Message': ('U3',),
+        'IridiumSTLMessage': ('TL',),
+    }.get(name)
+
+
+def header_check(check):  # True if check only looks at fields that are final after Message.__init__
+    fields = ('filename', 'timestamp', 'frequency', 'confidence', 'level', 'symbols', 'swapped', 'lineno',
+              'globaltime', 'freq_print', 'fchan', 'foff', 'b26')
+    try:
+        tree = ast.parse(check, mode='eval')
+    except SyntaxError:
+        return False
+    attrs = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == 'q':
+            if node.attr not in fields:
+                return False
+            attrs.add(id(node.value))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            if node.id == 'q' and id(node) not in attrs:
+                return False
+            if node.id != 'q' and not hasattr(builtins, node.id):
+                return False
+    return True
+
+
+lcw_msgtypes = {0: 'VO', 1: 'IP', 2: 'DA', 3: 'U3', 7: 'SY'}
+
+
+def wanted(msgtype):
+    if msgtype == "LW":
+        return any(t in lazy_types for t in ('VO', 'IP', 'DA', 'SY', 'U3'))
+    return msgtype in lazy_types
+
+
+check_code = None
+if linefilter['check']:
+    check_code = compile(linefilter['check'], '<filter>', 'eval')
+
+# Skipping frames shows up as "filtered message" errors, so only when nobody looks at errors.
+lazy_types = None
+early_check = False
+if errorfile == None and errorstats == None:
+    lazy_types = filter_msgtypes(linefilter['type'])
+    early_check = linefilter['check'] is not None and header_check(linefilter['check'])
+
+
 class Message(object):
-    def __init__(self, line):
+    def __init__(self, line, lineno=None, fallback=None):
         self.parse_error = False
         self.error = False
         self.error_msg = []
-        self.lineno = fileinput.lineno()
-        p = re.compile(
-            '(RAW|RWA): ([^ ]*) ([\d.]+) (\d+) A:(\w+) [IL]:(\w+) +(\d+)% ([\d.]+|inf|nan) +(\d+) ([\[\]<> 01]+)(.*)')
-        m = p.match(line)
+        if lineno is None:
+            lineno = fileinput.lineno()
+        self.lineno = lineno
+        m = bitutils.tokenize_line(line)
         if (errorfile != None):
             self.line = line
         if (not m):
             self._new_error("Couldn't parse: " + line)
             self.parse_error = True
             return
-        self.swapped = (m.group(1) == "RAW")
-        self.filename = m.group(2)
+        self.swapped = (m[0] == "RAW")
+        self.filename = m[1]
         if self.filename == "/dev/stdin":
             self.filename = "-"
-        self.timestamp = float(m.group(3))
-        self.frequency = int(m.group(4))
+        self.timestamp = float(m[2])
+        self.frequency = int(m[3])
 
         if channelize:
             fbase = self.frequency - base_freq
@@ -236,65 +482,55 @@ class Message(object):
         else:
             self.freq_print = "%010d" % (self.frequency)
 
-        #        self.access_ok=(m.group(5)=="OK")
-        #        self.leadout_ok=(m.group(6)=="OK")
-        self.confidence = int(m.group(7))
-        self.level = float(m.group(8))
-        #        self.raw_length=m.group(9)
-        self.bitstream_raw = (re.sub("[\[\]<> ]", "", m.group(10)))  # raw bitstring with correct symbols
+        #        self.access_ok=(m[4]=="OK")
+        #        self.leadout_ok=(m[5]=="OK")
+        self.confidence = int(m[6])
+        self.level = float(m[7])
+        #        self.raw_length=m[8]
+        bits = m[9]
+        if bits.strip('01'):
+            bits = re.sub(r"[\[\]<> ]", "", bits)
+        self.bitstream_raw = BitStream.from_str(bits)  # raw bits with correct symbols
         if self.swapped:
-            self.bitstream_raw = symbol_reverse(self.bitstream_raw)
+            self.bitstream_raw = symbol_swap(self.bitstream_raw)
         self.symbols = len(self.bitstream_raw) / 2
-        if m.group(11):
-            self.extra_data = m.group(11)
+        if m[10]:
+            self.extra_data = m[10]
             self._new_error("There is crap at the end in extra_data")
         # Make a "global" timestamp
-        global tswarning, tsoffset, maxts
-        mm = re.match("(\d\d)-(\d\d)-(20\d\d)T(\d\d)-(\d\d)-(\d\d)-[sr]1", self.filename)
-        if mm:
-            month, day, year, hour, minute, second = map(int, mm.groups())
-            ts = datetime.datetime(year, month, day, hour, minute, second)
-            ts = (ts - datetime.datetime(1970, 1, 1)).total_seconds()
-            ts += float(self.timestamp) / 1000
-            self.globaltime = ts
-            return
-        mm = re.match("i-(\d+(?:\.\d+)?)-[vbsrtl]1.([a-z])([a-z])", self.filename)
-        if mm:
-            b26 = (ord(mm.group(2)) - ord('a')) * 26 + ord(mm.group(3)) - ord('a')
-            self.b26 = b26
-            ts = float(mm.group(1)) + float(self.timestamp) / 1000 + b26 * 600
-            self.globaltime = ts
-            return
-        mm = re.match("i-(\d+(?:\.\d+)?)-[vbsrtl]1(?:-o[+-]\d+)?$", self.filename)
-        if mm:
-            ts = float(mm.group(1)) + float(self.timestamp) / 1000
-            self.globaltime = ts
-            return
-        if not tswarning:
-            print("Warning: no timestamp found in filename", file=sys.stderr)
-            tswarning = True
-        ts = tsoffset + float(self.timestamp) / 1000
-        if ts < maxts:
-            tsoffset = maxts
-            ts = tsoffset + float(self.timestamp) / 1000
-        maxts = ts
-        self.globaltime = ts
+        ts = filename_globaltime(self.filename, self.timestamp)
+        if ts is not None:
+            if ts[1] is not None:
+                self.b26 = ts[1]
+            self.globaltime = ts[0]
+        elif fallback is not None:
+            self.globaltime = fallback
+        else:
+            self.globaltime = fallback_globaltime(self.timestamp)
 
-    def upgrade(self):
+    def upgrade(self, pre=None):
         if self.error: return self
-        if (self.bitstream_raw.startswith(iridium_access)):
+        if early_check:
+            try:
+                keep = eval(check_code, globals(), {'q': self})
+            except Exception:
+                keep = True
+            if not keep:
+                self._new_error("filtered message")
+                return self
+        if (self.bitstream_raw.startswith(iridium_access_bits)):
             self.uplink = 0
-        elif (self.bitstream_raw.startswith(uplink_access)):
+        elif (self.bitstream_raw.startswith(uplink_access_bits)):
             self.uplink = 1
         else:
             if uwec:
                 access = []
                 map = [0, 1, 3, 2]
                 # back into bpsk symbols
-                for x in xrange(0, len(iridium_access) - 1, 2):
-                    access.append(map[int(self.bitstream_raw[x + 0]) * 2 + int(self.bitstream_raw[x + 1])])
+                for x in range(0, len(iridium_access) - 1, 2):
+                    access.append(map[self.bitstream_raw.get(x, x + 2)])
                 # undo differential decoding
-                for c in xrange(1, len(access) - 1):
+                for c in range(1, len(access) - 1):
                     access[c] = (access[c - 1] + access[c]) % 4
 
                 if bitdiff(access, UW_DOWNLINK) < 4:
@@ -309,11 +545,22 @@ class Message(object):
             if ("uplink" not in self.__dict__):
                 self._new_error("Access code missing")
                 return self
+        key = None
+        if decode_cache is not None and "extra_data" not in self.__dict__:
+            data = self.bitstream_raw[len(iridium_access):]  # uplink_access has the same length
+            key = (self.uplink, data.value, data.length)
+            q = decode_cache.get(key, self)
+            if q is not None:
+                return q
+        before = set(self.__dict__)
         try:
-            return IridiumMessage(self).upgrade()
+            q = IridiumMessage(self, pre).upgrade()
         except ParserError as e:
             self._new_error(str(e))
-            return self
+            q = self
+        if key is not None:
+            decode_cache.put(key, q, before)
+        return q
 
     def _new_error(self, msg):
         self.error = True
@@ -355,22 +602,58 @@ class Message(object):
         str = "RAW: " + self._pretty_header()
         #        str+= " "+self.bitstream_raw
         bs = self.bitstream_raw
-        if (bs.startswith(iridium_access)):
+        if (bs.startswith(iridium_access_bits)):
             str += " <%s>" % iridium_access
             bs = bs[len(iridium_access):]
-        elif (bs.startswith(uplink_access)):
+        elif (bs.startswith(uplink_access_bits)):
             str += " <U%s>" % uplink_access
             bs = bs[len(uplink_access):]
-        str += " " + " ".join(slice(bs, 16))
+        str += " " + " ".join(slice("%s" % bs, 16))
         if ("extra_data" in self.__dict__):
             str += " " + self.extra_data
         str += self._pretty_trailer()
         return str
 
 
+class DecodeCache(object):
+    # The same burst can come in several times (more receivers, repeated
+    # output). Decoded frames are kept by their data bits, a hit only takes
+    # over the fields of the new line (time, frequency, level, ...).
+    def __init__(self, size):
+        self.size = size
+        self.frames = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, msg):  # copy of the cached frame with the line fields of msg
+        if key not in self.frames:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.frames.move_to_end(key)
+        (cls, decoded) = self.frames[key]
+        q = cls.__new__(cls)
+        q.__dict__ = dict(msg.__dict__)
+        q.__dict__.update(decoded)
+        q.error_msg = list(decoded['error_msg'])
+        if 'iri_time_diff' in decoded:
+            q.iri_time_diff = q.iri_time_ux - q.globaltime
+        return q
+
+    def put(self, key, q, before):  # before: fields q had before decoding
+        decoded = dict((k, v) for (k, v) in q.__dict__.items() if k not in before)
+        decoded['error'] = q.error
+        decoded['error_msg'] = list(q.error_msg)
+        self.frames[key] = (type(q), decoded)
+        if len(self.frames) > self.size:
+            self.frames.popitem(last=False)
+
+
 class IridiumMessage(Message):
-    def __init__(self, msg):
+    def __init__(self, msg, pre=None):
         self.__dict__ = msg.__dict__
+        pre = pre or {}  # blocks already deinterleaved by predeinterleave()
+        synd = syndrome_cache
         if (self.uplink):
             data = self.bitstream_raw[len(uplink_access):]
         else:
@@ -379,7 +662,7 @@ class IridiumMessage(Message):
         # Try to detect packet type.
         # XXX: will not detect packets with correctable bit errors at the beginning
         if "msgtype" not in self.__dict__:
-            if data[:32] == header_messaging:
+            if data.startswith(header_messaging_bits):
                 self.msgtype = "MS"
 
         if "msgtype" not in self.__dict__ and linefilter['type'] == "IridiumMSMessage":
@@ -387,7 +670,7 @@ class IridiumMessage(Message):
             return
 
         if "msgtype" not in self.__dict__:
-            if data[:96] == header_time_location:
+            if data.startswith(header_time_location_bits):
                 self.msgtype = "TL"
 
         if "msgtype" not in self.__dict__ and linefilter['type'] == "IridiumSTLMessage":
@@ -398,10 +681,10 @@ class IridiumMessage(Message):
             hdrlen = 6
             blocklen = 64
             if len(data) > hdrlen + blocklen:
-                if bch.ndivide(hdr_poly, data[:hdrlen]) == 0:
-                    (o_bc1, o_bc2) = de_interleave(data[hdrlen:hdrlen + blocklen])
-                    if bch.ndivide(ringalert_bch_poly, o_bc1[:31]) == 0:
-                        if bch.ndivide(ringalert_bch_poly, o_bc2[:31]) == 0:
+                if synd.syndrome(hdr_poly, data.get(0, hdrlen), hdrlen) == 0:
+                    (o_bc1, o_bc2) = pre.get('bc') or de_interleave(data[hdrlen:hdrlen + blocklen])
+                    if synd.syndrome(ringalert_bch_poly, o_bc1.get(0, 31), 31) == 0:
+                        if synd.syndrome(ringalert_bch_poly, o_bc2.get(0, 31), 31) == 0:
                             self.msgtype = "BC"
 
         if "msgtype" not in self.__dict__ and linefilter['type'] == "IridiumBCMessage":
@@ -410,12 +693,12 @@ class IridiumMessage(Message):
 
         if "msgtype" not in self.__dict__:
             if len(data) > 64:  # XXX: heuristic based on LCW / first BCH block, can we do better?
-                (o_lcw1, o_lcw2, o_lcw3) = de_interleave_lcw(data[:46])
-                if bch.ndivide(29, o_lcw1) == 0:
-                    if bch.ndivide(41, o_lcw3) == 0:
-                        (e2, lcw2, bchs) = bch.bch_repair(465, o_lcw2 + '0')  # One bit missing, so we guess
+                (o_lcw1, o_lcw2, o_lcw3) = pre.get('lcw') or de_interleave_lcw(data[:46])
+                if synd.syndrome(29, o_lcw1.value, 7) == 0:
+                    if synd.syndrome(41, o_lcw3.value, 26) == 0:
+                        (e2, lcw2, bchs) = synd.bch_repair(465, o_lcw2.value << 1, 14)  # One bit missing, so we guess
                         if (e2 == 1):  # Maybe the other one...
-                            (e2, lcw2, bchs) = bch.bch_repair(465, o_lcw2 + '1')
+                            (e2, lcw2, bchs) = synd.bch_repair(465, (o_lcw2.value << 1) | 1, 14)
                         if e2 == 0:
                             self.msgtype = "LW"
 
@@ -426,10 +709,10 @@ class IridiumMessage(Message):
         if "msgtype" not in self.__dict__:
             firstlen = 3 * 32
             if len(data) >= 3 * 32:
-                (o_ra1, o_ra2, o_ra3) = de_interleave3(data[:firstlen])
-                if bch.ndivide(ringalert_bch_poly, o_ra1[:31]) == 0:
-                    if bch.ndivide(ringalert_bch_poly, o_ra2[:31]) == 0:
-                        if bch.ndivide(ringalert_bch_poly, o_ra3[:31]) == 0:
+                (o_ra1, o_ra2, o_ra3) = pre.get('ra') or de_interleave3(data[:firstlen])
+                if synd.syndrome(ringalert_bch_poly, o_ra1.get(0, 31), 31) == 0:
+                    if synd.syndrome(ringalert_bch_poly, o_ra2.get(0, 31), 31) == 0:
+                        if synd.syndrome(ringalert_bch_poly, o_ra3.get(0, 31), 31) == 0:
                             self.msgtype = "RA"
 
         if "msgtype" not in self.__dict__ and linefilter['type'] == "IridiumRAMessage":
@@ -445,22 +728,22 @@ class IridiumMessage(Message):
                 if len(data) >= 70:
                     hdrlen = 6
                     blocklen = 64
-                    (e1, _, _) = bch.bch_repair(hdr_poly, data[:hdrlen])
-                    (o_bc1, o_bc2) = de_interleave(data[hdrlen:hdrlen + blocklen])
-                    (e2, d2, b2) = bch.bch_repair(ringalert_bch_poly, o_bc1[:31])
-                    (e3, d3, b3) = bch.bch_repair(ringalert_bch_poly, o_bc2[:31])
+                    (e1, _) = synd.repair(hdr_poly, data.get(0, hdrlen), hdrlen)
+                    (o_bc1, o_bc2) = pre.get('bc') or de_interleave(data[hdrlen:hdrlen + blocklen])
+                    (e2, r2) = synd.repair(ringalert_bch_poly, o_bc1.get(0, 31), 31)
+                    (e3, r3) = synd.repair(ringalert_bch_poly, o_bc2.get(0, 31), 31)
                     if e1 >= 0 and e2 >= 0 and e3 >= 0:
-                        if ((d2 + b2 + o_bc1[31]).count('1') % 2) == 0:
-                            if ((d3 + b3 + o_bc2[31]).count('1') % 2) == 0:
+                        if (parity(r2) ^ o_bc1[31]) == 0:
+                            if (parity(r3) ^ o_bc2[31]) == 0:
                                 self.msgtype = "BC"
 
                 # try for LCW
                 if len(data) >= 64:
-                    (o_lcw1, o_lcw2, o_lcw3) = de_interleave_lcw(data[:46])
-                    (e1, lcw1, bchs) = bch.bch_repair(29, o_lcw1)  # BCH(7,3)
-                    (e2a, lcw2, bchs) = bch.bch_repair(465, o_lcw2 + '0')  # BCH(13,16)
-                    (e2b, lcw2, bchs) = bch.bch_repair(465, o_lcw2 + '1')
-                    (e3, lcw3, bchs) = bch.bch_repair(41, o_lcw3)  # BCH(26,21)
+                    (o_lcw1, o_lcw2, o_lcw3) = pre.get('lcw') or de_interleave_lcw(data[:46])
+                    (e1, _) = synd.repair(29, o_lcw1.value, 7)  # BCH(7,3)
+                    (e2a, _) = synd.repair(465, o_lcw2.value << 1, 14)  # BCH(13,16)
+                    (e2b, _) = synd.repair(465, (o_lcw2.value << 1) | 1, 14)
+                    (e3, _) = synd.repair(41, o_lcw3.value, 26)  # BCH(26,21)
 
                     e2 = e2a
                     if (e2b >= 0 and e2b < e2a) or (e2a < 0):
@@ -480,11 +763,15 @@ class IridiumMessage(Message):
         if "msgtype" not in self.__dict__:
             raise ParserError("unknown Iridium message type")
 
+        if lazy_types is not None and not wanted(self.msgtype):
+            self._new_error("filtered message")
+            return
+
         if self.msgtype == "MS":
             hdrlen = 32
             self.header = data[:hdrlen]
             self.descrambled = []
-            (blocks, self.descramble_extra) = slice_extra(data[hdrlen:], 64)
+            (blocks, self.descramble_extra) = data[hdrlen:].chunks_extra(64)
             for x in blocks:
                 self.descrambled += de_interleave(x)
         elif self.msgtype == "TL":
@@ -497,16 +784,15 @@ class IridiumMessage(Message):
             if len(data) < firstlen:
                 self._new_error("No data to descramble")
             self.header = ""
-            self.descrambled = de_interleave3(data[:firstlen])
-            (blocks, self.descramble_extra) = slice_extra(data[firstlen:], 64)
+            self.descrambled = list(pre.get('ra') or de_interleave3(data[:firstlen]))
+            (blocks, self.descramble_extra) = data[firstlen:].chunks_extra(64)
             for x in blocks:
                 self.descrambled += de_interleave(x)
         elif self.msgtype == "BC":
             hdrlen = 6
             self.header = data[:hdrlen]
-            (e, d, bchs) = bch.bch_repair(hdr_poly, self.header)
+            (e, self.bc_type, bchs) = synd.bch_repair(hdr_poly, self.header.value, hdrlen)
 
-            self.bc_type = int(d, 2)
             if e == 0:
                 self.header = "bc:%d" % self.bc_type
             else:
@@ -514,15 +800,17 @@ class IridiumMessage(Message):
                 self._new_error("IBC header error")
             self.descrambled = []
 
-            (blocks, self.descramble_extra) = slice_extra(data[hdrlen:], 64)
+            (blocks, self.descramble_extra) = data[hdrlen:].chunks_extra(64)
             for x in blocks:
                 self.descrambled += de_interleave(x)
         elif self.msgtype == "LW":
             lcwlen = 46
-            (o_lcw1, o_lcw2, o_lcw3) = de_interleave_lcw(data[:lcwlen])
-            (e1, self.lcw1, bchs) = bch.bch_repair(29, o_lcw1)
-            (e2a, lcw2a, bchs) = bch.bch_repair(465, o_lcw2 + '0')  # One bit error expected
-            (e2b, lcw2b, bchs) = bch.bch_repair(465, o_lcw2 + '1')  # Other bit flip?
+            (o_lcw1, o_lcw2, o_lcw3) = pre.get('lcw') or de_interleave_lcw(data[:lcwlen])
+            (e1, lcw1, bchs) = synd.bch_repair(29, o_lcw1.value, 7)
+            self.lcw1 = BitStream(lcw1, 3)
+            (e2a, lcw2a, bchs) = synd.bch_repair(465, o_lcw2.value << 1, 14)  # One bit error expected
+            (e2b, lcw2b, bchs) = synd.bch_repair(465, (o_lcw2.value << 1) | 1, 14)  # Other bit flip?
+            (lcw2a, lcw2b) = (BitStream(lcw2a, 6), BitStream(lcw2b, 6))
             if e2b < 0:
                 e2 = e2a
                 self.lcw2 = lcw2a
@@ -535,17 +823,18 @@ class IridiumMessage(Message):
             else:
                 e2 = e2b
                 self.lcw2 = lcw2b
-            (e3, self.lcw3, bchs) = bch.bch_repair(41, o_lcw3)
-            self.ft = int(self.lcw1, 2)  # Frame type
+            (e3, lcw3, bchs) = synd.bch_repair(41, o_lcw3.value, 26)
+            self.lcw3 = BitStream(lcw3, 21)
+            self.ft = self.lcw1.value  # Frame type
             if forcetype and ':' in forcetype:
                 self.ft = int(forcetype.partition(':')[2])
             if e1 < 0 or e2 < 0 or e3 < 0:
                 self._new_error("LCW decode failed")
                 self.header = "LCW(%s %s/%02d E%d,%s %sx/%03d E%d,%s %s/%02d E%d)" % (
-                    o_lcw1[:3], o_lcw1[3:], bch.ndivide(29, o_lcw1), e1, o_lcw2[:6], o_lcw2[6:],
-                    bch.ndivide(465, o_lcw2 + '0'),
+                    o_lcw1[:3], o_lcw1[3:], bch.nndivide(29, o_lcw1.value), e1, o_lcw2[:6], o_lcw2[6:],
+                    bch.nndivide(465, o_lcw2.value << 1),
                     e2,
-                    o_lcw3[:21], o_lcw3[21:], bch.ndivide(41, o_lcw3), e3)
+                    o_lcw3[:21], o_lcw3[21:], bch.nndivide(41, o_lcw3.value), e3)
             else:
                 # LCW:=xx[type] yyyy[code]
                 # 0: maint
@@ -567,8 +856,8 @@ class IridiumMessage(Message):
                 #    *: reserved
                 # 3: reserved
                 #                self.header="LCW(%d,%s,%s E%d)"%(self.ft,self.lcw2,self.lcw3,e1+e2+e3)
-                self.lcw_ft = int(self.lcw2[:2], 2)
-                self.lcw_code = int(self.lcw2[2:], 2)
+                self.lcw_ft = self.lcw2.get(0, 2)
+                self.lcw_code = self.lcw2.get(2, 6)
                 lcw3bits = self.lcw3
                 if self.lcw_ft == 0:
                     ty = "maint"
@@ -578,22 +867,22 @@ class IridiumMessage(Message):
                         code = "<silent>"
                     elif self.lcw_code == 12:
                         code = "maint[1]"
-                        code += "[lqi:%d,power:%d]" % (int(self.lcw3[19:21], 2), int(self.lcw3[16:19], 2))
+                        code += "[lqi:%d,power:%d]" % (self.lcw3.get(19, 21), self.lcw3.get(16, 19))
                         lcw3bits = "%s" % (self.lcw3[:16])
                     elif self.lcw_code == 0:
                         code = "sync"
                         code += "[status:%d,dtoa:%d,dfoa:%d]" % (
-                            int(self.lcw3[1:2], 2), int(self.lcw3[3:13], 2), int(self.lcw3[13:21], 2))
+                            self.lcw3.get(1, 2), self.lcw3.get(3, 13), self.lcw3.get(13, 21))
                         lcw3bits = "%s|%s" % (self.lcw3[0], self.lcw3[2])
                     elif self.lcw_code == 3:
                         code = "maint[2]"
                         code += "[lqi:%d,power:%d,f_dtoa:%d,f_dfoa:%d]" % (
-                            int(self.lcw3[1:3], 2), int(self.lcw3[3:6], 2), int(self.lcw3[6:13], 2),
-                            int(self.lcw3[13:20], 2))
+                            self.lcw3.get(1, 3), self.lcw3.get(3, 6), self.lcw3.get(6, 13),
+                            self.lcw3.get(13, 20))
                         lcw3bits = "%s|%s" % (self.lcw3[0], self.lcw3[20:])
                     elif self.lcw_code == 1:
                         code = "switch"
-                        code += "[dtoa:%d,dfoa:%d]" % (int(self.lcw3[3:13], 2), int(self.lcw3[13:21], 2))
+                        code += "[dtoa:%d,dfoa:%d]" % (self.lcw3.get(3, 13), self.lcw3.get(13, 21))
                         lcw3bits = "%s" % (self.lcw3[0:3])
                     else:
                         code = "rsrvd(%d)" % (self.lcw_code)
@@ -607,13 +896,13 @@ class IridiumMessage(Message):
                     ty = "hndof"
                     if self.lcw_code == 12:
                         code = "handoff_cand"
-                        lcw3bits = "%03x,%03x,%s" % (int(self.lcw3[:11], 2), int(self.lcw3[11:], 2), lcw3bits)
+                        lcw3bits = "%03x,%03x,%s" % (self.lcw3.get(0, 11), self.lcw3.get(11, 21), lcw3bits)
                     elif self.lcw_code == 3:
                         code = "handoff_resp"
                         code += "[cand:%s,denied:%d,ref:%d,slot:%d,sband_up:%d,sband_dn:%d,access:%d]" % (
-                            ['P', 'S'][int(self.lcw3[2:3], 2)], int(self.lcw3[3:4], 2), int(self.lcw3[4:5], 2),
-                            1 + int(self.lcw3[6:8], 2), int(self.lcw3[8:13], 2), int(self.lcw3[13:18], 2),
-                            1 + int(self.lcw3[18:21], 2))
+                            ['P', 'S'][self.lcw3[2]], self.lcw3[3], self.lcw3[4],
+                            1 + self.lcw3.get(6, 8), self.lcw3.get(8, 13), self.lcw3.get(13, 18),
+                            1 + self.lcw3.get(18, 21))
                         lcw3bits = "%s" % (self.lcw3[0:2])
                     elif self.lcw_code == 15:
                         code = "<silent>"
@@ -624,6 +913,9 @@ class IridiumMessage(Message):
                     code = "<%d>" % (self.lcw_code)
                 self.header = "LCW(%d,T:%s,C:%s,%s E%d)" % (self.ft, ty, code, lcw3bits, e1 + e2 + e3)
                 self.header = "%-110s " % self.header
+            if lazy_types is not None and (self.error or not wanted(lcw_msgtypes.get(self.ft, "U"))):
+                self._new_error("filtered message")
+                return
             self.descrambled = []
             self.payload_r = []
             self.payload_f = []
@@ -633,41 +925,41 @@ class IridiumMessage(Message):
                 self._new_error("Not enough data in data packet")
             if self.ft == 0:  # Voice - Mission data - voice
                 self.msgtype = "VO"
-                for x in slice(data[:312], 8):
+                for x in data[:312].chunks(8):
                     self.descrambled += [x]
-                    self.payload_f += [int(x, 2)]
-                    self.payload_r += [int(x[::-1], 2)]
-                self.payload_6 = [int(x, 2) for x in slice(data[:312], 6)]
+                    self.payload_f += [x.value]
+                    self.payload_r += [x.reverse().value]
+                self.payload_6 = [x.value for x in data[:312].chunks(6)]
                 self.descramble_extra = data[312:]
             elif self.ft == 1:  # IP via PPP - Mission data - data
                 self.msgtype = "IP"
-                for x in slice(data[:312], 8):
-                    self.descrambled += [x[::-1]]
-                    self.payload_f += [int(x, 2)]
-                    self.payload_r += [int(x[::-1], 2)]
+                for x in data[:312].chunks(8):
+                    self.descrambled += [x.reverse()]
+                    self.payload_f += [x.value]
+                    self.payload_r += [self.descrambled[-1].value]
                 self.descramble_extra = data[312:]
             elif self.ft == 2:  # DAta (SBD) - Mission control data - ISU/SV
                 self.msgtype = "DA"
                 self.descramble_extra = data[124 * 2 + 64:]
                 data = data[:124 * 2 + 64]
-                blocks = slice(data, 124)
+                blocks = data.chunks(124)
                 end = blocks.pop()
                 for x in blocks:
                     (b1, b2) = de_interleave(x)
-                    (b1, b2, b3, b4) = slice(b1 + b2, 31)
+                    (b1, b2, b3, b4) = (b1 + b2).chunks(31)
                     self.descrambled += [b4, b2, b3, b1]
                 (b1, b2) = de_interleave(end)
                 self.descrambled += [b2[1:], b1[1:]]  # Throw away the extra bit
             elif self.ft == 7:  # Synchronisation
                 self.msgtype = "SY"
                 self.descrambled = data[:312]
-                self.sync = [int(x, 2) for x in slice(self.descrambled, 8)]
+                self.sync = [x.value for x in self.descrambled.chunks(8)]
                 self.descramble_extra = data[312:]
             elif self.ft == 3:  # Mission control data - inband sig
                 self.msgtype = "U3"
                 self.descrambled = data[:312]
-                self.payload6 = [int(x, 2) for x in slice(self.descrambled, 6)]
-                self.payload8 = [int(x, 2) for x in slice(self.descrambled, 8)]
+                self.payload6 = [x.value for x in self.descrambled.chunks(6)]
+                self.payload8 = [x.value for x in self.descrambled.chunks(8)]
                 self.descramble_extra = data[312:]
             elif self.ft == 6:  # "PT=,"
                 self.msgtype = "U6"
@@ -680,7 +972,7 @@ class IridiumMessage(Message):
         else:
             raise Exception("Illegal Iridium frame type")
 
-        self.lead_out_ok = self.descramble_extra.startswith(iridium_lead_out)
+        self.lead_out_ok = self.descramble_extra.startswith(iridium_lead_out_bits)
         if self.msgtype != "VO" and self.msgtype != "IP" and len(self.descrambled) == 0:
             self._new_error("No data to descramble")
 
@@ -714,21 +1006,24 @@ class IridiumMessage(Message):
         else:
             str += " DL"
         if self.header:
-            str += " " + self.header
+            str += " %s" % self.header
         return str
 
     def _pretty_trailer(self):
         str = super(IridiumMessage, self)._pretty_trailer()
-        if ("descramble_extra" in self.__dict__) and self.descramble_extra != "":
-            str += " descr_extra:" + re.sub(iridium_lead_out, "[" + iridium_lead_out + "]", self.descramble_extra)
+        if ("descramble_extra" in self.__dict__) and len(self.descramble_extra) > 0:
+            str += " descr_extra:" + re.sub(iridium_lead_out, "[" + iridium_lead_out + "]", "%s" % self.descramble_extra)
         return str
 
     def pretty(self):
         sstr = "IRI: " + self._pretty_header()
         sstr += " %2s" % self.msgtype
-        if self.descrambled != "":
+        if self.descrambled != BitStream():
+            bits = self.descrambled
+            if not isinstance(bits, BitStream):
+                bits = concat(bits)
             sstr += " ["
-            sstr += ".".join(["%02x" % int("0" + x, 2) for x in slice("".join(self.descrambled), 8)])
+            sstr += ".".join(["%02x" % x.value for x in bits.chunks(8)])
             sstr += "]"
         sstr += self._pretty_trailer()
         return sstr
@@ -777,9 +1072,9 @@ class IridiumSTLMessage(IridiumMessage):
 
     def pretty(self):
         str = "ITL: " + self._pretty_header()
-        str += " [" + ".".join(["%02x" % int("0" + x, 2) for x in slice("".join(self.descrambled[:256]), 8)]) + "]"
-        str += " [" + ".".join(["%02x" % int("0" + x, 2) for x in slice("".join(self.descrambled[256:512]), 8)]) + "]"
-        str += " [" + ".".join(["%02x" % int("0" + x, 2) for x in slice("".join(self.descrambled[512:]), 8)]) + "]"
+        str += " [" + ".".join(["%02x" % x.value for x in self.descrambled[:256].chunks(8)]) + "]"
+        str += " [" + ".".join(["%02x" % x.value for x in self.descrambled[256:512].chunks(8)]) + "]"
+        str += " [" + ".".join(["%02x" % x.value for x in self.descrambled[512:].chunks(8)]) + "]"
         str += self._pretty_trailer()
         return str
 
@@ -885,7 +1180,7 @@ class IridiumLCW3Message(IridiumMessage):
 class IridiumVOMessage(IridiumMessage):
     def __init__(self, imsg):
         self.__dict__ = imsg.__dict__
-        self.crcval = iip_crc24("".join([chr(x) for x in self.payload_r]))
+        self.crcval = iip_crc24(bytes(self.payload_r))
         if self.crcval == 0:
             self.vtype = "VDA"
             return
@@ -945,7 +1240,7 @@ class IridiumVOMessage(IridiumMessage):
 
 
 # Poly from GSM 04.64 / check value (reversed) is 0xC91B6
-iip_crc24 = crcmod.mkCrcFun(poly=0x1BBA1B5, initCrc=0xffffff ^ 0x0c91b6, rev=True, xorOut=0x0c91b6)
+iip_crc24 = crc.iip_crc24
 '''
 poly is the polynomial
 '''
@@ -955,7 +1250,7 @@ class IridiumIPMessage(IridiumMessage):
     def __init__(self, imsg):
         self.__dict__ = imsg.__dict__
 
-        self.crcval = iip_crc24("".join([chr(x) for x in self.payload_r]))
+        self.crcval = iip_crc24(bytes(self.payload_r))
         if self.crcval == 0:
             self.itype = "IIP"
             self.ip_hdr = self.payload_r[0]
@@ -1042,35 +1337,44 @@ class IridiumECCMessage(IridiumMessage):
             self.poly = acch_bch_poly
         else:
             raise ParserError("unknown Iridium message type(canthappen)")
-        self.bitstream_messaging = ""
-        self.bitstream_bch = ""
-        self.oddbits = ""
         self.fixederrs = 0
-        parity = None
+        plen = self.poly.bit_length() - 1
+        dlen = 31 - plen
+        dmask = (1 << (dlen - 1)) - 1
+        bch_bits = 0
+        messaging_bits = 0
+        odd_bits = 0
+        blocks = 0
+        parity_bit = None
         for block in self.descrambled:
             if len(block) == 32:  # contains parity bit
-                parity = block[31:]
+                parity_bit = block[31]
                 block = block[:31]
             if len(block) != 31:
                 raise ParserError("unknown BCH block len:%d" % len(block))
 
-            (errs, data, bchs) = bch.bch_repair(self.poly, block)
+            (errs, repaired) = syndrome_cache.repair(self.poly, block.value, 31)
             if (errs < 0):
-                if len(self.bitstream_bch) == 0: self._new_error("BCH decode failed")
+                if blocks == 0: self._new_error("BCH decode failed")
                 break
 
-            if parity:
-                if ((data + bchs + parity).count('1') % 2) == 1:
-                    if len(self.bitstream_bch) == 0: self._new_error("Parity error")
+            if parity_bit is not None:
+                if parity(repaired) ^ parity_bit == 1:
+                    if blocks == 0: self._new_error("Parity error")
                     break
 
             if errs > 0:
                 self.fixederrs += 1
 
-            self.bitstream_bch += data
-            self.bitstream_messaging += data[1:]
-            self.oddbits += data[0]
-        if len(self.bitstream_bch) == 0:
+            data = repaired >> plen
+            bch_bits = (bch_bits << dlen) | data
+            messaging_bits = (messaging_bits << (dlen - 1)) | (data & dmask)
+            odd_bits = (odd_bits << 1) | (data >> (dlen - 1))
+            blocks += 1
+        self.bitstream_bch = BitStream(bch_bits, blocks * dlen)
+        self.bitstream_messaging = BitStream(messaging_bits, blocks * (dlen - 1))
+        self.oddbits = BitStream(odd_bits, blocks)
+        if blocks == 0:
             self._new_error("No data to descramble")
 
     def upgrade(self):
@@ -1100,25 +1404,23 @@ class IridiumECCMessage(IridiumMessage):
 
     def pretty(self):
         str = "IME: " + self._pretty_header() + " " + self.msgtype + " "
-        for block in xrange(len(self.descrambled)):
-            b = self.descrambled[block]
+        for b in self.descrambled:
             if len(b) == 31:
-                (errs, foo) = bch.nrepair(self.poly, b)
-                res = bch.ndivide(self.poly, b)
-                parity = (foo).count('1') % 2
-                str += "{%s %s/%04d E%s P%d}" % (b[:21], b[21:31], res, ("0", "1", "2", "-")[errs], parity)
+                (errs, foo) = bch.nnrepair(self.poly, b.value, 31)
+                res = bch.nndivide(self.poly, b.value)
+                str += "{%s %s/%04d E%s P%d}" % (b[:21], b[21:31], res, ("0", "1", "2", "-")[errs], parity(foo))
             elif len(b) == 32:
-                (errs, foo) = bch.nrepair(self.poly, b[:31])
-                res = bch.ndivide(self.poly, b[:31])
-                parity = (foo + b[31]).count('1') % 2
-                str += "{%s %s %s/%04d E%s P%d}" % (b[:21], b[21:31], b[31], res, ("0", "1", "2", "-")[errs], parity)
+                (errs, foo) = bch.nnrepair(self.poly, b.get(0, 31), 31)
+                res = bch.nndivide(self.poly, b.get(0, 31))
+                str += "{%s %s %s/%04d E%s P%d}" % (b[:21], b[21:31], b[31], res, ("0", "1", "2", "-")[errs],
+                                                    parity(foo) ^ b[31])
             else:
                 str += "length=%d?" % len(b)
         str += self._pretty_trailer()
         return str
 
 
-ida_crc16 = crcmod.predefined.mkPredefinedCrcFun("crc-ccitt-false")
+ida_crc16 = crc.ida_crc16
 
 
 class IridiumLCWMessage(IridiumECCMessage):
@@ -1127,11 +1429,11 @@ class IridiumLCWMessage(IridiumECCMessage):
         # Decode stuff from self.bitstream_bch
         self.flags1 = self.bitstream_bch[:4]
         self.flag1b = self.bitstream_bch[4:5]
-        self.da_ctr = int(self.bitstream_bch[5:8], 2)
+        self.da_ctr = self.bitstream_bch.get(5, 8)
         self.flags2 = self.bitstream_bch[8:11]
-        self.da_len = int(self.bitstream_bch[11:16], 2)
-        self.flags3 = int(self.bitstream_bch[16:17], 2)
-        self.zero1 = int(self.bitstream_bch[17:20], 2)
+        self.da_len = self.bitstream_bch.get(11, 16)
+        self.flags3 = self.bitstream_bch.get(16, 17)
+        self.zero1 = self.bitstream_bch.get(17, 20)
         if self.zero1 != 0:
             self._new_error("zero1 not 0")
 
@@ -1139,24 +1441,22 @@ class IridiumLCWMessage(IridiumECCMessage):
             raise ParserError("Not enough data in data packet")
 
         if self.da_len > 0:
-            self.da_crc = int(self.bitstream_bch[9 * 20:9 * 20 + 16], 2)
-            self.da_ta = [int(x, 2) for x in slice(self.bitstream_bch[20:9 * 20], 8)]
-            crcstream = self.bitstream_bch[:20] + "0" * 12 + self.bitstream_bch[20:-4]
-            the_crc = ida_crc16("".join([chr(int(x, 2)) for x in slice(crcstream, 8)]))
+            self.da_crc = self.bitstream_bch.get(9 * 20, 9 * 20 + 16)
+            self.da_ta = [x.value for x in self.bitstream_bch[20:9 * 20].chunks(8)]
+            crcstream = self.bitstream_bch[:20] + BitStream(0, 12) + self.bitstream_bch[20:-4]
+            the_crc = ida_crc16(crcstream.tobytes())
             self.the_crc = the_crc
             self.crc_ok = (the_crc == 0)
         else:
             self.crc_ok = False
-            self.da_ta = [int(x, 2) for x in slice(self.bitstream_bch[20:11 * 20], 8)]
+            self.da_ta = [x.value for x in self.bitstream_bch[20:11 * 20].chunks(8)]
 
-        self.zero2 = int(self.bitstream_bch[9 * 20 + 16:], 2)
+        self.zero2 = self.bitstream_bch.get(9 * 20 + 16, len(self.bitstream_bch))
         if self.zero2 != 0:
             self._new_error("zero2 not 0")
 
         sbd = self.bitstream_bch[1 * 20:9 * 20]
-        self.data = []
-        for x in slice(sbd, 8):
-            self.data += [int(x, 2)]
+        self.data = [x.value for x in sbd.chunks(8)]
 
     def upgrade(self):
         if self.error: return self
@@ -1175,13 +1475,13 @@ class IridiumLCWMessage(IridiumECCMessage):
 
     def pretty(self):
         str = "IDA: " + self._pretty_header()
-        str += " " + self.bitstream_bch[:3]
-        str += " cont=" + self.bitstream_bch[3:4]
-        str += " " + self.bitstream_bch[4:5]
-        str += " ctr=" + self.bitstream_bch[5:8]
-        str += " " + self.bitstream_bch[8:11]
+        str += " %s" % self.bitstream_bch[:3]
+        str += " cont=%s" % self.bitstream_bch[3:4]
+        str += " %s" % self.bitstream_bch[4:5]
+        str += " ctr=%s" % self.bitstream_bch[5:8]
+        str += " %s" % self.bitstream_bch[8:11]
         str += " len=%02d" % self.da_len
-        str += " 0:" + self.bitstream_bch[16:20]
+        str += " 0:%s" % self.bitstream_bch[16:20]
         str += " ["
         if self.da_len > 0:
             if all([x == 0 for x in self.da_ta[self.da_len + 1:]]):
@@ -1195,23 +1495,20 @@ class IridiumLCWMessage(IridiumECCMessage):
         str += "%-60s" % (mstr + "]")
 
         if self.da_len > 0:
-            str += " %04x" % int(self.bitstream_bch[9 * 20:9 * 20 + 16], 2)
+            str += " %04x" % self.da_crc
             str += "/%04x" % self.the_crc
             if self.crc_ok:
                 str += " CRC:OK"
             else:
                 str += " CRC:no"
-            str += " " + self.bitstream_bch[9 * 20 + 16:]
+            str += " %s" % self.bitstream_bch[9 * 20 + 16:]
         else:
             str += "  ---   "
-            str += " " + self.bitstream_bch[9 * 20 + 16:]
+            str += " %s" % self.bitstream_bch[9 * 20 + 16:]
 
         if self.da_len > 0:
-            sbd = self.bitstream_bch[1 * 20:9 * 20]
-
             str += ' SBD: '
-            for x in slice(sbd, 8):
-                c = int(x, 2)
+            for c in self.data:
                 if (c >= 32 and c < 127):
                     str += chr(c)
                 else:
@@ -1224,7 +1521,7 @@ class IridiumLCWMessage(IridiumECCMessage):
 class IridiumBCMessage(IridiumECCMessage):
     def __init__(self, imsg):
         self.__dict__ = imsg.__dict__
-        blocks, _ = slice_extra(self.bitstream_bch, 42)
+        blocks, _ = self.bitstream_bch.chunks_extra(42)
 
         self.readable = ''
         self.trailer = ''
@@ -1238,14 +1535,14 @@ class IridiumBCMessage(IridiumECCMessage):
         if blocks and self.bc_type == 0:
             data = blocks.pop(0)
 
-            self.sv_id = int(data[0:7], 2)
-            self.beam_id = int(data[7:13], 2)
+            self.sv_id = data.get(0, 7)
+            self.beam_id = data.get(7, 13)
             self.unknown01 = data[13:14]
-            self.slot = int(data[14:15], 2)  # previously: timeslot
-            self.sv_blocking = int(data[15:16], 2)  # aka: Acq
+            self.slot = data.get(14, 15)  # previously: timeslot
+            self.sv_blocking = data.get(15, 16)  # aka: Acq
             self.acqu_classes = data[16:32]
-            self.acqu_subband = int(data[32:37], 2)
-            self.acqu_channels = int(data[37:40], 2)
+            self.acqu_subband = data.get(32, 37)
+            self.acqu_channels = data.get(37, 40)
             self.unknown02 = data[40:42]
 
             self.readable += 'sat:%03d cell:%02d %s slot:%d sv_blkn:%d aq_cl:%s aq_sb:%02d aq_ch:%d %s' % (
@@ -1256,40 +1553,40 @@ class IridiumBCMessage(IridiumECCMessage):
         if blocks and self.bc_type == 0:
             data = blocks.pop(0)
 
-            self.type = int(data[0:6], 2)
+            self.type = data.get(0, 6)
             if self.type == 0:
                 self.unknown11 = data[6:36]
-                self.max_uplink_pwr = int(data[36:42], 2)
+                self.max_uplink_pwr = data.get(36, 42)
                 self.readable += ' %s max_uplink_pwr:%02d' % (self.unknown11, self.max_uplink_pwr)
             elif self.type == 1:
                 self.unknown21 = data[6:10]
-                self.iri_time = int(data[10:42], 2)
+                self.iri_time = data.get(10, 42)
                 (self.iri_time_ux, self.iri_time_str) = fmt_iritime(self.iri_time)
                 self.iri_time_diff = self.iri_time_ux - self.globaltime
                 self.readable += ' %s time:%s' % (self.unknown21, self.iri_time_str)
             elif self.type == 2:
                 self.unknown31 = data[6:10]
-                self.tmsi_expiry = int(data[10:43], 2)
+                self.tmsi_expiry = data.get(10, 43)
                 (self.tmsi_expiry_ux, tmsi_expiry_str) = fmt_iritime(self.tmsi_expiry)
                 self.readable += ' %s tmsi_expiry:%s' % (self.unknown31, tmsi_expiry_str)
             elif self.type == 4:
-                if data != "000100000000100001110000110000110011110000":
+                if data != bc_type4_bits:
                     self.readable += ' type:%02d %s' % (self.type, data)
             else:  # Unknown Type
                 self.readable += ' type:%02d %s' % (self.type, data)
         #                raise ParserError("unknown BC Type %s"%self.type)
 
         for data in blocks:  # Parse assignments (if any)
-            if (data != '111000000000000000000000000000000000000000'):
+            if (data != bc_assignment_empty_bits):
                 # Channel Assignment
                 unknown1 = data[0:3]
-                random_id = int(data[3:11], 2)
-                timeslot = 1 + int(data[11:13], 2)
-                uplink_subband = int(data[13:18], 2)
-                downlink_subband = int(data[18:23], 2)
-                access = 1 + int(data[23:26], 2)
-                dtoa = int(data[26:34], 2)
-                dfoa = int(data[34:40], 2)
+                random_id = data.get(3, 11)
+                timeslot = 1 + data.get(11, 13)
+                uplink_subband = data.get(13, 18)
+                downlink_subband = data.get(18, 23)
+                access = 1 + data.get(23, 26)
+                dtoa = data.get(26, 34)
+                dfoa = data.get(34, 40)
                 unknown4 = data[40:42]
                 self.readable += ' [%s Rid:%03d ts:%d ul_sb:%02d dl_sb:%02d access:%d dtoa:%03d dfoa:%02d %s]' % (
                     unknown1, random_id, timeslot, uplink_subband, downlink_subband, access, dtoa, dfoa, unknown4)
@@ -1324,15 +1621,15 @@ class IridiumRAMessage(IridiumECCMessage):
         # 3 blocks (63 bits) fixed "header".
         if len(self.bitstream_bch) < 63:
             raise ParserError("RA content too short")
-        self.ra_sat = int(self.bitstream_bch[0:7], 2)  # sv_id
-        self.ra_cell = int(self.bitstream_bch[7:13], 2)  # beam_id
-        self.ra_pos_x = int(self.bitstream_bch[14:25], 2) - int(self.bitstream_bch[13]) * (1 << 11)
-        self.ra_pos_y = int(self.bitstream_bch[26:37], 2) - int(self.bitstream_bch[25]) * (1 << 11)
-        self.ra_pos_z = int(self.bitstream_bch[38:49], 2) - int(self.bitstream_bch[37]) * (1 << 11)
-        self.ra_int = int(self.bitstream_bch[49:56], 2)  # 90ms interval of RA (within same sat/cell)
-        self.ra_ts = int(self.bitstream_bch[56:57], 2)  # Broadcast slot 1 or 4
-        self.ra_eip = int(self.bitstream_bch[57:58], 2)  # EPI ?
-        self.ra_bc_sb = int(self.bitstream_bch[58:63], 2)  # BCH downlink sub-band
+        self.ra_sat = self.bitstream_bch.get(0, 7)  # sv_id
+        self.ra_cell = self.bitstream_bch.get(7, 13)  # beam_id
+        self.ra_pos_x = self.bitstream_bch.get(14, 25) - self.bitstream_bch[13] * (1 << 11)
+        self.ra_pos_y = self.bitstream_bch.get(26, 37) - self.bitstream_bch[25] * (1 << 11)
+        self.ra_pos_z = self.bitstream_bch.get(38, 49) - self.bitstream_bch[37] * (1 << 11)
+        self.ra_int = self.bitstream_bch.get(49, 56)  # 90ms interval of RA (within same sat/cell)
+        self.ra_ts = self.bitstream_bch.get(56, 57)  # Broadcast slot 1 or 4
+        self.ra_eip = self.bitstream_bch.get(57, 58)  # EPI ?
+        self.ra_bc_sb = self.bitstream_bch.get(58, 63)  # BCH downlink sub-band
 
         '''
         Math.atan2(y,x)
@@ -1353,19 +1650,19 @@ class IridiumRAMessage(IridiumECCMessage):
         page_sane = True
         while len(ra_msg) >= 42:
             paging = {
-                'tmsi': int(ra_msg[0:32], 2),
-                'zero1': int(ra_msg[32:34], 2),
-                'msc_id': int(ra_msg[34:39], 2),
-                'zero2': int(ra_msg[39:42], 2),
+                'tmsi': ra_msg.get(0, 32),
+                'zero1': ra_msg.get(32, 34),
+                'msc_id': ra_msg.get(34, 39),
+                'zero2': ra_msg.get(39, 42),
                 'raw': ra_msg[:42],
             }
-            if ra_msg[:42] == "111111111111111111111111111111111111111111":
+            if paging['raw'] == ra_page_none_bits:
                 paging['str'] = "NONE"
                 if page_end is None:
                     page_end = len(self.paging)
                 else:
                     page_sane = False
-            elif ra_msg[:42] == "101000100111001110111010101000100010111000":
+            elif paging['raw'] == ra_page_fill_bits:
                 paging['str'] = "FILL"
                 if page_end is None:
                     page_sane = False
@@ -1384,8 +1681,8 @@ class IridiumRAMessage(IridiumECCMessage):
             self.ra_extra = ra_msg
         else:
             self.page_len = page_end
-            self.ra_extra = ""
-            self.descramble_extra = ""
+            self.ra_extra = BitStream()
+            self.descramble_extra = BitStream()
 
     def upgrade(self):
         if self.error: return self
@@ -1426,8 +1723,8 @@ class IridiumRAMessage(IridiumECCMessage):
             if len(self.paging) - self.page_len > 1:
                 str += " FILL=%d" % (len(self.paging) - self.page_len - 1)
 
-        if self.ra_extra:
-            str += " +%s" % " ".join(slice(self.ra_extra, 21))
+        if len(self.ra_extra) > 0:
+            str += " +%s" % " ".join(["%s" % x for x in self.ra_extra.chunks(21)])
 
         str += self._pretty_trailer()
         return str
@@ -1442,21 +1739,21 @@ class IridiumMSMessage(IridiumECCMessage):
             raise ParserError("Not enough data received")
 
         self.zero1 = rest[0:4]
-        if self.zero1 != '0000':
+        if self.zero1.value != 0:
             self._new_error("zero1 not 0000")
 
-        self.block = int(rest[4:4 + 4], 2)  # Block number in the super frame
-        self.frame = int(rest[8:8 + 6], 2)  # Current frame number (OR: Current cell number)
-        self.bch_blocks = int(rest[14:18], 2)  # Number of BCH blocks in this message
+        self.block = rest.get(4, 4 + 4)  # Block number in the super frame
+        self.frame = rest.get(8, 8 + 6)  # Current frame number (OR: Current cell number)
+        self.bch_blocks = rest.get(14, 18)  # Number of BCH blocks in this message
         self.unknown1 = rest[18]  # ?
-        self.secondary = int(rest[19])  # Something like secondary SV
-        self.ctr1 = int(rest[19] + self.oddbits[1] + rest[20:32], 2)
+        self.secondary = rest[19]  # Something like secondary SV
+        self.ctr1 = (rest[19] << 13) | (self.oddbits[1] << 12) | rest.get(20, 32)
 
-        if (self.oddbits[0] == "1"):
+        if (self.oddbits[0] == 1):
             self.group = "A"
             self.agroup = 0
         else:
-            self.group = int(rest[18:20], 2)
+            self.group = rest.get(18, 20)
             self.agroup = 1 + self.group
         self.tdiff = ((self.block * 5 + self.agroup) * 48 + self.frame) * 90
 
@@ -1471,29 +1768,29 @@ class IridiumMSMessage(IridiumECCMessage):
         self.oddbits = self.oddbits[:self.bch_blocks * 2]
 
         # If oddbits ends in 1, this is an all-1 block -- remove it
-        self.msg_trailer = ""
-        if (self.oddbits[-1] == "1"):
+        self.msg_trailer = BitStream()
+        if (self.oddbits[-1] == 1):
             self.msg_trailer = rest[-20:]
-            if (self.msg_trailer != "1" * 20):
+            if (self.msg_trailer != BitStream((1 << 20) - 1, 20)):
                 self._new_error("trailer exists, but not all-1")
             rest = rest[0:-20]
             # If oddbits still ends in 1, probably also an all-1 block
-            if (self.oddbits[-2] == "1"):
+            if (self.oddbits[-2] == 1):
                 self.msg_trailer = rest[-20:] + self.msg_trailer
-                if (self.msg_trailer != "1" * 40):
+                if (self.msg_trailer != BitStream((1 << 40) - 1, 40)):
                     self._new_error("second trailer exists, but not all-1")
                 rest = rest[0:-20]
         # If oddbits starts with 1, there is a 80-bit "pre" message
-        if self.oddbits[0] == "1":
+        if self.oddbits[0] == 1:
             self.msg_pre = rest[20:100]
             rest = rest[100:]
         else:
-            self.msg_pre = ""
+            self.msg_pre = BitStream()
             rest = rest[20:]
         # If enough  bits are left, there will be a pager message
         if len(rest) > 20:
-            self.msg_ric = int(rest[0:22][::-1], 2)
-            self.msg_format = int(rest[22:27], 2)
+            self.msg_ric = rest[0:22].reverse().value
+            self.msg_format = rest.get(22, 27)
             self.msg_data = rest[27:]
 
     def upgrade(self):
@@ -1515,7 +1812,7 @@ class IridiumMSMessage(IridiumECCMessage):
         str = super(IridiumMSMessage, self)._pretty_header()
         str += " odd:%-26s" % (self.oddbits)
         str += " %1d:%s:%02d" % (self.block, self.group, self.frame)
-        if (self.oddbits == "1011"):
+        if (self.oddbits == BitStream(0b1011, 4)):
             str += " %s sec:%d %-83s" % (self.unknown1, self.secondary, group(self.msg_pre, 20))
         elif (self.group == "A"):
             str += " %s c=%05d           %s %-62s" % (
@@ -1541,20 +1838,20 @@ class IridiumMessagingAscii(IridiumMSMessage):
     def __init__(self, immsg):
         self.__dict__ = immsg.__dict__
         rest = self.msg_data
-        self.msg_seq = int(rest[0:6], 2)  # 0-61 (62/63 seem unused)
-        self.msg_zero1 = int(rest[6:10], 2)
+        self.msg_seq = rest.get(0, 6)  # 0-61 (62/63 seem unused)
+        self.msg_zero1 = rest.get(6, 10)
         if (self.msg_zero1 != 0):
             self._new_error("zero1 is not all-zero")
         self.msg_unknown1 = rest[10:20]
         self.msg_len_bit = rest[20]
         rest = rest[21:]
-        if (self.msg_len_bit == "1"):
-            lfl = int(rest[0:4], 2)
+        if (self.msg_len_bit == 1):
+            lfl = rest.get(0, 4)
             self.msg_len_field_len = lfl
             if (lfl == 0):
                 raise ParserError("len_field_len unexpectedly 0")
-            self.msg_ctr = int(rest[4:4 + lfl], 2)
-            self.msg_ctr_max = int(rest[4 + lfl:4 + lfl * 2], 2)
+            self.msg_ctr = rest.get(4, 4 + lfl)
+            self.msg_ctr_max = rest.get(4 + lfl, 4 + lfl * 2)
             rest = rest[4 + lfl * 2:]
             if (lfl < 1 or lfl > 2):
                 self._new_error("len_field_len not 1 or 2")
@@ -1563,15 +1860,15 @@ class IridiumMessagingAscii(IridiumMSMessage):
             self.msg_ctr = 0
             self.msg_ctr_max = 0
         self.msg_zero2 = rest[0]
-        if (self.msg_zero2 != "0"):
+        if (self.msg_zero2 != 0):
             self._new_error("zero2 is not zero")
-        self.msg_checksum = int(rest[1:8], 2)
+        self.msg_checksum = rest.get(1, 8)
         self.msg_msgdata = rest[8:]
-        m = re.compile('(\d{7})').findall(self.msg_msgdata)
+        (m, self.msg_rest) = self.msg_msgdata.chunks_extra(7)
         self.msg_ascii = ""
         end = 0
         for (group) in m:
-            character = int(group, 2)
+            character = group.value
             if (character == 3):
                 end = 1
             elif (end == 1):
@@ -1580,10 +1877,6 @@ class IridiumMessagingAscii(IridiumMSMessage):
                 self.msg_ascii += "[%d]" % character
             else:
                 self.msg_ascii += chr(character)
-        if len(self.msg_msgdata) % 7:
-            self.msg_rest = self.msg_msgdata[-(len(self.msg_msgdata) % 7):]
-        else:
-            self.msg_rest = ""
         # TODO: maybe checksum checks
 
     def upgrade(self):
@@ -1593,8 +1886,8 @@ class IridiumMessagingAscii(IridiumMSMessage):
     def _pretty_header(self):
         str = super(IridiumMessagingAscii, self)._pretty_header()
         str += " seq:%02d %10s %1d/%1d" % (self.msg_seq, self.msg_unknown1, self.msg_ctr, self.msg_ctr_max)
-        (full, rest) = slice_extra(self.msg_msgdata, 8)
-        msgx = "".join(["%02x" % int(x, 2) for x in full])
+        (full, rest) = self.msg_msgdata.chunks_extra(8)
+        msgx = "".join(["%02x" % x.value for x in full])
         return str + " csum:%02x msg:%s.%s" % (self.msg_checksum, msgx, rest)
 
     def _pretty_trailer(self):
@@ -1611,8 +1904,8 @@ class IridiumMessagingUnknown(IridiumMSMessage):
     def __init__(self, immsg):
         self.__dict__ = immsg.__dict__
         rest = self.msg_data
-        self.msg_seq = int(rest[0:6], 2)
-        self.msg_zero1 = int(rest[6:10], 2)
+        self.msg_seq = rest.get(0, 6)
+        self.msg_zero1 = rest.get(6, 10)
         if (self.msg_zero1 != 0):
             self._new_error("zero1 is not all-zero")
         self.msg_unknown1 = rest[10:20]
@@ -1643,37 +1936,97 @@ def grouped(iterable, n):
     return izip(*[iter(iterable)] * n)
 
 
-def symbol_reverse(bits):
-    r = ''
-    for x in range(0, len(bits) - 1, 2):
-        r += bits[x + 1] + bits[x + 0]
-    return r
+interleavers = {}
+
+
+def interleaver(kind, n):
+    # Bit order of the de-interleavers as a cached Permutation per block length
+    if (kind, n) in interleavers:
+        return interleavers[(kind, n)]
+    symbols = [[z + 1, z] for z in range(0, n - 1, 2)]
+    if kind == 2:
+        order = sum([symbols[x] for x in range(len(symbols) - 1, -1, -2)], [])
+        order += sum([symbols[x] for x in range(len(symbols) - 2, -1, -2)], [])
+    elif kind == 3:
+        order = sum([symbols[x] for x in range(len(symbols) - 1, -1, -3)], [])
+        order += sum([symbols[x] for x in range(len(symbols) - 2, -1, -3)], [])
+        order += sum([symbols[x] for x in range(len(symbols) - 3, -1, -3)], [])
+    else:
+        tbl = [40, 39, 36, 35, 32, 31, 28, 27, 24, 23, 20, 19, 16, 15, 12, 11, 8, 7, 4, 3,
+               41,
+               38, 37, 34, 33, 30, 29, 26, 25, 22, 21, 18, 17, 14, 13, 10, 9, 6, 5, 2, 1, 46, 45, 44, 43,
+               42]
+        order = [x - 1 for x in tbl]
+    interleavers[(kind, n)] = Permutation(order)
+    return interleavers[(kind, n)]
 
 
 def de_interleave(group):
-    #    symbols = [''.join(symbol) for symbol in grouped(group, 2)]
-    symbols = [group[z + 1] + group[z] for z in range(0, len(group), 2)]
-    even = ''.join([symbols[x] for x in range(len(symbols) - 2, -1, -2)])
-    odd = ''.join([symbols[x] for x in range(len(symbols) - 1, -1, -2)])
-    return (odd, even)
+    n = len(group)
+    m = n // 2
+    return interleaver(2, n).split(group, ((m + 1) // 2 * 2, m // 2 * 2))
 
 
 def de_interleave3(group):
-    #    symbols = [''.join(symbol) for symbol in grouped(group, 2)]
-    symbols = [group[z + 1] + group[z] for z in range(0, len(group), 2)]
-    third = ''.join([symbols[x] for x in range(len(symbols) - 3, -1, -3)])
-    second = ''.join([symbols[x] for x in range(len(symbols) - 2, -1, -3)])
-    first = ''.join([symbols[x] for x in range(len(symbols) - 1, -1, -3)])
-    return (first, second, third)
+    n = len(group)
+    m = n // 2
+    return interleaver(3, n).split(group, ((m + 2) // 3 * 2, (m + 1) // 3 * 2, m // 3 * 2))
 
 
 def de_interleave_lcw(bits):
-    tbl = [40, 39, 36, 35, 32, 31, 28, 27, 24, 23, 20, 19, 16, 15, 12, 11, 8, 7, 4, 3,
-           41,
-           38, 37, 34, 33, 30, 29, 26, 25, 22, 21, 18, 17, 14, 13, 10, 9, 6, 5, 2, 1, 46, 45, 44, 43,
-           42]
-    lcw = [bits[x - 1:x] for x in tbl]
-    return (''.join(lcw[:7]), ''.join(lcw[7:20]), ''.join(lcw[20:]))
+    return interleaver('lcw', 46).split(bits, (7, 13, 26))
+
+
+syndrome_cache = bch.SyndromeCache()  # BCH syndromes of the current batch
+decode_cache = DecodeCache(decode_cache_size) if decode_cache_size > 0 else None
+
+
+def predeinterleave(msgs):
+    # Deinterleaves the blocks the type detection looks at for a batch of
+    # frames at once, as rows of a bit matrix, and works out the BCH
+    # syndromes of all candidate blocks. Returns one dict per message.
+    pres = [None] * len(msgs)
+    rows = {'lcw': ([], []), 'bc': ([], []), 'ra': ([], [])}
+    start = len(iridium_access)  # uplink_access has the same length
+    for i in range(len(msgs)):
+        q = msgs[i]
+        if q.error:
+            continue
+        l = len(q.bitstream_raw) - start
+        if l < 64:
+            continue
+        head = q.bitstream_raw.get(start, start + 96)  # first 96 data bits, zero padded
+        if l < 96:
+            head <<= 96 - l
+        if head >> 64 == header_messaging_bits.value:
+            continue  # detected without deinterleaving
+        if l >= 96 and head == header_time_location_bits.value:
+            continue
+        pres[i] = {}
+        rows['lcw'][0].append(i)
+        rows['lcw'][1].append(head >> 50)
+        if l >= 70 and (harder or bch.nndivide(hdr_poly, head >> 90) == 0):
+            rows['bc'][0].append(i)
+            rows['bc'][1].append((head >> 26) & ((1 << 64) - 1))
+        if l >= 96:
+            rows['ra'][0].append(i)
+            rows['ra'][1].append(head)
+    for (kind, perm, lengths) in (('lcw', interleaver('lcw', 46), (7, 13, 26)),
+                                  ('bc', interleaver(2, 64), (32, 32)),
+                                  ('ra', interleaver(3, 96), (32, 32, 32))):
+        (idx, values) = rows[kind]
+        if not idx:
+            continue
+        for (i, blocks) in zip(idx, perm.split_batch(values, lengths)):
+            pres[i][kind] = blocks
+    lcw = [pres[i]['lcw'] for i in rows['lcw'][0]]
+    syndrome_cache.add(29, [b[0].value for b in lcw], 7)
+    syndrome_cache.add(41, [b[2].value for b in lcw], 26)
+    syndrome_cache.add(465, [b[1].value << 1 for b in lcw], 14)
+    syndrome_cache.add(465, [(b[1].value << 1) | 1 for b in lcw], 14)
+    blocks = [b for i in rows['bc'][0] for b in pres[i]['bc']] + [b for i in rows['ra'][0] for b in pres[i]['ra']]
+    syndrome_cache.add(ringalert_bch_poly, [b.get(0, 31) for b in blocks], 31)
+    return pres
 
 
 def messagechecksum(msg):
@@ -1689,6 +2042,10 @@ def checksum_16(msg, csum):
     return csum ^ 0xffff
 
 
+def parity(x):
+    return bin(x).count('1') & 1
+
+
 def remove_zeros(l):
     for ele in reversed(l):
         if not ele:
@@ -1698,22 +2055,75 @@ def remove_zeros(l):
 
 
 def group(string, n):  # similar to grouped, but keeps rest at the end
-    string = re.sub('(.{%d})' % n, '\\1 ', string)
+    string = re.sub('(.{%d})' % n, '\\1 ', str(string))
     return string.rstrip()
 
 
-def slice_extra(string, n):
-    blocks = [string[x:x + n] for x in xrange(0, len(string) + 1, n)]
-    extra = blocks.pop()
-    return (blocks, extra)
-
-
 def slice(string, n):
     return [string[x:x + n] for x in range(0, len(string), n)]
 
 
-if output == "dump":
-    file = open(dumpfile, "wb")
+class SplitCollector(object):
+    # Output lines by frame type, e.g. in --jobs workers
+    def __init__(self):
+        self.lines = {}
+
+    def add(self, tag, line):
+        if tag not in self.lines:
+            self.lines[tag] = []
+        self.lines[tag].append(line)
+
+
+class SplitWriter(SplitCollector):
+    # -o split: one file per frame type, written 1024 lines at a time
+    def __init__(self, prefix, flush_lines=1024):
+        super(SplitWriter, self).__init__()
+        self.prefix = prefix
+        self.flush_lines = flush_lines
+        self.files = {}
+
+    def add(self, tag, line):
+        super(SplitWriter, self).add(tag, line)
+        if len(self.lines[tag]) >= self.flush_lines:
+            self._flush(tag)
+
+    def add_lines(self, lines):  # lines as collected by a SplitCollector
+        for tag in lines:
+            for line in lines[tag]:
+                self.add(tag, line)
+
+    def _flush(self, tag):
+        lines = self.lines.pop(tag, None)
+        if not lines:
+            return
+        if tag not in self.files:
+            self.files[tag] = open("%s.%s" % (self.prefix, tag), "w", 1 << 16)
+        self.files[tag].write("\n".join(lines) + "\n")
+
+    def flush(self):
+        for tag in list(self.lines):
+            self._flush(tag)
+        for f in self.files.values():
+            f.flush()
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+
+if output == "store":
+    store_out = framestore.StoreWriter(storefile)
+
+if output == "columnar":
+    columnar_out = columnar.ColumnarWriter(columnar_dir)
+
+if output == "split":
+    split_out = SplitWriter(split_prefix)
+
+if output == "reassemble":
+    reassembler.outfile = sys.stdout
+    reassemble_out = reassembler.reassembler_for(reassemble_mode)
 
 if output == "plot":
     import matplotlib.pyplot as plt
@@ -1726,30 +2136,424 @@ if output == "plot":
 selected = []
 
 
-def do_input(type):
-    if type == "raw":
-        for line in fileinput.input(remainder):
-            if good:
-                q = Message(line.strip())
-                if q.confidence < min_confidence:
+class FrameCollector(object):
+    # Runs the filter of a reassembler on the frames of a --jobs worker,
+    # the reassembly itself is done in order by the main process
+    def __init__(self, reassembler):
+        self.reassembler = reassembler
+        self.filtered = []
+
+    def frame(self, q):
+        self.filtered.append(self.reassembler.filter_frame(q))
+
+
+class FrameRecord(object):
+    # Compact copy of a frame for the outputs that keep frames until the end
+    # (sat/msg/err/plot): only the fields used there and the pretty() line,
+    # so the decoded frame itself can be freed right away.
+    __slots__ = ('text',)
+    fields = ()
+    keep_text = True
+
+    def __init__(self, q):
+        for f in self.fields:
+            setattr(self, f, getattr(q, f))
+        if self.keep_text:
+            try:
+                self.text = q.pretty()
+            except Exception as e:  # fail when it is printed, like before
+                self.text = e
+
+    def pretty(self):
+        if isinstance(self.text, Exception):
+            raise self.text
+        return self.text
+
+
+class SatRecord(FrameRecord):
+    __slots__ = ('frequency', 'globaltime', 'fdiff', 'satno')
+    fields = ('frequency', 'globaltime')
+
+
+class ErrRecord(FrameRecord):
+    __slots__ = ('error_msg',)
+    fields = ('error_msg',)
+
+
+class MsgRecord(FrameRecord):
+    __slots__ = ('msg_ric', 'msg_seq', 'msg_checksum', 'msg_ctr', 'msg_ctr_max', 'msg_ascii', 'globaltime', 'msgs')
+    fields = ('msg_ric', 'msg_seq', 'msg_checksum', 'msg_ctr', 'msg_ctr_max', 'msg_ascii', 'globaltime')
+    keep_text = False
+
+
+class PlotRecord(FrameRecord):
+    __slots__ = ('values', 'globaltime')
+    fields = ('globaltime',)
+    keep_text = False
+
+    def __init__(self, q):
+        super(PlotRecord, self).__init__(q)
+        names = list(plotargs)
+        if names[0] == "time":
+            names[0] = "globaltime"
+        self.values = [q.__dict__[x] for x in names[:3]]
+
+
+# Tokenizer for where the lines are read, install_profile() only wraps
+# bitutils.tokenize_line so the tokenize stage counts the decoding side
+read_tokenize = bitutils.tokenize_line
+
+
+def line_fallback(line):
+    # The start time fallback depends on all lines before, so it is worked
+    # out where the lines are read and not where they are decoded.
+    m = read_tokenize(line)
+    if m:
+        filename = m[1]
+        if filename == "/dev/stdin":
+            filename = "-"
+        if filename_globaltime(filename, m[2]) is None:
+            return fallback_globaltime(m[2])
+    return None
+
+
+def file_lines():  # (lineno, line, fallback) of the input files one after the other
+    for line in fileinput.input(remainder, openhook=compressed.hook):
+        line = line.strip()
+        yield (fileinput.lineno(), line, line_fallback(line))
+
+
+class Checkpoint(object):
+    # Read position of each input file plus the time fallback state, so a
+    # later run (--checkpoint) only decodes the lines added since.
+    VERSION = 1
+
+    def __init__(self, fname):
+        global tsoffset, maxts, tswarning
+        self.fname = fname
+        self.files = {}
+        self.lineno = 0
+        try:
+            with open(fname) as f:
+                state = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if not isinstance(state, dict) or state.get('version') != self.VERSION:
+            return
+        self.files = state['files']
+        self.lineno = state['lineno']
+        (tsoffset, maxts, tswarning) = (state['tsoffset'], state['maxts'], state['tswarning'])
+
+    def start(self, fname, st):  # where to continue in a file, 0 if it was replaced or truncated
+        saved = self.files.get(fname)
+        if saved is None or saved['inode'] != st.st_ino or saved['offset'] > st.st_size:
+            return 0
+        return saved['offset']
+
+    def save(self):
+        state = {'version': self.VERSION, 'files': self.files, 'lineno': self.lineno,
+                 'tsoffset': tsoffset, 'maxts': maxts, 'tswarning': tswarning}
+        tmp = self.fname + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+        os.rename(tmp, self.fname)
+
+
+def checkpoint_lines(cp, follow=False, poll=0.1):
+    # (lineno, line, fallback) of the input files from where cp says the
+    # last run stopped. A line only counts once it has its newline, the
+    # rest is left for later. With follow, waits for more lines and reopens
+    # files that were rotated (new inode) or truncated.
+    inputs = []
+    for fname in remainder:
+        f = open(fname, "rb")
+        st = os.fstat(f.fileno())
+        offset = cp.start(fname, st)
+        f.seek(offset)
+        inputs.append([fname, f, offset, st.st_ino])
+    while True:
+        for inp in inputs:
+            (fname, f, offset, inode) = inp
+            while True:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    f.seek(offset)
+                    break
+                offset += len(line)
+                cp.lineno += 1
+                cp.files[fname] = {'offset': offset, 'inode': inode}
+                inp[2] = offset
+                line = line.decode("utf-8", "replace").strip()
+                yield (cp.lineno, line, line_fallback(line))
+        if not follow:
+            break
+        cp.save()
+        sys.stdout.flush()
+        time.sleep(poll)
+        for inp in inputs:
+            (fname, f, offset, inode) = inp
+            try:
+                st = os.stat(fname)
+            except OSError:  # in the middle of being rotated
+                continue
+            if st.st_ino != inode:
+                if f.read(1):  # finish the old file first
+                    f.seek(offset)
                     continue
-                perline(q.upgrade())
+                f.close()
+                inp[1:] = [open(fname, "rb"), 0, st.st_ino]
+            elif st.st_size < offset:
+                f.seek(0)
+                inp[2] = 0
+    for inp in inputs:
+        inp[1].close()
+
+
+class InputClock(object):
+    # fallback_globaltime() for one of several inputs read side by side
+    def __init__(self):
+        self.tsoffset = 0
+        self.maxts = 0
+
+    def globaltime(self, timestamp):
+        global tswarning
+        if not tswarning:
+            print("Warning: no timestamp found in filename", file=sys.stderr)
+            tswarning = True
+        ts = self.tsoffset + float(timestamp) / 1000
+        if ts < self.maxts:
+            self.tsoffset = self.maxts
+            ts = self.tsoffset + float(timestamp) / 1000
+        self.maxts = ts
+        return ts
+
+
+def timed_lines(n, fname):  # (globaltime, n, lineno, line, fallback, bits) of one input
+    f = sys.stdin if fname == "-" else compressed.open_input(fname)
+    clock = InputClock()
+    ts = 0
+    lineno = 0
+    for line in f:
+        lineno += 1
+        line = line.strip()
+        fallback = None
+        bits = None
+        m = read_tokenize(line)
+        if m:
+            filename = m[1]
+            if filename == "/dev/stdin":
+                filename = "-"
+            gt = filename_globaltime(filename, m[2])
+            if gt is None:
+                fallback = ts = clock.globaltime(m[2])
             else:
-                perline(Message(line.strip()).upgrade())
-    elif type == "dump":
-        file = open(dumpfile, "rb")
+                ts = gt[0]
+            bits = m[9]
+        yield (ts, n, lineno, line, fallback, bits)  # lines that do not parse keep their place
+    if f is not sys.stdin:
+        f.close()
+
+
+def merge_lines(files, window=None):
+    # (lineno, line, fallback) of all inputs in globaltime order, only one
+    # line per input is held. With a window (seconds), lines with the same
+    # bits as an earlier one up to window seconds before are dropped.
+    global merge_dups
+    seen = {}
+    recent = collections.deque()
+    for (ts, n, lineno, line, fallback, bits) in heapq.merge(*[timed_lines(n, f) for (n, f) in enumerate(files)]):
+        if window is not None and bits is not None:
+            while recent and recent[0][0] < ts - window:
+                (t, b) = recent.popleft()
+                if seen.get(b) == t:
+                    del seen[b]
+            if bits in seen:
+                merge_dups += 1
+                continue
+            seen[bits] = ts
+            recent.append((ts, bits))
+        yield (lineno, line, fallback)
+
+
+def read_chunks(lines, size):
+    chunk = []
+    for l in lines:
+        chunk.append(l)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_chunk(chunk):  # runs in a worker, returns everything perline() would have written
+    global errorstats, errorfile, vdumpfile, store_out, columnar_out, split_out, reassemble_out
+    stdout = sys.stdout
+    sys.stdout = io.StringIO()
+    if errorfile != None:
+        errorfile = io.StringIO()
+    if vdumpfile != None:
+        vdumpfile = io.BytesIO()
+    if output == "store":
+        store_out = framestore.RecordCollector()
+    if output == "columnar":
+        columnar_out = columnar.RowCollector()
+    if output == "split":
+        split_out = SplitCollector()
+    if output == "reassemble":
+        if not isinstance(reassemble_out, FrameCollector):
+            reassemble_out = FrameCollector(reassemble_out)
+        reassemble_out.filtered = []
+    if isinstance(errorstats, collections.abc.Mapping):
+        errorstats = {}
+    del selected[:]
+    if decode_cache is not None:
+        (hits, misses) = (decode_cache.hits, decode_cache.misses)
+    if profile is not None:
+        profile.take()  # only count this chunk
+        profile.next_write = None
+    failed = None
+    try:
+        decode_messages((Message(line, lineno, fallback) for (lineno, line, fallback) in chunk), batchsize)
+    except Exception as e:  # hand over what was written before the failing line
+        failed = e
+    text = sys.stdout.getvalue()
+    sys.stdout = stdout
+    return (text,
+            errorfile.getvalue() if errorfile != None else None,
+            vdumpfile.getvalue() if vdumpfile != None else None,
+            store_out.records if output == "store" else None,
+            columnar_out.rows if output == "columnar" else None,
+            split_out.lines if output == "split" else None,
+            reassemble_out.filtered if output == "reassemble" else None,
+            errorstats, list(selected),
+            (decode_cache.hits - hits, decode_cache.misses - misses) if decode_cache is not None else None,
+            profile.take() if profile is not None else None,
+            failed)
+
+
+def collect_chunk(res):
+    (text, errtext, vdump, records, rows, lines, filtered, stats, sel, cachestats, profiled, failed) = res
+    sys.stdout.write(text)
+    if errtext:
+        errorfile.write(errtext)
+    if vdump:
+        vdumpfile.write(vdump)
+    if records:
+        store_out.add_records(records)
+    if rows:
+        columnar_out.add_rows(rows)
+    if lines:
+        split_out.add_lines(lines)
+    if filtered:
+        for f in filtered:
+            reassemble_out.stat_line += 1
+            reassemble_out.add(f)
+    if isinstance(stats, collections.abc.Mapping):
+        for msg in stats:
+            errorstats[msg] = errorstats.get(msg, 0) + stats[msg]
+    selected.extend(sel)
+    if cachestats is not None:
+        decode_cache.hits += cachestats[0]
+        decode_cache.misses += cachestats[1]
+    if profiled is not None:
+        profile.merge(profiled)
+        profile.tick()
+    if failed is not None:
+        raise failed
+
+
+def do_input_parallel(lines, chunksize=256):
+    import multiprocessing
+    # Buffered output would be written again by every worker
+    sys.stdout.flush()
+    for f in (errorfile, vdumpfile):
+        if f != None:
+            f.flush()
+    if output == "store":
+        store_out.flush()
+    if output == "split":
+        split_out.flush()
+    pool = multiprocessing.get_context("fork").Pool(jobs)
+    pending = collections.deque()
+    for chunk in read_chunks(lines, chunksize):
+        pending.append(pool.apply_async(parse_chunk, (chunk,)))
+        if len(pending) > 2 * jobs:
+            collect_chunk(pending.popleft().get())
+    while pending:
+        collect_chunk(pending.popleft().get())
+    pool.close()
+    pool.join()
+
+
+def decode_batch(msgs):
+    syndrome_cache.clear()
+    if len(msgs) > 1:
+        pres = predeinterleave(msgs)
+    else:
+        pres = [None] * len(msgs)
+    for (q, pre) in zip(msgs, pres):
+        perline(q.upgrade(pre))
+
+
+def decode_messages(messages, size):
+    # Upgrades size messages at a time so the deinterleaving is done for
+    # all of them together. Messages read before a failing line are still
+    # decoded and written.
+    batch = []
+    try:
+        for q in messages:
+            if good and q.confidence < min_confidence:
+                continue
+            batch.append(q)
+            if len(batch) >= size:
+                (todo, batch) = (batch, [])
+                decode_batch(todo)
+    finally:
+        decode_batch(batch)
+
+
+def do_input(type):
+    if type == "raw" and checkpoint is not None:
+        lines = checkpoint_lines(checkpoint, follow)
         try:
-            while True:
-                q = pickle.load(file)
-                perline(q)
-        except EOFError:
-            pass
+            if jobs > 1:
+                do_input_parallel(lines)
+            else:
+                decode_messages((Message(line, lineno, fallback) for (lineno, line, fallback) in lines), batchsize)
+        except KeyboardInterrupt:  # the way to stop --follow
+            if not follow:
+                raise
+        checkpoint.save()
+    elif type == "raw" and merge:
+        lines = merge_lines(remainder or ["-"], dedupe)
+        if jobs > 1:
+            do_input_parallel(lines)
+        else:
+            decode_messages((Message(line, lineno, fallback) for (lineno, line, fallback) in lines), batchsize)
+    elif type == "raw" and jobs > 1:
+        do_input_parallel(file_lines())
+    elif type == "raw":
+        decode_messages((Message(line.strip()) for line in fileinput.input(remainder, openhook=compressed.hook)), batchsize)
+    elif type == "store":
+        store = framestore.FrameStore(storefile)
+        types = None
+        if linefilter['type'] != "All":
+            types = [linefilter['type']]
+        for q in store.frames(globals(), types, *timerange):
+            perline(q)
+        store.close()
     else:
         print("Unknown input mode.", file=sys.stderr)
         exit(1)
 
 
 def perline(q):
+    if profile is not None:
+        profile.count("classes", type(q).__name__)
+        if q.error:
+            profile.count("errors", q.error_msg[0])
+        profile.tick()
     if dosatclass == True:
         sat = satclass.classify(q.frequency, q.globaltime)
         q.satno = int(sat.name)
@@ -1784,7 +2588,7 @@ def perline(q):
         return
     if linefilter['attr'] and linefilter['attr'] not in q.__dict__:
         return
-    if linefilter['check'] and not eval(linefilter['check']):
+    if check_code is not None and not eval(check_code):
         return
     if vdumpfile != None and type(q).__name__ == "IridiumVOMessage":
         if len(q.voice) != 312:
@@ -1794,29 +2598,29 @@ def perline(q):
             vdumpfile.write(chr(byte))
     if output == "err":
         if (q.error):
-            selected.append(q)
+            selected.append(ErrRecord(q))
     elif output == "msg":
         if type(q).__name__ == "IridiumMessagingAscii" and not q.error:
-            selected.append(q)
+            selected.append(MsgRecord(q))
     elif output == "sat":
         # if not q.error and not q.oddbits == "1011":
         if not q.error:
-            selected.append(q)
-    elif output == "dump":
-        pickle.dump(q, file, 1)
+            selected.append(SatRecord(q))
+    elif output == "store":
+        store_out.add(q)
+    elif output == "columnar":
+        if not q.error:
+            columnar_out.add(q)
     elif output == "plot":
-        selected.append(q)
+        selected.append(PlotRecord(q))
     elif output == "line":
-        if (q.error):
-            print(q.pretty() + " ERR:" + ", ".join(q.error_msg))
-        else:
-            if not ofmt:
-                print(q.pretty())
-            else:
-                q.globaltime = "%.6f" % (q.globaltime)
-                if ("iri_time_diff" in q.__dict__):
-                    q.iri_time_diff = "%.6f" % (q.iri_time_diff)
-                print(" ".join([str(q.__dict__[x]) for x in ofmt]))
+        print(frame_line(q, ofmt))
+    elif output == "split":
+        text = q.pretty()
+        tag = text.split(":", 1)[0]
+        split_out.add(tag, frame_line(q, split_formats.get(tag, ofmt), text))
+    elif output == "reassemble":
+        reassemble_out.frame(q)
     elif output == "rxstats":
         print("RX", "X", q.globaltime, q.frequency, "X", "X", q.confidence, q.level, q.symbols, q.error,
               type(q).__name__)
@@ -1825,12 +2629,62 @@ def perline(q):
         exit(1)
 
 
-def bitdiff(a, b):
-    return len(filter((lambda x_y: x_y[0] != x_y[1]), izip(a, b)))
+def frame_line(q, fmt, text=None):  # output line of q, text is q.pretty() if already known
+    if q.error:
+        return (text or q.pretty()) + " ERR:" + ", ".join(q.error_msg)
+    if not fmt:
+        return text or q.pretty()
+    q.globaltime = "%.6f" % (q.globaltime)
+    if ("iri_time_diff" in q.__dict__):
+        q.iri_time_diff = "%.6f" % (q.iri_time_diff)
+    return " ".join([str(q.__dict__[x]) for x in fmt])
 
 
+def bitdiff(a, b):
+    return len(list(filter((lambda x_y: x_y[0] != x_y[1]), izip(a, b))))
+
+
+def install_profile(p):  # wraps the functions of each decoding stage
+    g = globals()
+    p.wrap_attr(bitutils, 'tokenize_line', 'tokenize')
+    p.wrap_attr(Message, '__init__', 'line')
+    p.wrap_attr(Message, 'upgrade', 'access')
+    p.wrap_attr(IridiumMessage, '__init__', 'type')
+    p.wrap_attr(IridiumMessage, 'upgrade', 'decode')
+    for name in ('predeinterleave', 'de_interleave', 'de_interleave3', 'de_interleave_lcw'):
+        g[name] = p.wrap('deinterleave', g[name])
+    for name in ('add', 'syndrome', 'repair', 'bch_repair'):
+        p.wrap_attr(syndrome_cache, name, 'bch')
+    p.wrap_attr(rs, 'rs_fix', 'rs')
+    p.wrap_attr(rs6, 'rs_fix', 'rs')
+    for name in ('iip_crc24', 'ida_crc16'):
+        g[name] = p.wrap('crc', g[name])
+    for cls in list(g.values()):
+        if isinstance(cls, type) and issubclass(cls, Message) and 'pretty' in cls.__dict__:
+            p.wrap_attr(cls, 'pretty', 'pretty')
+    g['perline'] = p.wrap('output', perline)
+
+
+if profile_stages or profile_json is not None:
+    import stageprof
+    profile = stageprof.StageProfile(profile_json, profile_interval)
+    install_profile(profile)
+
+checkpoint = Checkpoint(checkpoint_file) if checkpoint_file is not None else None
 do_input(input)
 
+if output == "columnar":
+    columnar_out.close()
+
+if output == "store":
+    store_out.close()
+
+if output == "split":
+    split_out.close()
+
+if output == "reassemble":
+    reassemble_out.end()
+
 if output == "sat":
     print("SATs:")
     sats = []
@@ -1858,10 +2712,21 @@ if output == "sat":
 
 if isinstance(errorstats, collections.abc.Mapping):
     total = 0
-    for (msg, count) in sorted(errorstats.iteritems()):
+    for (msg, count) in sorted(errorstats.items()):
         total += count
         print("%7d: %s" % (count, msg), file=sys.stderr)
     print("%7d: %s" % (total, "Total"), file=sys.stderr)
+    if dedupe is not None:
+        print("%7d: %s" % (merge_dups, "Duplicate lines dropped"), file=sys.stderr)
+    if decode_cache is not None:
+        print("%7d: %s" % (decode_cache.hits, "Decode cache hits"), file=sys.stderr)
+        print("%7d: %s" % (decode_cache.misses, "Decode cache misses"), file=sys.stderr)
+
+if profile is not None:
+    if profile_stages:
+        profile.report(sys.stderr)
+    if profile_json is not None:
+        profile.write_json(profile_json)
 
 if output == "err":
     print("### ")
@@ -1954,10 +2819,10 @@ if output == "plot":
         plotsats(plt, selected[0].globaltime, selected[-1].globaltime)
 
     for m in selected:
-        xl.append(m.__dict__[plotargs[0]])
-        yl.append(m.__dict__[plotargs[1]])
+        xl.append(m.values[0])
+        yl.append(m.values[1])
         if len(plotargs) > 2:
-            cl.append(m.__dict__[plotargs[2]])
+            cl.append(m.values[2])
 
     if len(plotargs) > 2:
         '''
@@ -1973,6 +2838,13 @@ if output == "plot":
     plt.savefig(re.sub('[/ ]', '_', name) + ".png")
     plt.show()
 
+# Compressed outputs are only complete once closed
+for f in (errorfile, vdumpfile):
+    if f != None:
+        f.close()
+if outfile != None:
+    sys.stdout.close()
+
 
 def objprint(q):
     for i in dir(q):
@@ -0,0 +1,140 @@
+#!/usr/bin/python
+# vim: set ts=4 sw=4 tw=0 et pm=:
+
+# pcap and pcapng files for "reassembler.py -m lap".
+#
+# Records are packed with precompiled struct.Struct templates and kept in
+# memory until BUFSIZE bytes are pending, then written in one go. pcapng
+# files have nanosecond timestamps and an interface per name passed to
+# write() (e.g. one per channel or direction). Both can start a new file
+# after rotate_size bytes or rotate_time seconds of capture time; the
+# files are <name>, <name>-1, <name>-2, ... (before the extension).
+
+import re
+import struct
+import compressed
+
+BUFSIZE = 1 << 20
+
+pcap_hdr = struct.Struct("<LHHlLLL")
+pcap_rec = struct.Struct("<IIII")
+
+ng_block = struct.Struct("<LL")  # block type, total length
+ng_shb = struct.Struct("<LLLHHq")  # section header: type, length, byte order magic, version, section length
+ng_idb = struct.Struct("<LLHHL")  # interface description: type, length, linktype, reserved, snaplen
+ng_opt = struct.Struct("<HH")  # option code, length
+ng_epb = struct.Struct("<LLLLLLL")  # enhanced packet: type, length, interface, ts high, ts low, caplen, len
+ng_len = struct.Struct("<L")  # trailing total length
+
+
+def parse_size(s):  # "100M" -> 104857600
+    m = re.match(r'^(\d+)([kKmMgG]?)$', s)
+    if not m:
+        raise ValueError("invalid size: " + s)
+    return int(m.group(1)) << {'': 0, 'k': 10, 'm': 20, 'g': 30}[m.group(2).lower()]
+
+
+def rotated_name(name, n):  # out.pcap.gz -> out-<n>.pcap.gz
+    m = re.match(r'^(.*?)((\.[^./]*)?(\.(gz|xz|bz2))?)$', name)
+    return "%s-%d%s" % (m.group(1), n, m.group(2))
+
+
+def _pad(data):
+    return data + b"\0" * (-len(data) % 4)
+
+
+class PcapWriter(object):
+    # Classic pcap with microsecond timestamps, the interface is ignored
+    def __init__(self, f, name=None, linktype=1, snaplen=0xffff, rotate_size=None, rotate_time=None,
+                 bufsize=BUFSIZE):
+        # f is the open (binary) output file, name its name, only needed to rotate
+        if (rotate_size or rotate_time) and not name:
+            raise ValueError("rotating needs the file name")
+        self.f = f
+        self.name = name
+        self.linktype = linktype
+        self.snaplen = snaplen
+        self.rotate_size = rotate_size
+        self.rotate_time = rotate_time
+        self.bufsize = bufsize
+        self.files = 1
+        self.start = None  # capture time of the first record in this file
+        self.begin()
+
+    def begin(self):  # header of a new file
+        self.buf = []
+        self.pending = 0
+        self.size = 0
+        self.add(self.header())
+
+    def header(self):
+        return pcap_hdr.pack(0xa1b2c3d4, 2, 4, 0, 0, self.snaplen, self.linktype)
+
+    def record(self, time, data, iface):
+        sec = int(time)
+        return pcap_rec.pack(sec, int(1000000 * (time - sec)), len(data), len(data)) + data
+
+    def add(self, b):
+        self.buf.append(b)
+        self.pending += len(b)
+        self.size += len(b)
+        if self.pending >= self.bufsize:
+            self.flush()
+
+    def write(self, time, data, iface=None):
+        if self.start is None:
+            self.start = time
+        elif (self.rotate_time and time - self.start >= self.rotate_time) or \
+                (self.rotate_size and self.size + len(data) > self.rotate_size):
+            self.rotate()
+            self.start = time
+        self.add(self.record(time, data, iface))
+
+    def rotate(self):
+        self.flush()
+        if self.files > 1:  # the first one belongs to the caller
+            self.f.close()
+        self.f = compressed.open_output(rotated_name(self.name, self.files), "wb")
+        self.files += 1
+        self.begin()
+
+    def flush(self):
+        if self.buf:
+            self.f.write(b"".join(self.buf))
+            self.buf = []
+            self.pending = 0
+
+    def close(self):
+        self.flush()
+        if self.files > 1:
+            self.f.close()
+        else:
+            self.f.flush()
+
+
+class PcapngWriter(PcapWriter):
+    # pcapng with nanosecond timestamps and one interface per name
+    def begin(self):
+        self.interfaces = {}  # name -> interface id, per section (file)
+        super(PcapngWriter, self).begin()
+
+    def header(self):
+        return ng_shb.pack(0x0a0d0d0a, 28, 0x1a2b3c4d, 1, 0, -1) + ng_len.pack(28)
+
+    def interface(self, name):
+        opts = b""
+        if name is not None:
+            opts += ng_opt.pack(2, len(name)) + _pad(name.encode())  # if_name
+        opts += ng_opt.pack(9, 1) + _pad(b"\x09")  # if_tsresol: 10^-9
+        opts += ng_opt.pack(0, 0)
+        n = 20 + len(opts)
+        self.add(ng_idb.pack(1, n, self.linktype, 0, self.snaplen) + opts + ng_len.pack(n))
+        self.interfaces[name] = len(self.interfaces)
+
+    def record(self, time, data, iface):
+        if iface not in self.interfaces:
+            self.interface(iface)
+        ts = int(round(time * 1000000000))
+        n = 32 + len(data) + (-len(data) % 4)
+        return ng_epb.pack(6, n, self.interfaces[iface], ts >> 32, ts & 0xffffffff, len(data), len(data)) + \
+            _pad(data) + ng_len.pack(n)
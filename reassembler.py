@@ -8,8 +8,14 @@ import datetime
 import re
 import struct
 import math
+import heapq
+import collections
 import os
 import socket
+import traceback
+import compressed
+import pcapwriter
+import copy
 from copy import deepcopy
 
 verbose = False
@@ -19,74 +25,9 @@ mode = "undef"
 base_freq = 1616e6
 channel_width = 41667
 args = {}
-
-options, remainder = getopt.getopt(sys.argv[1:], 'vhi:o:m:sa:', [
-    'verbose',
-    'help',
-    'input=',
-    'output=',
-    'mode=',
-    'state',
-    'args=',
-])
-
-for opt, arg in options:
-    if opt in ('-v', '--verbose'):
-        verbose = True
-    elif opt in ('-i', '--input'):
-        ifile = arg
-    elif opt in ('-o', '--output'):
-        ofile = arg
-    elif opt in ('-m', '--mode'):
-        mode = arg
-    elif opt in ('-a', '--args'):
-        for a in arg.split(","):
-            args[a] = True
-    elif opt in ('-h', '--help'):
-        print >> sys.stderr, "Usage:"
-        print >> sys.stderr, "\t", os.path.basename(
-            sys.argv[0]), "[-v] [--input foo.parsed] --mode [ida|lap|sbd|page|msg|sat] [--output foo.parsed]"
-        exit(1)
-    else:
-        raise Exception("unknown argument?")
-
-basename = None
-if ifile == None:
-    if not remainder:
-        basename = "stdin"
-        ifile = "/dev/stdin"
-    else:
-        ifile = remainder[0]
-
-if not basename:
-    basename = re.sub('\.[^.]*$', '', ifile)
-#    basename=os.path.basename(re.sub('\.[^.]*$','',ifile))
-
-if ofile == None:
-    ofile = "%s.%s" % (basename, mode)
-    outfile = sys.stdout
-elif ofile == "" or ofile == "=":
-    ofile = "%s.%s" % (basename, mode)
-    outfile = open(ofile, "w")
-else:
-    basename = re.sub('\.[^.]*$', '', ofile)
-    outfile = open(ofile, "w")
-
+outfile = sys.stdout
 state = None
-if 'state' in args:
-    import pickle
-
-    statefile = "%s.state" % (mode)
-    try:
-        with open(statefile) as f:
-            state = pickle.load(f)
-    except (IOError, EOFError):
-        pass
-
-if verbose:
-    print("ifile", ifile)
-    print("ofile", ofile)
-    print("basen", basename)
+statefile = None
 
 
 class MyObject(object):
@@ -97,10 +38,7 @@ class MyObject(object):
         else:
             self.frequency = int(self.frequency)
 
-        if '-' in self.name:
-            self.starttime, _, self.attr = self.name[1 + self.name.index('-'):].partition('-')
-        else:
-            self.starttime = self.attr = ''
+        self.starttime, self.attr = name_parts(self.name)
 
         self.confidence = int(self.confidence.strip("%"))
         self.mstime = float(self.mstime)
@@ -116,17 +54,114 @@ class MyObject(object):
             try:
                 self.level = math.log(float(self.level), 10) * 20
             except ValueError:
-                print >> sys.stderr, "Invalid signal level:", self.level
+                print("Invalid signal level:", self.level, file=sys.stderr)
                 self.level = 0
 
-        if (self.name.startswith("j")):
-            self.time = self.mstime
-        else:
-            try:
-                # XXX: Does not handle really old time format.
-                self.time = float(self.starttime) + self.mstime / 1000
-            except ValueError:
-                self.time = self.mstime / 1000
+        self.time = line_time(self.name, self.starttime, self.mstime)
+
+
+def name_parts(name):  # (starttime, attr) of a file name like i-<starttime>-<attr>
+    if '-' in name:
+        starttime, _, attr = name[1 + name.index('-'):].partition('-')
+        return (starttime, attr)
+    return ('', '')
+
+
+def line_time(name, starttime, mstime):
+    if (name.startswith("j")):
+        return mstime
+    try:
+        # XXX: Does not handle really old time format.
+        return float(starttime) + mstime / 1000
+    except ValueError:
+        return mstime / 1000
+
+
+# Line type of the frame classes of iridium-parser.py, for frames passed in
+# directly (Reassemble.frame) instead of as text
+frame_tags = {
+    'Message': 'RAW',
+    'IridiumMessage': 'IRI',
+    'IridiumSYMessage': 'ISY',
+    'IridiumSTLMessage': 'ITL',
+    'IridiumECCMessage': 'IME',
+    'IridiumLCWMessage': 'IDA',
+    'IridiumBCMessage': 'IBC',
+    'IridiumRAMessage': 'IRA',
+    'IridiumMSMessage': 'IMS',
+    'IridiumMessagingAscii': 'MSG',
+    'IridiumMessagingUnknown': 'MS3',
+}
+
+
+def frame_tag(f):
+    for attr in ('utype', 'vtype', 'itype'):  # IridiumLCW3Message, IridiumVOMessage, IridiumIPMessage
+        if attr in f.__dict__ and type(f).__name__ not in frame_tags:
+            return f.__dict__[attr]
+    return frame_tags.get(type(f).__name__)
+
+
+def frame_object(f):
+    # What filter() and enrich() make of the line of frame f (as printed
+    # without --globaltime, so time is not f.globaltime)
+    q = MyObject()
+    q.typ = "%s:" % frame_tag(f)
+    q.name = f.filename
+    q.frequency = f.frequency
+    q.confidence = f.confidence
+    q.mstime = float("%.4f" % f.timestamp)  # as printed
+    q.starttime, q.attr = name_parts(q.name)
+    q.time = line_time(q.name, q.starttime, q.mstime)
+    q.uldl = ("DL", "UL")[f.uplink]
+    q.snr = None
+    q.noise = None
+    try:
+        q.level = math.log(float("%.3f" % f.level), 10) * 20
+    except ValueError:
+        q.level = 0
+    return q
+
+
+class Dedupe(object):
+    # Frames seen before within window seconds (repeats, a second receiver):
+    # same key, e.g. (payload, direction, ctr), and frequency within freq_tol
+    def __init__(self, window, freq_tol):
+        self.window = window
+        self.freq_tol = freq_tol
+        self.seen = {}  # key -> [(time, frequency), ...] in arrival order
+        self.order = collections.deque()  # (time, key) in arrival order
+        self.lookups = 0
+        self.hits = 0
+
+    def dupe(self, time, key, freq):
+        while self.order and self.order[0][0] < time - self.window:
+            (_, k) = self.order.popleft()
+            entries = self.seen[k]
+            del entries[0]
+            if not entries:
+                del self.seen[k]
+        self.lookups += 1
+        for (t, f) in self.seen.get(key, ()):
+            if abs(t - time) <= self.window and abs(f - freq) < self.freq_tol:
+                self.hits += 1
+                return True
+        self.seen.setdefault(key, []).append((time, freq))
+        self.order.append((time, key))
+        return False
+
+    def report(self):
+        print("Dedupe: %d/%d (%3.1f%%) duplicates dropped" % (
+            self.hits, self.lookups, 100.0 * self.hits / self.lookups if self.lookups else 0), file=sys.stderr)
+
+
+def split_line(line):
+    try:
+        q = MyObject()
+        q.typ, q.name, q.mstime, q.frequency, q.confidence, q.level, q.symbols, q.uldl, q.data = line.split(None, 8)
+        return q
+    except ValueError:
+        print("Couldn't parse input line: ", line, file=sys.stderr, end="")
+        return None
 
 
 class Reassemble(object):
@@ -135,31 +170,52 @@ class Reassemble(object):
 
     stat_line = 0
     stat_filter = 0
+    types = None  # line types (e.g. "IDA:") filter_line() takes, None for all
+    outfile = None
+    followers = ()  # more consumers of what process() returns
 
     def run(self, producer):
-        for line in producer:
-            res = self.filter(line)
-            if res != None:
-                self.stat_filter += 1
-                zz = self.process(res)
-                if zz != None:
-                    for mo in zz:
-                        self.consume(mo)
-        self.end()
+        try:
+            for line in producer:
+                self.add(self.filter(line))
+            self.end()
+        finally:
+            self.close()
+
+    def frame(self, f):
+        # Takes a decoded frame from iridium-parser.py instead of its line,
+        # call end() after the last one
+        self.stat_line += 1
+        self.add(self.filter_frame(f))
+
+    def filter_frame(self, f):
+        raise Exception("%s does not take frames" % type(self).__name__)
+
+    def close(self):  # after end(), flushes buffered output
+        pass
+
+    def add(self, res):
+        if res != None:
+            self.stat_filter += 1
+            zz = self.process(res)
+            if zz != None:
+                for mo in zz:
+                    self.consume(mo)
+                    for r in self.followers:
+                        r.consume(mo)
 
     def filter(self, line):
         self.stat_line += 1
-        try:
-            q = MyObject()
-            q.typ, q.name, q.mstime, q.frequency, q.confidence, q.level, q.symbols, q.uldl, q.data = line.split(None, 8)
-            return q
-        except ValueError:
-            print >> sys.stderr, "Couldn't parse input line: ", line,
-            return None
+        q = split_line(line)
+        if q == None: return None
+        return self.filter_line(q)
+
+    def filter_line(self, q):  # q is the line split by split_line()
+        return q
 
     def end(self):
         print("Kept %d/%d (%3.1f%%) lines" % (
-            self.stat_filter, self.stat_line, 100.0 * self.stat_filter / self.stat_line))
+            self.stat_filter, self.stat_line, 100.0 * self.stat_filter / self.stat_line if self.stat_line else 0))
 
 
 class StatsPKT(Reassemble):
@@ -185,10 +241,7 @@ class StatsPKT(Reassemble):
 
     r1 = re.compile('UW:0-LCW:0-FIX:0')
 
-    def filter(self, line):
-        q = super(StatsPKT, self).filter(line)
-
-        if q == None: return None
+    def filter_line(self, q):
         if q.typ[3] != ":": return None
         if q.typ == "RAW:": return None
         if q.typ == "IME:": return None
@@ -199,19 +252,28 @@ class StatsPKT(Reassemble):
         q.enrich()
         return q
 
+    def filter_frame(self, f):
+        if type(f).__name__ in ('Message', 'IridiumECCMessage'):  # RAW:, IME:
+            return None
+        if 'perfect' in args:
+            for attr in ('ec_uw', 'ec_lcw', 'fixederrs'):
+                if f.__dict__.get(attr, 0):
+                    return None
+        return frame_object(f)
+
     def process(self, q):
         maptime = q.time - (q.time % self.intvl)
         typ = q.typ[0:3]
         rv = None
 
-        if maptime > self.timeslot:
+        if self.timeslot is None or maptime > self.timeslot:  # None sorted first in python2
             # dump last time interval
             if self.loaded:
-                print >> sys.stderr, "# Statefile (%s) not relevant to current file: %s" % (self.timeslot, maptime)
+                print("# Statefile (%s) not relevant to current file: %s" % (self.timeslot, maptime), file=sys.stderr)
                 sys.exit(1)
             if self.timeslot is not None:
                 if self.first:
-                    print >> sys.stderr, "# First period may be incomplete, skipping."
+                    print("# First period may be incomplete, skipping.", file=sys.stderr)
                     self.first = False
                     rv = [[self.timeslot, self.stats, True]]
                 else:
@@ -224,11 +286,11 @@ class StatsPKT(Reassemble):
 
         if maptime == self.timeslot:
             if typ not in self.stats['UL']:
-                print >> sys.stderr, "Unexpected frame %s found @ %s" % (typ, q.time)
+                print("Unexpected frame %s found @ %s" % (typ, q.time), file=sys.stderr)
                 pass
             self.stats[q.uldl][typ] += 1
         else:
-            print >> sys.stderr, "Time ordering violation: %f is before %f" % (q.time, self.timeslot)
+            print("Time ordering violation: %f is before %f" % (q.time, self.timeslot), file=sys.stderr)
             sys.exit(1)
         return rv
 
@@ -237,9 +299,9 @@ class StatsPKT(Reassemble):
         comment = ''
         if skip:
             comment = '#!'
-            print >> sys.stderr, "#!@ %s L:" % (datetime.datetime.fromtimestamp(ts))
+            print("#!@ %s L:" % (datetime.datetime.fromtimestamp(ts)), file=sys.stderr)
         else:
-            print >> sys.stderr, "# @ %s L:" % (datetime.datetime.fromtimestamp(ts))
+            print("# @ %s L:" % (datetime.datetime.fromtimestamp(ts)), file=sys.stderr)
         for k in stats:
             for t in stats[k]:
                 print
@@ -262,12 +324,11 @@ class ReassemblePPM(Reassemble):
     def __init__(self):
         pass
 
+    types = ("IBC:",)
     r1 = re.compile('.* slot:(\d)')
     r2 = re.compile('.* time:([0-9:T-]+(\.\d+)?)Z')
 
-    def filter(self, line):
-        q = super(ReassemblePPM, self).filter(line)
-        if q == None: return None
+    def filter_line(self, q):
         if q.typ != "IBC:": return None
         if q.confidence < 95: return None
 
@@ -352,12 +413,21 @@ class ReassemblePPM(Reassemble):
 
 
 class ReassembleIDA(Reassemble):
-    def __init__(self):
-        pass
+    fbucket = 260  # frequency tolerance of a matching fragment
+    window = 280  # the next fragment is at most this much later
+    timeout = 1000  # open packets without a new fragment for this long are dropped
+    types = ("IDA:",)
 
-    def filter(self, line):
-        q = super(ReassembleIDA, self).filter(line)
-        if q == None: return None
+    def __init__(self):
+        # Open packets by seq, seq grows with every fragment added, so the
+        # smallest one is the packet that was extended longest ago
+        self.buf = {}
+        self.seq = 0
+        self.index = {}  # (ul, next ctr, frequency bucket) -> seqs
+        self.expiry = []  # heap of (time of last fragment, seq)
+        self.dedupe = Dedupe(1, 200)
+
+    def filter_line(self, q):
         if q.typ == "IDA:":
             qqq = re.compile('.* CRC:OK')
             if not qqq.match(q.data):
@@ -368,74 +438,77 @@ class ReassembleIDA(Reassemble):
             p = re.compile('.* cont=(\d) (\d) ctr=(\d+) \d+ len=(\d+) 0:.000 \[([0-9a-f.!]*)\]\s+..../.... CRC:OK')
             m = p.match(q.data)
             if (not m):
-                print >> sys.stderr, "Couldn't parse IDA: ", q.data
+                print("Couldn't parse IDA: ", q.data, file=sys.stderr)
             else:
                 q.ul = (q.uldl == 'UL')
                 q.f1 = m.group(1)
                 q.f2 = int(m.group(2))
                 q.ctr = int(m.group(3), 2)
                 q.length = int(m.group(4))
-                q.data = m.group(5)
+                q.data = "".join([chr(int(x, 16)) for x in re.split("[.!]", m.group(5))])
                 q.cont = (q.f1 == '1')
                 #                print "%s %s ctr:%02d %s"%(q.time,q.frequency,q.ctr,q.data)
                 q.enrich()
                 return q
 
-    buf = []
+    def filter_frame(self, f):
+        if type(f).__name__ != "IridiumLCWMessage":
+            return None
+        if f.da_len == 0 or not f.crc_ok or f.zero1 != 0:
+            return None
+        q = frame_object(f)
+        q.ul = bool(f.uplink)
+        q.f1 = "%d" % f.bitstream_bch.get(3, 4)
+        q.f2 = f.bitstream_bch.get(4, 5)
+        q.ctr = f.da_ctr
+        q.length = f.da_len
+        if all([x == 0 for x in f.da_ta[f.da_len + 1:]]):  # as printed by IridiumLCWMessage.pretty()
+            q.data = "".join([chr(x) for x in f.da_ta[:f.da_len]])
+        else:
+            q.data = "".join([chr(x) for x in f.da_ta])
+        q.cont = (q.f1 == '1')
+        return q
+
     stat_broken = 0
     stat_ok = 0
     stat_fragments = 0
     stat_dupes = 0
-    otime = 0
-    odata = None
-    ofreq = 0
 
     def process(self, m):
-        # rudimentary De-Dupe
-        if (self.otime - 1) <= m.time <= (self.otime + 1) and self.odata == m.data and (
-                self.ofreq - 200) < m.frequency < (self.ofreq + 200):
+        if self.dedupe.dupe(m.time, (m.data, m.ul, m.ctr), m.frequency):
             self.stat_dupes += 1
             if verbose:
                 print
                 "dupe: ", m.time, "(", m.cont, m.ctr, ")", m.data
             return
-        self.otime = m.time
-        self.odata = m.data
-        self.ofreq = m.frequency
-
-        ok = False
-        for (idx, (freq, time, ctr, dat, cont, ul)) in enumerate(self.buf[:]):
-            if (freq - 260) < m.frequency < (freq + 260) and time[-1] <= m.time <= (time[-1] + 280) and (
-                    ctr + 1) % 8 == m.ctr and ul == m.ul:
-                del self.buf[idx]
-                dat = dat + "." + m.data
-                time.append(m.time)
-                if m.cont:
-                    self.buf.append([m.frequency, time, m.ctr, dat, m.cont, m.ul])
-                else:
-                    self.stat_ok += 1
-                    if verbose:
-                        print
-                        ">assembled: [%s] %s" % (",".join(["%s" % x for x in time + [m.time]]), dat)
-                    data = "".join([chr(int(x, 16)) for x in re.split("[.!]", dat)])
-                    return [[data, m.time, ul, m.level, freq]]
-                self.stat_fragments += 1
-                ok = True
-                break
-        if ok:
-            pass
+
+        self.expire(m.time)
+
+        seq = self.match(m)
+        if seq is not None:
+            (freq, time, ctr, dat, cont, ul) = self.remove(seq)
+            dat = dat + m.data
+            time.append(m.time)
+            if m.cont:
+                self.add_fragment([m.frequency, time, m.ctr, dat, m.cont, m.ul])
+            else:
+                self.stat_ok += 1
+                if verbose:
+                    print
+                    ">assembled: [%s] %s" % (",".join(["%s" % x for x in time + [m.time]]), dat)
+                return [[dat, m.time, ul, m.level, freq]]
+            self.stat_fragments += 1
         elif m.ctr == 0 and not m.cont:
             if verbose:
                 print
                 ">single: [%s] %s" % (m.time, m.data)
-            data = "".join([chr(int(x, 16)) for x in re.split("[.!]", m.data)])
-            return [[data, m.time, m.ul, m.level, m.frequency]]
+            return [[m.data, m.time, m.ul, m.level, m.frequency]]
         elif m.ctr == 0 and m.cont:  # New long packet
             self.stat_fragments += 1
             if verbose:
                 print
                 "initial: ", m.time, "(", m.cont, m.ctr, ")", m.data
-            self.buf.append([m.frequency, [m.time], m.ctr, m.data, m.cont, m.ul])
+            self.add_fragment([m.frequency, [m.time], m.ctr, m.data, m.cont, m.ul])
         elif m.ctr > 0:
             self.stat_broken += 1
             self.stat_fragments += 1
@@ -446,26 +519,61 @@ class ReassembleIDA(Reassemble):
         else:
             print
             "unknown: ", m.time, m.cont, m.ctr, m.data
-        # expire packets
-        for (idx, (freq, time, ctr, dat, cont, ul)) in enumerate(self.buf[:]):
-            if time[-1] + 1000 <= m.time:
-                self.stat_broken += 1
-                del self.buf[idx]
-                if verbose:
-                    print
-                    "timeout:", time, "(", cont, ctr, ")", dat
-                data = "".join([chr(int(x, 16)) for x in re.split("[.!]", dat)])
-                # could be put into assembled if long enough to be interesting?
-                break
+
+    def key(self, ul, ctr, freq):
+        return (ul, ctr % 8, int(freq // self.fbucket))
+
+    def add_fragment(self, entry):
+        (freq, time, ctr, dat, cont, ul) = entry
+        self.seq += 1
+        self.buf[self.seq] = entry
+        self.index.setdefault(self.key(ul, ctr + 1, freq), []).append(self.seq)
+        heapq.heappush(self.expiry, (time[-1], self.seq))
+
+    def remove(self, seq):
+        entry = self.buf.pop(seq)
+        (freq, time, ctr, dat, cont, ul) = entry
+        k = self.key(ul, ctr + 1, freq)
+        self.index[k].remove(seq)
+        if not self.index[k]:
+            del self.index[k]
+        return entry
+
+    def match(self, m):
+        # the open packet m continues, the one extended longest ago if several
+        (ul, ctr, b) = self.key(m.ul, m.ctr, m.frequency)
+        best = None
+        for bucket in (b - 1, b, b + 1):
+            for seq in self.index.get((ul, ctr, bucket), ()):
+                (freq, time, _, _, _, _) = self.buf[seq]
+                if (freq - self.fbucket) < m.frequency < (freq + self.fbucket) and \
+                        time[-1] <= m.time <= (time[-1] + self.window) and (best is None or seq < best):
+                    best = seq
+        return best
+
+    def expire(self, now):
+        # heap entries of packets that were extended or completed since are skipped
+        while self.expiry and self.expiry[0][0] + self.timeout <= now:
+            (t, seq) = heapq.heappop(self.expiry)
+            if seq not in self.buf:
+                continue
+            (freq, time, ctr, dat, cont, ul) = self.remove(seq)
+            self.stat_broken += 1
+            if verbose:
+                print
+                "timeout:", time, "(", cont, ctr, ")", dat
+            # could be put into assembled if long enough to be interesting?
 
     def end(self):
         super(ReassembleIDA, self).end()
+        self.dedupe.report()
         print
         "%d valid packets assembled from %d fragments (1:%1.2f)." % (
-            self.stat_ok, self.stat_fragments, ((float)(self.stat_fragments) / self.stat_ok))
+            self.stat_ok, self.stat_fragments, ((float)(self.stat_fragments) / self.stat_ok if self.stat_ok else 0))
         print
         "%d/%d (%3.1f%%) broken fragments." % (
-            self.stat_broken, self.stat_fragments, (100.0 * self.stat_broken / self.stat_fragments))
+            self.stat_broken, self.stat_fragments,
+            (100.0 * self.stat_broken / self.stat_fragments if self.stat_fragments else 0))
         print
         "%d dupes removed." % (self.stat_dupes)
 
@@ -488,7 +596,7 @@ class ReassembleIDA(Reassemble):
         freq_print = "%3d|%05d" % (fchan, foff)
 
         print("%15.6f %s %s %s | %s" % (time, freq_print, ul, " ".join("%02x" % ord(x) for x in data), str),
-              file=outfile)
+              file=self.outfile)
 
 
 class ReassembleIDAPP(ReassembleIDA):
@@ -552,7 +660,7 @@ class ReassembleIDAPP(ReassembleIDA):
                 tstr = "[?]"
 
         typ = tmin
-        print >> outfile, "%15.6f %s %s [%s] %-36s" % (time, freq_print, ul, typ, tstr),
+        print("%15.6f %s %s [%s] %-36s" % (time, freq_print, ul, typ, tstr), file=self.outfile, end=" ")
 
         if tmaj == "76" and int(typ[2:], 16) >= 8:
             prehdr = ""
@@ -576,7 +684,7 @@ class ReassembleIDAPP(ReassembleIDA):
 
             hdr = "<" + ":".join("%02x" % ord(x) for x in hdr) + ">"
 
-            print >> outfile, "%-22s %-10s " % (prehdr, hdr),
+            print("%-22s %-10s " % (prehdr, hdr), file=self.outfile, end=" ")
         # > 0600 / 10:13:f0:10: tmsi+lac+lac+00 +bytes
         # < 0605 ?
         # > 0508 Location Updating Request
@@ -594,7 +702,7 @@ class ReassembleIDAPP(ReassembleIDA):
         if typ == "0600":
             hdr = data[:4]
             data = data[4:]
-            print >> outfile, "[%s]" % (":".join("%02x" % ord(x) for x in hdr)),
+            print("[%s]" % (":".join("%02x" % ord(x) for x in hdr)), file=self.outfile, end=" ")
             imei = [ord(x) for x in data[:9]]
             data = data[9:]
             if ord(hdr[0]) == 0x20:
@@ -612,7 +720,7 @@ class ReassembleIDAPP(ReassembleIDA):
                 imei = "[" + str + ",%02x" % imei[8] + "]"
             else:
                 imei = "[" + " ".join("%02x" % (x) for x in imei) + "]"
-            print >> outfile, "%s %s" % (imei, " ".join("%02x" % ord(x) for x in data))
+            print("%s %s" % (imei, " ".join("%02x" % ord(x) for x in data)), file=self.outfile)
             return
         if typ == "0519":  # Identity Resp.
             imei = [ord(x) for x in data[:9]]
@@ -626,11 +734,11 @@ class ReassembleIDAPP(ReassembleIDA):
                 imei = "[imei:" + str + "]"
             else:
                 imei = "[unknown:" + str + "]"
-            print >> outfile, "%s %s" % (imei, " ".join("%02x" % ord(x) for x in data))
+            print("%s %s" % (imei, " ".join("%02x" % ord(x) for x in data)), file=self.outfile)
             return
 
         if len(data) > 0:
-            print >> outfile, "%s" % (" ".join("%02x" % ord(x) for x in data)),
+            print("%s" % (" ".join("%02x" % ord(x) for x in data)), file=self.outfile, end=" ")
 
             str = ""
             for c in data:
@@ -638,9 +746,9 @@ class ReassembleIDAPP(ReassembleIDA):
                     str += c
                 else:
                     str += "."
-            print >> outfile, " | %s" % (str)
+            print(" | %s" % (str), file=self.outfile)
         else:
-            print >> outfile, ""
+            print("", file=self.outfile)
 
 
 class ReassembleIDASBD(ReassembleIDA):
@@ -701,18 +809,20 @@ class ReassembleIDASBD(ReassembleIDA):
         append = "| " + " ".join("%02x" % ord(x) for x in data)
         #        append=""
 
-        print >> outfile, "%s %s [%s] {%02x} %-22s %-10s %-200s %s" % (
+        print("%s %s [%s] {%02x} %-22s %-10s %-200s %s" % (
             datetime.datetime.fromtimestamp(time).strftime("%Y-%m-%dT%H:%M:%S"), ul, typ, len(data), prehdr,
-            "<" + hdr + ">", str, append)
+            "<" + hdr + ">", str, append), file=self.outfile)
 
 
 class ReassembleIDALAP(ReassembleIDA):
     first = True
     sock = None
 
+    gsmtap_hdr = struct.Struct("!BBBBHbBLBBBB")
+
     def gsmwrap(self, q):
         (data, time, ul, level, freq) = q
-        lapdm = data
+        lapdm = data.encode("latin-1")
         try:
             olvl = int(10 * math.log(level, 10))
         except:
@@ -744,9 +854,9 @@ class ReassembleIDALAP(ReassembleIDA):
         #        uint8_t res;            /* reserved for future use (RFU) */       0 ?
         # } +attribute+((packed));
         if ul:
-            gsm = struct.pack("!BBBBHbBLBBBB", 2, 4, 2, 0, 0x4000 + fchan, olvl, 0, freq, 1, 0, 0, 0) + lapdm
+            gsm = self.gsmtap_hdr.pack(2, 4, 2, 0, 0x4000 + fchan, olvl, 0, int(freq), 1, 0, 0, 0) + lapdm
         else:
-            gsm = struct.pack("!BBBBHbBLBBBB", 2, 4, 2, 0, 0x0000 + fchan, olvl, 0, freq, 1, 0, 0, 0) + lapdm
+            gsm = self.gsmtap_hdr.pack(2, 4, 2, 0, 0x0000 + fchan, olvl, 0, int(freq), 1, 0, 0, 0) + lapdm
 
         return gsm
 
@@ -776,28 +886,32 @@ class ReassembleIDALAP(ReassembleIDA):
 
 
 class ReassembleIDALAPPCAP(ReassembleIDALAP):
-    first = True
-    outfile = None
+    # Most of this constructs fake ip packets around the gsmtap data so it can be written as pcap
+    pcap = None
+    ofile = None  # name of outfile, for rotating it
+    udp_hdr = struct.Struct("!HHHH")
+    ip_hdr = struct.Struct("!BBHHBBBBH4s4s")
+    eth_ul = struct.pack("!6s6sH", b"\xaa\xbb\xcc\xdd\xee\xff", b"\x10\x22\x33\x44\x55\x66", 0x800)
+    eth_dl = struct.pack("!6s6sH", b"\x10\x22\x33\x44\x55\x66", b"\xaa\xbb\xcc\xdd\xee\xff", 0x800)
+    ip_ul = (b"\x0a\x00\x00\x01", b"\x7f\x00\x00\x01")  # source, destination
+    ip_dl = (b"\x7f\x00\x00\x01", b"\x0a\x00\x00\x01")
+
+    def writer(self):
+        # pcap, or with -a pcapng pcapng with an interface per direction
+        # (-a interfaces=channel: per channel); -a rotate-size=<bytes>[kMG]
+        # and -a rotate-time=<seconds> start new files
+        size = pcapwriter.parse_size(args['rotate-size']) if 'rotate-size' in args else None
+        rtime = float(args['rotate-time']) if 'rotate-time' in args else None
+        if 'pcapng' in args:
+            return pcapwriter.PcapngWriter(self.outfile, self.ofile, rotate_size=size, rotate_time=rtime)
+        return pcapwriter.PcapWriter(self.outfile, self.ofile, rotate_size=size, rotate_time=rtime)
 
     def consume(self, q):
-        # Most of this constructs fake ip packets around the gsmtap data so it can be written as pcap
-        if self.first:
-            # typedef struct pcap_hdr_s {
-            #        guint32 magic_number;   /* magic number */            0xa1b2c3d4
-            #        guint16 version_major;  /* major version number */    2
-            #        guint16 version_minor;  /* minor version number */    4
-            #        gint32  thiszone;       /* GMT to local correction */ 0
-            #        guint32 sigfigs;        /* accuracy of timestamps */  0
-            #        guint32 snaplen;        /* max length of captured packets, in octets */
-            #                                                              (must be > largest pkt)
-            #        guint32 network;        /* data link type */          1 (ethernet)
-            # } pcap_hdr_t;
-            pcap_hdr = struct.pack("<LHHlLLL", 0xa1b2c3d4, 0x2, 0x4, 0x0, 0, 0xffff, 1)
-            outfile.write(pcap_hdr)
-            self.first = False
+        if self.pcap is None:
+            self.pcap = self.writer()
 
         # Filter non-GSM packets (see IDA-GSM.txt)
-        (data, time, ul, _, _) = q
+        (data, time, ul, _, freq) = q
         if 'all' in args:
             pass
         else:
@@ -806,39 +920,43 @@ class ReassembleIDALAPPCAP(ReassembleIDALAP):
             if len(data) == 1:
                 return
         gsm = self.gsmwrap(q)
-        udp = struct.pack("!HHHH", 45988, 4729, 8 + len(gsm), 0xffff) + gsm  # 4729 == GSMTAP
+        udp = self.udp_hdr.pack(45988, 4729, 8 + len(gsm), 0xffff) + gsm  # 4729 == GSMTAP
 
         if ul:
-            ip = struct.pack("!BBHHBBBBHBBBBBBBB", (0x4 << 4) + 5, 0, len(udp) + 20, 0xdaae, 0x40, 0x0, 0x40, 17,
-                             0xffff, 10, 0, 0, 1, 127, 0, 0, 1) + udp
+            (src, dst) = self.ip_ul
         else:
-            ip = struct.pack("!BBHHBBBBHBBBBBBBB", (0x4 << 4) + 5, 0, len(udp) + 20, 0xdaae, 0x40, 0x0, 0x40, 17,
-                             0xffff, 127, 0, 0, 1, 10, 0, 0, 1) + udp
+            (src, dst) = self.ip_dl
+        ip = self.ip_hdr.pack((0x4 << 4) + 5, 0, len(udp) + 20, 0xdaae, 0x40, 0x0, 0x40, 17, 0xffff, src, dst) + udp
 
         if ul:
-            eth = struct.pack("!BBBBBBBBBBBBH", 0xaa, 0xbb, 0xcc, 0xdd, 0xee, 0xff, 0x10, 0x22, 0x33, 0x44, 0x55, 0x66,
-                              0x800) + ip
+            eth = self.eth_ul + ip
+        else:
+            eth = self.eth_dl + ip
+
+        if args.get('interfaces') == "channel":
+            iface = "ch%03d" % int((freq - base_freq) / channel_width)
         else:
-            eth = struct.pack("!BBBBBBBBBBBBH", 0x10, 0x22, 0x33, 0x44, 0x55, 0x66, 0xaa, 0xbb, 0xcc, 0xdd, 0xee, 0xff,
-                              0x800) + ip
+            iface = ("DL", "UL")[bool(ul)]
+        self.pcap.write(time, eth, iface)
 
-        pcap = struct.pack("<IIII", time, 1000000 * (time % 1), len(eth), len(eth)) + eth
-        outfile.write(pcap)
+    def close(self):
+        if self.pcap is not None:
+            self.pcap.close()
 
 
 class ReassembleIRA(Reassemble):
+    types = ("IRA:",)
+
     def __init__(self):
-        pass
+        self.dedupe = Dedupe(0.05, 200)  # less than one 90ms frame, pages are repeated in later ones
 
-    def filter(self, line):
-        q = super(ReassembleIRA, self).filter(line)
-        if q == None: return None
+    def filter_line(self, q):
         if q.typ == "IRA:":
             p = re.compile(
                 'sat:(\d+) beam:(\d+) (?:aps=\S+ )?pos=\(([+-][0-9.]+)/([+-][0-9.]+)\) alt=(-?[0-9]+) .* bc_sb:\d+(?: (.*))?')
             m = p.search(q.data)
             if (not m):
-                print >> sys.stderr, "Couldn't parse IRA: ", q.data,
+                print("Couldn't parse IRA: ", q.data, file=sys.stderr, end="")
             else:
                 q.sat = int(m.group(1))
                 q.beam = int(m.group(2))
@@ -850,30 +968,59 @@ class ReassembleIRA(Reassemble):
                     q.pages = p.findall(m.group(6))
                 else:  # Won't be printed, but just in case
                     q.pages = []
+                q.enrich()
                 return q
 
+    r_page = re.compile('tmsi:([0-9a-f]+) msc_id:([0-9]+)$')
+
+    def filter_frame(self, f):
+        if type(f).__name__ != "IridiumRAMessage":
+            return None
+        q = frame_object(f)
+        q.sat = f.ra_sat
+        q.beam = f.ra_cell
+        q.lat = float("%.2f" % f.ra_lat)  # as printed
+        q.lon = float("%.2f" % f.ra_lon)
+        q.alt = int(f.ra_alt - 6378 + 23)
+        if f.page_len is None:
+            paging = f.paging
+        else:
+            paging = f.paging[:f.page_len]
+        q.pages = []
+        for p in paging:
+            m = self.r_page.match(p['str'])
+            if m:
+                q.pages.append(m.groups())
+        return q
+
     def process(self, q):
+        if q.pages and self.dedupe.dupe(q.time, (q.sat, q.beam, tuple(q.pages)), q.frequency):
+            return
         for x in q.pages:
             return ["%03d %02d %6.2f %6.2f %03d : %s %s" % (q.sat, q.beam, q.lat, q.lon, q.alt, x[0], x[1])]
 
     def consume(self, q):
-        print >> outfile, q
+        print(q, file=self.outfile)
+
+    def end(self):
+        super(ReassembleIRA, self).end()
+        self.dedupe.report()
 
 
 class ReassembleMSG(Reassemble):
+    types = ("MSG:",)
+
     def __init__(self):
         pass
 
-    def filter(self, line):
-        q = super(ReassembleMSG, self).filter(line)
-        if q == None: return None
+    def filter_line(self, q):
         if q.typ == "MSG:":
             # ric:0098049 fmt:05 seq:43 1010010000 1/1 oNEZCOuxvM3PuiQHujzQYd5n0Q8ra0wfMG2WnnhoxAnunT9xzIBSkXyvNP[3]     +11111
             p = re.compile(
                 '.* ric:(\d+) fmt:(\d+) seq:(\d+) [01]+ (\d)/(\d) csum:([0-9a-f][0-9a-f]) msg:([0-9a-f]+)\.([01]*) ')
             m = p.match(q.data)
             if (not m):
-                print >> sys.stderr, "Couldn't parse MSG: ", q.data
+                print("Couldn't parse MSG: ", q.data, file=sys.stderr)
             else:
                 q.msg_ric = int(m.group(1))
                 q.fmt = int(m.group(2))
@@ -906,6 +1053,20 @@ class ReassembleMSG(Reassemble):
                     q.msg_rest = ""
                 return q
 
+    def filter_frame(self, f):
+        if type(f).__name__ != "IridiumMessagingAscii" or len(f.msg_msgdata) < 8:
+            return None
+        q = frame_object(f)
+        q.msg_ric = f.msg_ric
+        q.fmt = f.msg_format
+        q.msg_seq = f.msg_seq
+        q.msg_ctr = f.msg_ctr
+        q.msg_ctr_max = f.msg_ctr_max
+        q.msg_checksum = f.msg_checksum
+        q.msg_ascii = f.msg_ascii
+        q.msg_rest = "%s" % f.msg_rest
+        return q
+
     buf = {}
     ricseq = {}
     wrapmargin = 10
@@ -961,41 +1122,192 @@ class ReassembleMSG(Reassemble):
             str += " %3d" % self.buf[b].msg_checksum
             str += (" fail", " OK  ")[self.buf[b].msg_checksum == csum]
             str += ": %s" % (msg)
-            print >> outfile, str
-
-
-validargs = ()
-zx = None
-
-if mode == "ida":
-    zx = ReassembleIDA()
-elif mode == "idapp":
-    zx = ReassembleIDAPP()
-elif mode == "gsmtap":
-    zx = ReassembleIDALAP()
-elif mode == "lap":
-    validargs = ('all')
-    if outfile == sys.stdout:  # Force file, since it's binary
-        ofile = "%s.%s" % (basename, "pcap")
-        outfile = open(ofile, "w")
-    zx = ReassembleIDALAPPCAP()
-elif mode == "sbd":
-    zx = ReassembleIDASBD()
-elif mode == "page":
-    zx = ReassembleIRA()
-elif mode == "msg":
-    zx = ReassembleMSG()
-elif mode == "stats":
-    validargs = ('perfect', 'state')
-    zx = StatsPKT()
-elif mode == "ppm":
-    zx = ReassemblePPM()
-else:
-    print >> sys.stderr, "Unknown mode selected"
-    sys.exit(1)
-
-for x in args.keys():
-    if x not in validargs:
-        raise Exception("unknown -a option: " + x)
-
-zx.run(fileinput.input(ifile))
+            print(str, file=self.outfile)
+
+
+modes = {
+    "ida": ReassembleIDA,
+    "idapp": ReassembleIDAPP,
+    "gsmtap": ReassembleIDALAP,
+    "lap": ReassembleIDALAPPCAP,
+    "sbd": ReassembleIDASBD,
+    "page": ReassembleIRA,
+    "msg": ReassembleMSG,
+    "stats": StatsPKT,
+    "ppm": ReassemblePPM,
+}
+
+
+def reassembler_for(mode, out=None):
+    # the Reassemble object for a -m mode writing to out (default outfile), None if there is no such mode
+    if mode not in modes:
+        return None
+    r = modes[mode]()
+    r.outfile = outfile if out is None else out
+    return r
+
+
+class Fanout(object):
+    # Runs several modes over one pass of the input. Each line is split
+    # once and only given to the modes that take its type. The ida based
+    # modes share the reassembly of the first one, the others only consume
+    # its packets (and do not get an end(), only close()).
+    def __init__(self, reassemblers):
+        self.reassemblers = []
+        for r in reassemblers:
+            ida = [x for x in self.reassemblers if isinstance(x, ReassembleIDA)]
+            if ida and isinstance(r, ReassembleIDA):
+                ida[0].followers += (r,)
+            else:
+                self.reassemblers.append(r)
+
+    def run(self, producer):
+        failed = None
+        try:
+            for line in producer:
+                q = split_line(line)
+                for r in self.reassemblers:
+                    r.stat_line += 1
+                    if q != None and (r.types is None or q.typ in r.types):
+                        r.add(r.filter_line(copy.copy(q)))
+            for r in self.reassemblers:
+                try:
+                    r.end()
+                except Exception as e:  # the other modes still get their end()
+                    if failed is None:
+                        failed = e
+                    else:
+                        traceback.print_exc()
+        finally:
+            for r in self.reassemblers:
+                for x in (r,) + r.followers:
+                    x.close()
+        if failed is not None:
+            raise failed
+
+
+if __name__ == "__main__":
+    options, remainder = getopt.getopt(sys.argv[1:], 'vhi:o:m:sa:', [
+        'verbose',
+        'help',
+        'input=',
+        'output=',
+        'mode=',
+        'state',
+        'args=',
+    ])
+
+    for opt, arg in options:
+        if opt in ('-v', '--verbose'):
+            verbose = True
+        elif opt in ('-i', '--input'):
+            ifile = arg
+        elif opt in ('-o', '--output'):
+            ofile = arg
+        elif opt in ('-m', '--mode'):
+            mode = arg
+        elif opt in ('-a', '--args'):
+            for a in arg.split(","):
+                (k, _, v) = a.partition("=")
+                args[k] = v or True
+        elif opt in ('-h', '--help'):
+            print("Usage:", file=sys.stderr)
+            print("\t", os.path.basename(sys.argv[0]),
+                  "[-v] [--input foo.parsed] --mode [ida|lap|sbd|page|msg|sat][,mode...] [--output foo.parsed]",
+                  file=sys.stderr)
+            exit(1)
+        else:
+            raise Exception("unknown argument?")
+
+    basename = None
+    if ifile == None:
+        if not remainder:
+            basename = "stdin"
+            ifile = "/dev/stdin"
+        else:
+            ifile = remainder[0]
+
+    if not basename:
+        basename = re.sub(r'\.[^.]*$', '', re.sub(r'\.(gz|xz|bz2)$', '', ifile))
+    #    basename=os.path.basename(re.sub('\.[^.]*$','',ifile))
+
+    mlist = mode.split(",")
+    for m in mlist:
+        if m not in modes:
+            print("Unknown mode selected", file=sys.stderr)
+            sys.exit(1)
+    omode = "wb" if mode == "lap" else "w"
+    pcapext = "pcapng" if 'pcapng' in args else "pcap"
+
+    if len(mlist) > 1:
+        # one pass over the input, an output file per mode: <basename>.<mode>
+        suffix = ""
+        if ofile and ofile != "=":
+            m = re.search(r'\.(gz|xz|bz2)$', ofile)
+            if m:
+                suffix = m.group(0)
+            basename = re.sub(r'\.[^.]*$', '', re.sub(r'\.(gz|xz|bz2)$', '', ofile))
+        outputs = {}
+        ofiles = {}
+        for m in mlist:
+            if m in ('gsmtap', 'stats', 'ppm'):  # UDP or stdout only
+                outputs[m] = sys.stdout
+                continue
+            ofiles[m] = "%s.%s%s" % (basename, pcapext if m == "lap" else m, suffix)
+            outputs[m] = compressed.open_output(ofiles[m], "wb" if m == "lap" else "w")
+        ofile = ",".join([ofiles[m] for m in mlist if m in ofiles])
+    elif ofile == None:
+        ofile = "%s.%s" % (basename, mode)
+        outfile = sys.stdout
+    elif ofile == "" or ofile == "=":
+        ofile = "%s.%s" % (basename, mode)
+        outfile = compressed.open_output(ofile, omode)
+    else:
+        basename = re.sub(r'\.[^.]*$', '', re.sub(r'\.(gz|xz|bz2)$', '', ofile))
+        outfile = compressed.open_output(ofile, omode)
+
+    if 'state' in args:
+        import pickle
+
+        statefile = "%s.state" % ("stats" if "stats" in mlist else mode)
+        try:
+            with open(statefile) as f:
+                state = pickle.load(f)
+        except (IOError, EOFError):
+            pass
+
+    if verbose:
+        print("ifile", ifile)
+        print("ofile", ofile)
+        print("basen", basename)
+
+    validargs = ()
+    if "lap" in mlist:
+        validargs += ('all', 'pcapng', 'interfaces', 'rotate-size', 'rotate-time')
+        if mode == "lap" and outfile == sys.stdout:  # Force file, since it's binary
+            ofile = "%s.%s" % (basename, pcapext)
+            outfile = compressed.open_output(ofile, "wb")
+    if "stats" in mlist:
+        validargs += ('perfect', 'state')
+
+    for x in args.keys():
+        if x not in validargs:
+            raise Exception("unknown -a option: " + x)
+
+    if len(mlist) > 1:
+        zxs = [reassembler_for(m, outputs[m]) for m in mlist]
+        if "lap" in mlist:
+            zxs[mlist.index("lap")].ofile = ofiles["lap"]
+        try:
+            Fanout(zxs).run(fileinput.input(ifile, openhook=compressed.hook))
+        finally:  # also when one of the modes exits
+            for f in outputs.values():
+                if f != sys.stdout:
+                    f.close()
+    else:
+        zx = reassembler_for(mode)
+        zx.ofile = ofile
+        zx.run(fileinput.input(ifile, openhook=compressed.hook))
+
+        if outfile != sys.stdout:
+            outfile.close()  # compressed output is only complete once closed
@@ -19,14 +19,67 @@ def rs_check(data):
 	msg=reedsolo6.rs_encode_msg(data[:mlen],nsym+elen,fcr=fcr)
 	return bytearray(data[mlen:])==msg[mlen:len(data)]
 
+# Syndromes are computed with a table per codeword length: entry [j][v]
+# holds the syndromes of symbol v at position j, packed 8 bits each, so a
+# codeword needs one lookup per symbol. Clean codewords return right away,
+# the rest goes through the reedsolo6 decoding steps.
+_stables={}
+
+def syndrome_table(n):
+	if n not in _stables:
+		roots=[reedsolo6.gf_pow(generator,i+fcr) for i in range(nsym+elen)]
+		tbl=[]
+		for j in range(n):
+			pw=[reedsolo6.gf_pow(x,n-1-j) for x in roots]
+			row=[0]*(1<<c_exp)
+			for b in range(c_exp): # syndromes are linear in the symbol value
+				s=0
+				for i in range(len(pw)):
+					s|=reedsolo6.gf_mul(1<<b,pw[i])<<(8*i)
+				row[1<<b]=s
+			for v in range(3,1<<c_exp):
+				if v&(v-1):
+					row[v]=row[v&(v-1)]^row[v&-v]
+			tbl.append(row)
+		_stables[n]=tbl
+	return _stables[n]
+
+def syndromes(data): # packed syndromes, 0 for a valid codeword
+	s=0
+	for (row,v) in zip(syndrome_table(len(data)),data):
+		s^=row[v]
+	return s
+
+def rs_correct(data,s,erase_pos):
+	# same steps as reedsolo6.rs_correct_msg, with the syndromes already known
+	n=nsym+elen
+	msg=bytearray(data)
+	if s==0:
+		return msg[:-n],msg[-n:]
+	synd=[0]+[(s>>(8*i))&0xff for i in range(n)]
+	fsynd=reedsolo6.rs_forney_syndromes(synd,erase_pos,len(msg),generator)
+	# raises before the Chien search if errors+erasures are beyond what n can fix
+	err_loc=reedsolo6.rs_find_error_locator(fsynd,n,erase_count=len(erase_pos))
+	err_pos=reedsolo6.rs_find_errors(err_loc[::-1],len(msg),generator)
+	if err_pos is None:
+		raise reedsolo6.ReedSolomonError("Could not locate error")
+	msg=reedsolo6.rs_correct_errata(msg,synd,(erase_pos+err_pos),fcr,generator)
+	if syndromes(msg):
+		raise reedsolo6.ReedSolomonError("Could not correct message")
+	return msg[:-n],msg[-n:]
+
 def rs_fix(data):
-#	data=data+bytearray([0]*elen)
 	data=data+([0]*elen)
-	r=range(len(data)-elen,len(data))
+	r=list(range(len(data)-elen,len(data)))
 	try:
-		(cmsg,crs)=reedsolo6.rs_correct_msg(data,nsym+elen,fcr,generator,r)
+		if len(data)>reedsolo6.field_charac:
+			raise ValueError("Message is too long (%i when max is %i)" % (len(data), reedsolo6.field_charac))
+		(cmsg,crs)=rs_correct(data,syndromes(data),r)
 	except reedsolo6.ReedSolomonError:
 		return (False,None,None)
 	except ZeroDivisionError:
 		return (False,None,None)
-	return (True,cmsg,crs[:nsym])
\ No newline at end of file
+	return (True,cmsg,crs[:nsym])
+
+def rs_fix_batch(datas): # rs_fix() of many payloads, clean ones only cost the syndrome lookups
+	return [rs_fix(data) for data in datas]
@@ -0,0 +1,95 @@
+#!/usr/bin/python
+# vim: set ts=4 sw=4 tw=0 et pm=:
+
+# Wall time and call counts per processing stage, for "iridium-parser.py
+# --profile-stages".
+#
+# Stages are functions wrapped with StageProfile.wrap(). Time is counted
+# for the innermost running stage only, so a stage that calls another one
+# (e.g. type detection doing BCH repairs) is not charged for it and the
+# stage times add up to the profiled time. Named counters (message classes,
+# error reasons) can be kept alongside.
+
+from __future__ import print_function
+import os
+import json
+import time
+
+
+class StageProfile(object):
+    def __init__(self, json_file=None, interval=None):
+        # json_file is rewritten every interval seconds by tick()
+        self.clock = time.perf_counter
+        self.json_file = json_file
+        self.interval = interval
+        self.next_write = time.time() + interval if interval else None
+        self.stack = []  # [stage, start, time spent in called stages]
+        self.calls = {}
+        self.times = {}
+        self.counters = {}
+
+    def wrap(self, stage, fn):
+        def staged(*args, **kwargs):
+            if self.stack and self.stack[-1][0] == stage:  # e.g. bch_repair() calling repair()
+                return fn(*args, **kwargs)
+            self.stack.append([stage, self.clock(), 0.0])
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                (_, start, inner) = self.stack.pop()
+                dt = self.clock() - start
+                self.calls[stage] = self.calls.get(stage, 0) + 1
+                self.times[stage] = self.times.get(stage, 0.0) + dt - inner
+                if self.stack:
+                    self.stack[-1][2] += dt
+        return staged
+
+    def wrap_attr(self, obj, name, stage):  # replaces obj.name (function or method) with a wrapped one
+        setattr(obj, name, self.wrap(stage, getattr(obj, name)))
+
+    def count(self, counter, key, n=1):
+        c = self.counters.setdefault(counter, {})
+        c[key] = c.get(key, 0) + n
+
+    def take(self):  # what was counted since the last take(), e.g. in a --jobs worker
+        res = (self.calls, self.times, self.counters)
+        (self.calls, self.times, self.counters) = ({}, {}, {})
+        return res
+
+    def merge(self, taken):
+        (calls, times, counters) = taken
+        for stage in calls:
+            self.calls[stage] = self.calls.get(stage, 0) + calls[stage]
+            self.times[stage] = self.times.get(stage, 0.0) + times[stage]
+        for counter in counters:
+            for key in counters[counter]:
+                self.count(counter, key, counters[counter][key])
+
+    def tick(self):
+        if self.next_write is not None and time.time() >= self.next_write:
+            self.write_json(self.json_file)
+            self.next_write = time.time() + self.interval
+
+    def as_dict(self):
+        return {
+            'stages': dict((s, {'calls': self.calls[s], 'seconds': self.times[s]}) for s in self.calls),
+            'counters': self.counters,
+        }
+
+    def write_json(self, fname):
+        tmp = fname + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.as_dict(), f, indent=1, sort_keys=True)
+        os.rename(tmp, fname)
+
+    def report(self, file):
+        total = sum(self.times.values()) or 1.0
+        print("%-14s %10s %10s %6s %10s" % ("stage", "calls", "seconds", "%", "us/call"), file=file)
+        for stage in sorted(self.times, key=self.times.get, reverse=True):
+            print("%-14s %10d %10.3f %6.1f %10.2f" % (stage, self.calls[stage], self.times[stage],
+                  100.0 * self.times[stage] / total, 1e6 * self.times[stage] / self.calls[stage]), file=file)
+        for counter in sorted(self.counters):
+            print("%s:" % counter, file=file)
+            c = self.counters[counter]
+            for key in sorted(c, key=c.get, reverse=True):
+                print("%10d %s" % (c[key], key), file=file)
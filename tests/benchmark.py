@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# vim: set ts=4 sw=4 tw=0 et pm=:
+
+# Throughput benchmarks over the captures that come with the toolkit.
+#
+#   benchmark.py [--repeat N] [--history FILE] [--only parser,reassembler,dfs,primitives,extractor]
+#                [--reference COMMIT] [--set-reference]
+#
+# Times iridium-parser.py per output mode, reassembler.py per mode,
+# bits_to_dfs_python3.py, the bch/rs/crc primitives and (with a python2
+# that has numpy and scipy) the extractor's detector and demodulator on
+# synthetic IQ. Every run is appended to the history file together with
+# hashes of what was produced; if those differ from the reference run the
+# outputs are listed and the exit status is 1.
+#
+# The reference is the run marked with --set-reference (the first run if
+# none is), or the last run of COMMIT with --reference. Runs that exit
+# with an error get no timings and no output hashes, only the exit status.
+
+from __future__ import print_function
+import sys
+import os
+import getopt
+import json
+import time
+import random
+import hashlib
+import tempfile
+import shutil
+import subprocess
+
+top = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, top)
+
+corpora = ["output01.bits", "output02.bits", "output03.bits", "output04.bits", "voice.bits"]
+parser_modes = ["line", "rxstats", "err", "msg", "sat", "split", "store", "columnar"]
+reassembler_modes = ["ida", "idapp", "gsmtap", "lap", "sbd", "page", "msg", "stats", "ppm"]
+
+
+def sha256(fname):
+    h = hashlib.sha256()
+    with open(fname, "rb") as f:
+        for b in iter(lambda: f.read(1 << 20), b""):
+            h.update(b)
+    return h.hexdigest()
+
+
+def lines(fname):
+    with open(fname, "rb") as f:
+        return sum(1 for _ in f)
+
+
+def best_of(repeat, fn):  # smallest wall time of repeat calls of fn
+    best = None
+    for _ in range(repeat):
+        t = time.time()
+        fn()
+        t = time.time() - t
+        if best is None or t < best:
+            best = t
+    return best
+
+
+def run(args, stdout, cwd=None):
+    with open(stdout, "wb") as out, open(os.devnull, "wb") as err:
+        return subprocess.call(args, stdout=out, stderr=err, cwd=cwd)
+
+
+class Bench(object):
+    def __init__(self, repeat, tmp):
+        self.repeat = repeat
+        self.tmp = tmp
+        self.results = {}
+        self.outputs = {}
+
+    def timed(self, name, count, args, stdout, cwd=None, produced=None):
+        # runs args repeat times, count is the number of frames/lines handled per run
+        status = []
+        t = best_of(self.repeat, lambda: status.append(run(args, stdout, cwd)))
+        failed = [s for s in status if s != 0]
+        if failed:
+            self.results[name] = {'items': count, 'exit': failed[0]}
+            print("%-40s failed (exit %d)" % (name, failed[0]), file=sys.stderr)
+            return
+        self.results[name] = {'seconds': t, 'items': count, 'per_second': count / t if t else None}
+        for fname in (produced or [stdout]):
+            if os.path.isfile(fname):
+                self.outputs[name + ":" + os.path.basename(fname)] = sha256(fname)
+        print("%-40s %8.3fs %10.1f/s" % (name, t, count / t if t else 0), file=sys.stderr)
+
+    def parser(self):
+        parser = os.path.join(top, "iridium-parser.py")
+        for corpus in corpora:
+            src = os.path.join(top, corpus)
+            n = lines(src)
+            for mode in parser_modes:
+                out = os.path.join(self.tmp, "%s.%s" % (corpus, mode))
+                args = [sys.executable, parser, "-o", mode, src]
+                produced = [out]
+                if mode == "split":
+                    args[2:2] = ["--split-prefix", out]
+                    produced = [out + "." + t for t in ("IRA", "IBC", "IDA", "VOC", "ISY", "RAW", "IIP", "IIQ", "IIU", "MSG")]
+                elif mode == "store":
+                    args[2:2] = ["--store", out + ".store"]
+                    produced = [out + ".store", out + ".store.idx"]
+                elif mode == "columnar":
+                    args[2:2] = ["--columnar-dir", out + ".col"]
+                    produced = []
+                self.timed("parser %s -o %s" % (corpus, mode), n, args, out, produced=produced)
+
+    def parsed(self, corpus):  # -o line output of corpus, as written by parser()
+        fname = os.path.join(self.tmp, "%s.line" % corpus)
+        if not os.path.exists(fname):
+            run([sys.executable, os.path.join(top, "iridium-parser.py"), os.path.join(top, corpus)], fname)
+        return fname
+
+    def reassembler(self):
+        reassembler = os.path.join(top, "reassembler.py")
+        for corpus in corpora:
+            src = self.parsed(corpus)
+            n = lines(src)
+            for mode in reassembler_modes:
+                out = os.path.join(self.tmp, "%s.re-%s" % (corpus, mode))
+                self.timed("reassembler %s -m %s" % (corpus, mode), n,
+                           [sys.executable, reassembler, "-i", src, "-m", mode, "-o", out], out + ".stdout",
+                           produced=[out])
+
+    def dfs(self):
+        dfs = os.path.join(top, "bits_to_dfs_python3.py")
+        for corpus in corpora:
+            src = self.parsed(corpus)
+            out = os.path.join(self.tmp, "%s.dfs" % corpus)
+            self.timed("bits_to_dfs %s" % corpus, lines(src), [sys.executable, dfs, src, out], os.devnull,
+                       produced=[out])
+
+    def primitive(self, name, count, fn, check):
+        t = best_of(self.repeat, fn)
+        self.results[name] = {'seconds': t, 'items': count, 'per_second': count / t}
+        self.outputs[name] = hashlib.sha256(repr(check()).encode()).hexdigest()
+        print("%-40s %8.3fs %10.1f/s" % (name, t, count / t), file=sys.stderr)
+
+    def primitives(self):
+        import bch
+        import crc
+        import rs
+        import rs6
+        rnd = random.Random(1)
+        n = 2000
+        words = [rnd.getrandbits(31) for _ in range(n)]
+        self.primitive("bch syndrome", n, lambda: [bch.syndrome(1207, w, 31) for w in words],
+                       lambda: [bch.syndrome(1207, w, 31) for w in words[:100]])
+        self.primitive("bch repair", n, lambda: [bch.nnrepair(1207, w, 31) for w in words],
+                       lambda: [bch.nnrepair(1207, w, 31) for w in words[:100]])
+        datas = [bytes(bytearray(rnd.getrandbits(8) for _ in range(20))) for _ in range(n)]
+        self.primitive("crc iip_crc24", n, lambda: [crc.iip_crc24(d) for d in datas],
+                       lambda: [crc.iip_crc24(d) for d in datas[:100]])
+        self.primitive("crc ida_crc16", n, lambda: [crc.ida_crc16(d) for d in datas],
+                       lambda: [crc.ida_crc16(d) for d in datas[:100]])
+        m = 200
+        rs8 = [[rnd.getrandbits(8) for _ in range(39)] for _ in range(m)]
+        self.primitive("rs rs_fix", m, lambda: [rs.rs_fix(d) for d in rs8], lambda: [rs.rs_fix(d) for d in rs8[:20]])
+        rs6s = [[rnd.getrandbits(6) for _ in range(52)] for _ in range(m)]
+        self.primitive("rs6 rs_fix", m, lambda: [rs6.rs_fix(d) for d in rs6s],
+                       lambda: [rs6.rs_fix(d) for d in rs6s[:20]])
+
+    def extractor(self, python2):
+        # runs in the extractor's python2, prints {name: seconds, ...} as json
+        out = os.path.join(self.tmp, "extractor.json")
+        status = run([python2, "-c", extractor_code, str(self.repeat), self.tmp],
+                     out, cwd=os.path.join(top, "extractor-python"))
+        if status != 0:
+            print("%-40s skipped (%s can not run the extractor)" % ("extractor", python2), file=sys.stderr)
+            self.results["extractor"] = {'skipped': True}
+            return
+        with open(out) as f:
+            res = json.load(f)
+        for name in ("detector", "demod"):
+            t = res[name]
+            self.results["extractor " + name] = {'seconds': t, 'items': res[name + "_items"],
+                                                 'per_second': res[name + "_items"] / t}
+            print("%-40s %8.3fs %10.1f/s" % ("extractor " + name, t, res[name + "_items"] / t), file=sys.stderr)
+        self.outputs["extractor demod"] = res["demod_hash"]
+
+
+# Synthetic capture: noise with DQPSK bursts (64 preamble symbols, the
+# downlink unique word, random data) at different frequencies.
+extractor_code = r'''
+import sys, time, json, hashlib, numpy, detector, demod, iridium
+repeat, tmp = int(sys.argv[1]), sys.argv[2]
+rate = 250000
+sps = rate // iridium.SYMBOLS_PER_SECOND
+rnd = numpy.random.RandomState(1)
+sig = (rnd.normal(0, 0.03, 2 * rate) + 1j * rnd.normal(0, 0.03, 2 * rate)).astype(numpy.complex64)
+bursts = []
+for k in range(20):
+    syms = [0] * 64 + [int(c) for c in "022220002002"] + list(rnd.randint(0, 4, 300))
+    phase = numpy.cumsum(numpy.array(syms) * numpy.pi / 2) + numpy.pi / 4
+    burst = numpy.repeat(numpy.exp(1j * phase), sps)
+    freq = (k % 5 - 2) * 30000
+    start = int(0.05 * rate) + k * int(0.09 * rate)
+    t = numpy.arange(len(burst)) / float(rate)
+    sig[start:start + len(burst)] += (burst * numpy.exp(2j * numpy.pi * freq * t)).astype(numpy.complex64)
+    bursts.append(burst.astype(numpy.complex64))
+fname = tmp + "/synthetic.cfile"
+sig.tofile(fname)
+found = []
+def collect(*a):
+    found.append(a)
+def det():
+    del found[:]
+    detector.Detector(rate, sample_format="float").process_file(fname, collect)
+def dem():
+    d = demod.Demod(rate)
+    return [d.demod(b)[1] for b in bursts]
+res = {}
+for (name, fn) in (("detector", det), ("demod", dem)):
+    best = None
+    for _ in range(repeat):
+        t = time.time()
+        fn()
+        t = time.time() - t
+        best = t if best is None or t < best else best
+    res[name] = best
+res["detector_items"] = len(sig) / float(rate)
+res["demod_items"] = len(bursts)
+res["demod_hash"] = hashlib.sha256(repr(dem())).hexdigest()
+print(json.dumps(res))
+'''
+
+
+def git_state():
+    try:
+        rev = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=top).decode().strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD"], cwd=top) != 0
+        return (rev, dirty)
+    except (OSError, subprocess.CalledProcessError):
+        return (None, None)
+
+
+def find_reference(runs, commit=None):
+    # last run of commit (a prefix will do), or the run marked as reference
+    if commit is not None:
+        runs = [r for r in runs if r['commit'] and r['commit'].startswith(commit)]
+        return runs[-1] if runs else None
+    marked = [r for r in runs if r.get('reference')]
+    if marked:
+        return marked[-1]
+    return runs[0] if runs else None
+
+
+def main():
+    options, remainder = getopt.getopt(sys.argv[1:], 'r:', [
+        'repeat=',
+        'history=',
+        'only=',
+        'python2=',
+        'reference=',
+        'set-reference',
+    ])
+    repeat = 3
+    history = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench-history.json")
+    only = ["parser", "reassembler", "dfs", "primitives", "extractor"]
+    python2 = "python2"
+    reference = None
+    set_reference = False
+    for opt, arg in options:
+        if opt in ('-r', '--repeat'):
+            repeat = int(arg)
+        elif opt == '--history':
+            history = arg
+        elif opt == '--only':
+            only = arg.split(',')
+        elif opt == '--python2':
+            python2 = arg
+        elif opt == '--reference':
+            reference = arg
+        elif opt == '--set-reference':
+            set_reference = True
+        else:
+            raise Exception("unknown argument?")
+
+    tmp = tempfile.mkdtemp(prefix="iridium-bench-")
+    try:
+        b = Bench(repeat, tmp)
+        for part in only:
+            if part == "extractor":
+                b.extractor(python2)
+            else:
+                getattr(b, part)()
+    finally:
+        shutil.rmtree(tmp)
+
+    (rev, dirty) = git_state()
+    entry = {'time': time.time(), 'commit': rev, 'dirty': dirty, 'python': sys.version.split()[0],
+             'repeat': repeat, 'results': b.results, 'outputs': b.outputs}
+    runs = []
+    if os.path.exists(history):
+        with open(history) as f:
+            runs = json.load(f)
+    ref = find_reference(runs, reference)
+    if reference is not None and ref is None:
+        print("no run of %s in %s" % (reference, history), file=sys.stderr)
+        return 2
+    changed = []
+    if ref is not None:
+        print("comparing with the run of %s (%s)" % (ref['commit'], time.ctime(ref['time'])), file=sys.stderr)
+        changed = sorted(k for k in b.outputs if k in ref['outputs'] and ref['outputs'][k] != b.outputs[k])
+    if set_reference or not runs:
+        for r in runs:
+            r.pop('reference', None)
+        entry['reference'] = True
+    runs.append(entry)
+    with open(history, "w") as f:
+        json.dump(runs, f, indent=1, sort_keys=True)
+    for k in changed:
+        print("output changed: %s" % k, file=sys.stderr)
+    return 1 if changed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+#!python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import os
+import random
+import bch
+import pytest
+
+POLYS=[(1207,31),(1897,31),(3545,31),(29,6)]
+
+def randoms(n,nbits,seed=1):
+    r=random.Random(seed)
+    return [r.getrandbits(nbits) for _ in range(n)]
+
+@pytest.mark.parametrize("poly,nbits", POLYS)
+def test_syndrome_tables(poly,nbits):
+    for num in randoms(200,nbits)+[0,1,(1<<nbits)-1]:
+        assert bch.syndrome(poly,num,nbits)==bch.nndivide(poly,num)
+
+@pytest.mark.parametrize("poly,nbits", POLYS)
+def test_syndrome_wider(poly,nbits):
+    for num in randoms(50,nbits+13,seed=2):
+        assert bch.syndrome(poly,num,nbits)==bch.nndivide(poly,num)
+
+@pytest.mark.parametrize("poly,nbits", POLYS)
+def test_syndromes(poly,nbits):
+    nums=randoms(100,nbits,seed=3)
+    assert bch.syndromes(poly,nums,nbits)==[bch.nndivide(poly,n) for n in nums]
+
+@pytest.mark.parametrize("poly,nbits", POLYS)
+def test_nnrepair(poly,nbits):
+    # codewords with 0, 1, 2 and 3 flipped bits, checked against brute force
+    r=random.Random(4)
+    plen=poly.bit_length()-1
+    for _ in range(100):
+        data=r.getrandbits(nbits-plen)
+        code=(data<<plen)|bch.nndivide(poly,data<<plen)
+        for nerr in range(4):
+            num=code
+            for b in r.sample(range(nbits),nerr):
+                num^=1<<b
+            assert bch.nnrepair(poly,num,nbits)==bch.nnrepair_brute(poly,num,nbits)
+
+def test_cache():
+    c=bch.SyndromeCache()
+    nums=randoms(20,31,seed=5)
+    c.add(1207,nums[:10],31)
+    for num in nums:
+        assert c.syndrome(1207,num,31)==bch.nndivide(1207,num)
+        assert c.repair(1207,num,31)==bch.nnrepair(1207,num,31)
+        assert c.bch_repair(1207,num,31)==bch.nbch_repair(1207,num,31)
+
+def test_table_file(tmpdir):
+    fname=str(tmpdir.join("bch.tables"))
+    saved=dict(bch._etables)
+    try:
+        bch._etables.clear()
+        bch.set_table_file(fname)
+        tbl=bch.error_table(1897,31)
+        bch._save_tables()
+        assert os.listdir(str(tmpdir))==["bch.tables"]
+
+        bch._etables.clear()
+        bch.set_table_file(fname)
+        assert bch.error_table(1897,31)==tbl
+
+        with open(fname,"wb") as f: # broken cache just gets rebuilt
+            f.write(b"garbage")
+        bch._etables.clear()
+        bch.set_table_file(fname)
+        assert bch.error_table(1897,31)==tbl
+    finally:
+        bch.set_table_file(None)
+        bch._dirty=False
+        bch._etables.clear()
+        bch._etables.update(saved)
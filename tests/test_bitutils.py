@@ -0,0 +1,136 @@
+#!python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import re
+import random
+import datetime
+import bitutils
+import pytest
+
+# the regex Message.__init__ compiled for every line before tokenize_line()
+OLD_RE=r'(RAW|RWA): ([^ ]*) ([\d.]+) (\d+) A:(\w+) [IL]:(\w+) +(\d+)% ([\d.]+|inf|nan) +(\d+) ([\[\]<> 01]+)(.*)'
+
+def old_split(line):
+    m=re.compile(OLD_RE).match(line)
+    return m.groups() if m else None
+
+def corpus():
+    res=[]
+    for name in ("../output01.bits","../output02.bits","../output03.bits","../output04.bits"):
+        with open(name) as f:
+            res.extend(line.rstrip("\n") for line in f)
+    return res
+
+LINES=corpus()
+GOOD=LINES[0]
+
+ODD=[
+    "",
+    "RAW:",
+    "RAW: i-1603705048-t1",
+    GOOD+" ",                                # trailing space
+    GOOD+"\n",
+    " "+GOOD,                                # leading space
+    GOOD.replace(" ","\t",1),
+    GOOD.replace(" ","  ",1),
+    GOOD.replace("RAW:","RWA:"),
+    GOOD.replace("RAW:","RAX:"),
+    GOOD.replace("A:OK","A:no"),
+    GOOD.replace("I:","L:"),
+    GOOD.replace("I:","X:"),
+    GOOD.replace("I:","I:_"),                # \w but not alnum
+    GOOD+" ERR:crap",                        # extra data
+    GOOD+"x",
+    GOOD+" [01]<10>",                        # symbol markers
+    "RAW: i-1603705048-t1 000002364.7809 1626586496 A:OK I:00000000020  89%   inf 62 0101",
+    "RAW: i-1603705048-t1 000002364.7809 1626586496 A:OK I:00000000020  89%   nan 62 0101",
+    "RAW: i-1603705048-t1 000002364.7809 1626586496 A:OK I:00000000020 89% 0.001 62 0101",
+    "RAW: i-1603705048-t1 000002364.7809 1626586496 A:OK I:00000000020 89%  0.001  62 0101",
+    "RAW: i-1603705048-t1 2364 1626586496 A:OK I:00000000020  89%   0.001 62 0101",
+    "RAW: i-1603705048-t1 1.2.3 1626586496 A:OK I:00000000020  89%   0.001 62 0101",
+    "RAW: i-1603705048-t1 .5 -1626586496 A:OK I:00000000020  89%   0.001 62 0101",
+    "RAW: i-1603705048-t1 000002364.7809 1626586496 A:OK I:00000000020  89   0.001 62 0101",
+    "RAW: i-1603705048-t1 000002364.7809 1626586496 A:OK I:00000000020  89%   0.001 62",
+    "RAW: i-1603705048-t1 000002364.7809 1626586496 A:OK I:00000000020  89%   0.001 62 ",
+    "RAW: /dev/stdin 000002364.7809 1626586496 A:OK I:00000000020  89%   0.001 62 0101",
+    "RAW:  000002364.7809 1626586496 A:OK I:00000000020  89%   0.001 62 0101", # empty name
+    u"RAW: i-1603705048-t1 000002364.7809 1626586496 A:OK I:00000000020  ٨٩%   0.001 62 0101",
+    u"RAW: i-1603705048-t1 000002364.7809 1626586496 A:OK I:00000000020  89%   0.001 62 01ä01",
+]
+
+def test_corpus():
+    for line in LINES:
+        assert bitutils.tokenize_line(line)==old_split(line)
+
+def test_fast_path(monkeypatch):
+    # well-formed lines are split without the regex
+    good=[(line,old_split(line)) for line in LINES if old_split(line)]
+    assert len(good)>4000
+    monkeypatch.setattr(bitutils,"line_re",None)
+    for (line,fields) in good:
+        assert bitutils.tokenize_line(line)==fields
+
+@pytest.mark.parametrize("line", ODD)
+def test_odd(line):
+    assert bitutils.tokenize_line(line)==old_split(line)
+
+def test_mutated():
+    r=random.Random(1)
+    chars=" \t01.:%[]<>-_xAIL9"
+    for _ in range(20000):
+        line=list(r.choice(LINES))
+        for _ in range(r.randrange(1,4)):
+            pos=r.randrange(len(line))
+            op=r.randrange(3)
+            if op==0:
+                line[pos]=r.choice(chars)
+            elif op==1:
+                line.insert(pos,r.choice(chars))
+            else:
+                del line[pos]
+        line="".join(line)
+        assert bitutils.tokenize_line(line)==old_split(line)
+
+def old_timestamp(filename, dt):
+    # extract_timestamp() before filename_start()
+    mm=re.match(r"i-(\d+(?:\.\d+)?)-[vbsrtl]1.([a-z])([a-z])", filename)
+    if mm:
+        b26=(ord(mm.group(2))-ord('a'))*26+ord(mm.group(3))-ord('a')
+        return float(mm.group(1))+float(dt)/1000+b26*600
+    mm=re.match(r"i-(\d+(?:\.\d+)?)-[vbsrtl]1(?:-o[+-]\d+)?$", filename)
+    if mm:
+        return float(mm.group(1))+float(dt)/1000
+    mm=re.match(r"(\d\d)-(\d\d)-(20\d\d)T(\d\d)-(\d\d)-(\d\d)-[sr]1", filename)
+    if mm:
+        month,day,year,hour,minute,second=map(int,mm.groups())
+        timestamp=datetime.datetime(year,month,day,hour,minute,second)
+        return (timestamp-datetime.datetime(1970,1,1)).total_seconds()+float(dt)/1000
+    return 0
+
+NAMES=["i-1603705048-t1","i-1603705048.25-v1","i-1603705048-t1-o+5","i-1603705048-r1-o-12",
+    "i-1603705048-t1.ab","i-1603705048-s1.zz","j-1603705048-t1.ab","i-1603705048-t1.a",
+    "10-26-2020T09-37-28-s1","10-26-2020T09-37-28-r1.cf32","10-26-1999T09-37-28-s1",
+    "-","/dev/stdin","","x"]
+
+@pytest.mark.parametrize("name", NAMES)
+def test_extract_timestamp(name):
+    for dt in ("0","000002364.7809","86400000"):
+        assert bitutils.extract_timestamp(name,dt)==old_timestamp(name,dt)
+
+def test_filename_start():
+    assert bitutils.filename_start("i-1603705048-t1.ab")==(1603705048.0,1)
+    assert bitutils.filename_start("i-1603705048.5-t1")==(1603705048.5,None)
+    assert bitutils.filename_start("10-26-2020T09-37-28-s1")==(1603705048.0,None)
+    assert bitutils.filename_start("capture.bits") is None
+
+def test_filename_cache():
+    bitutils.filename_start.cache_clear()
+    for _ in range(1000):
+        bitutils.extract_timestamp("i-1603705048-t1","000002364.7809")
+    bitutils.extract_timestamp("i-1603705049-t1","0")
+    info=bitutils.filename_start.cache_info()
+    assert (info.hits,info.misses,info.currsize)==(999,2,2)
+    for n in range(info.maxsize+10):  # bounded, the oldest names drop out
+        bitutils.filename_start("i-%d-t1"%n)
+    assert bitutils.filename_start.cache_info().currsize==info.maxsize
@@ -0,0 +1,106 @@
+#!python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import pytest
+np=pytest.importorskip("numpy")
+import parser
+import columnar
+
+def frames():
+    res=[]
+    for corpus in ("../output01.bits","../voice.bits"):
+        with open(corpus) as f:
+            for (n,line) in enumerate(f):
+                q=parser.Message(line.strip(),n+1).upgrade()
+                if not q.error:
+                    res.append(q)
+    return res
+
+FRAMES=frames()
+
+def ra_frame(n):
+    # the captures above have no IRA frames
+    q=parser.IridiumRAMessage.__new__(parser.IridiumRAMessage)
+    q.__dict__=dict(globaltime=1603705048.5+n,frequency=1626270833+n,confidence=90,level=-20.5,
+        uplink=0,lineno=n,ra_sat=n%66,ra_cell=n%48,ra_pos_x=-2004,ra_pos_y=n,ra_pos_z=7000,
+        ra_lat=-12.25,ra_lon=n*0.5,ra_alt=790.0,ra_int=90,ra_ts=1,ra_eip=0,ra_bc_sb=7,page_len=None)
+    return q
+
+def expected(qs):
+    # {class: {column: [values]}} of the frames, as frame_row() stores them
+    res={}
+    for q in qs:
+        (name,row)=columnar.frame_row(q)
+        cols=res.setdefault(name,dict((c[0],[]) for c in columnar.column_spec(name)))
+        for (c,v) in zip(columnar.column_spec(name),row):
+            cols[c[0]].append(v)
+    return res
+
+def check(name,cols,got):
+    for c in columnar.column_spec(name):
+        shape=c[2] if len(c)>2 else ()
+        want=np.array(cols[c[0]],dtype=c[1]).reshape((-1,)+shape)
+        assert got[c[0]].dtype==want.dtype and got[c[0]].shape==want.shape
+        np.testing.assert_array_equal(got[c[0]],want)
+
+@pytest.mark.parametrize("chunk_rows", [1<<16, 7])
+def test_roundtrip(tmpdir,chunk_rows):
+    path=str(tmpdir.join("parsed.col"))
+    qs=FRAMES+[ra_frame(n) for n in range(20)]
+    w=columnar.ColumnarWriter(path,chunk_rows)
+    for q in qs:
+        w.add(q)
+    w.close()
+
+    r=columnar.ColumnarReader(path)
+    exp=expected(qs)
+    assert r.types()==sorted(exp)
+    for name in exp:
+        n=len(exp[name]["globaltime"])
+        assert r.rows(name)==n
+        assert r.columns(name)==[c[0] for c in columnar.column_spec(name)]
+        assert r.meta['types'][name]['chunks']==[chunk_rows]*(n//chunk_rows)+([n%chunk_rows] if n%chunk_rows else [])
+        parts=list(r.chunks(name))
+        for p in parts:
+            assert all(isinstance(a,np.memmap) for a in p.values())
+        check(name,exp[name],dict((c,np.concatenate([p[c] for p in parts])) for c in parts[0]))
+        got=r.load(name)
+        check(name,exp[name],got)
+        assert all(isinstance(a,np.memmap) for a in got.values())==(len(parts)==1)
+    ra=r.load("IridiumRAMessage",["ra_sat","page_len","ra_lon"])
+    assert sorted(ra)==["page_len","ra_lon","ra_sat"]
+    assert list(ra["page_len"])==[-1]*20 # missing values
+    assert list(ra["ra_lon"])==[n*0.5 for n in range(20)]
+
+def test_empty_class(tmpdir):
+    path=str(tmpdir.join("parsed.col"))
+    w=columnar.ColumnarWriter(path)
+    for q in FRAMES:
+        w.add(q)
+    w.close()
+    r=columnar.ColumnarReader(path)
+    assert "IridiumRAMessage" not in r.types()
+    assert r.rows("IridiumRAMessage")==0
+    assert list(r.chunks("IridiumRAMessage"))==[]
+    ra=r.load("IridiumRAMessage",["globaltime","ra_lat","uplink"])
+    assert [(c,ra[c].dtype,len(ra[c])) for c in sorted(ra)]==[
+        ("globaltime",np.dtype('f8'),0),("ra_lat",np.dtype('f8'),0),("uplink",np.dtype('i1'),0)]
+    lcw=r.load("IridiumLCWMessage",["data"])
+    assert lcw["data"].shape[1:]==(20,)
+    assert r.load("IridiumRAMessage")=={}
+
+def test_no_frames(tmpdir):
+    path=str(tmpdir.join("parsed.col"))
+    columnar.ColumnarWriter(path).close()
+    r=columnar.ColumnarReader(path)
+    assert r.types()==[]
+    assert len(r.load("IridiumVOMessage",["globaltime"])["globaltime"])==0
+
+def test_version(tmpdir):
+    path=str(tmpdir.join("parsed.col"))
+    columnar.ColumnarWriter(path).close()
+    with open(str(tmpdir.join("parsed.col","meta.json")),"w") as f:
+        f.write('{"version": 0, "types": {}}')
+    with pytest.raises(ValueError):
+        columnar.ColumnarReader(path)
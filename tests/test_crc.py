@@ -0,0 +1,66 @@
+#!python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import random
+import crc
+import pytest
+
+def bitwise(width, poly, init, reflect, xorout, data):
+    # one bit at a time, straight from the definition
+    mask=(1<<width)-1
+    r=init
+    for b in bytearray(data):
+        if reflect:
+            b=int("{0:08b}".format(b)[::-1],2)
+        for i in range(7,-1,-1):
+            top=((r>>(width-1))^(b>>i))&1
+            r=(r<<1)&mask
+            if top:
+                r^=poly
+    if reflect:
+        r=int("{0:0{1}b}".format(r,width)[::-1],2)
+    return r^xorout
+
+# (width, poly, init, reflect, xorout, check value of "123456789")
+CATALOG=[
+    (16,0x1021,0xffff,False,0,0x29B1),                 # CRC-16/CCITT-FALSE
+    (16,0x8005,0,True,0,0xBB3D),                       # CRC-16/ARC
+    (24,0x864CFB,0xB704CE,False,0,0x21CF02),           # CRC-24/OPENPGP
+    (32,0x04C11DB7,0xffffffff,True,0xffffffff,0xCBF43926), # CRC-32
+    (64,0x42F0E1EBA9EA3693,(1<<64)-1,True,(1<<64)-1,0x995DC9BBDF1939FA), # CRC-64/XZ
+]
+
+def payloads(seed=1):
+    r=random.Random(seed)
+    return [bytes(bytearray(r.getrandbits(8) for _ in range(n))) for n in list(range(20))+[31,64,100]*3]
+
+@pytest.mark.parametrize("width,poly,init,reflect,xorout,check", CATALOG)
+def test_check(width,poly,init,reflect,xorout,check):
+    assert crc.Crc(width,poly,init,reflect,xorout)(b"123456789")==check
+
+@pytest.mark.parametrize("width,poly,init,reflect,xorout,check", CATALOG)
+def test_tables(width,poly,init,reflect,xorout,check):
+    c=crc.Crc(width,poly,init,reflect,xorout)
+    for p in payloads():
+        assert c(p)==bitwise(width,poly,init,reflect,xorout,p)
+        assert c(bytearray(p))==c(memoryview(p))==c(p)
+
+@pytest.mark.parametrize("c,args", [
+    (crc.iip_crc24,(24,0xBBA1B5,0xffffff,True,0x0c91b6)),
+    (crc.ida_crc16,(16,0x1021,0xffff,False,0)),
+])
+def test_iridium(c,args):
+    for p in payloads(2):
+        assert c(p)==bitwise(*(args+(p,)))
+
+def test_update():
+    c=crc.iip_crc24
+    p=payloads(3)[-1]
+    assert c.update(c.update(c.init,p[:13]),p[13:])^c.xorout==c(p)
+
+@pytest.mark.parametrize("c", [crc.iip_crc24, crc.ida_crc16])
+def test_batch(c):
+    pytest.importorskip("numpy")
+    p=payloads(4)
+    assert c.batch(p)==[c(x) for x in p]
@@ -0,0 +1,77 @@
+#!python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import os
+import parser
+import framestore
+import pytest
+
+def frames():
+    res=[]
+    for corpus in ("../output01.bits","../voice.bits"):
+        with open(corpus) as f:
+            for (n,line) in enumerate(f):
+                res.append(parser.Message(line.strip(),n+1).upgrade())
+    return res
+
+FRAMES=frames()
+
+def test_schema():
+    for name in framestore.CLASSES:
+        cls=getattr(parser,name)
+        parent=framestore.FIELDS[name][0]
+        assert cls.__bases__[0].__name__==(parent or "object")
+
+def test_values():
+    # field types the captures above don't have
+    q=parser.IridiumMessage.__new__(parser.IridiumMessage)
+    q.__dict__=dict(error=False,error_msg=[],globaltime=1598047209.5,frequency=1626270833,
+        header=parser.BitStream(5,3),descrambled=[parser.BitStream(1,1),parser.BitStream(0,64)],
+        descramble_extra="",page_len=None,ra_lat=-12.25,ra_msg=True,ra_pos_x=-2004,
+        paging=[dict(tmsi=4294967295,msc_id=3,raw=parser.BitStream(7,42),str="x"),{}],
+        payload_f=[1,-1,1<<40],payload_r=[],rs6c=bytearray(b"ab"),zero1=parser.BitStream())
+    (name,d)=framestore.decode(framestore.encode(q)[2])
+    assert name=="IridiumMessage"
+    assert d==q.__dict__
+
+def test_roundtrip():
+    for q in FRAMES:
+        (name,globaltime,payload)=framestore.encode(q)
+        assert name==type(q).__name__
+        (name2,d)=framestore.decode(payload)
+        assert name2==name
+        assert d==q.__dict__
+
+def test_unknown_field():
+    q=parser.Message(open("../output01.bits").readline().strip(),1).upgrade()
+    q.not_in_schema=1
+    with pytest.raises(ValueError):
+        framestore.encode(q)
+
+def entries(names,index): # NaN times as None, class names instead of numbers
+    return [(e[0] if e[0]==e[0] else None,e[1],e[2],names[e[3]]) for e in index]
+
+def test_store(tmpdir):
+    fname=str(tmpdir.join("frames.store"))
+    w=framestore.StoreWriter(fname)
+    for q in FRAMES:
+        w.add(q)
+    w.close()
+
+    s=framestore.FrameStore(fname)
+    assert len(s)==len(FRAMES)
+    replayed=list(s.frames(vars(parser)))
+    assert [q.pretty() for q in replayed]==[q.pretty() for q in FRAMES]
+
+    times=sorted(q.globaltime for q in FRAMES if "globaltime" in q.__dict__)
+    (start,end)=(times[len(times)//4],times[len(times)//2])
+    sel=s.select(['IridiumVOMessage'],start,end)
+    assert sel==[i for i in range(len(FRAMES)) if type(FRAMES[i]).__name__=='IridiumVOMessage' and start<=FRAMES[i].__dict__.get("globaltime",-1)<end]
+    (names,index)=(s.names,s.index)
+    s.close()
+
+    os.unlink(fname+".idx") # rebuilt from the records
+    s=framestore.FrameStore(fname)
+    assert entries(s.names,s.index)==entries(names,index)
+    s.close()
@@ -4,6 +4,7 @@
 from __future__ import print_function
 import sys
 import glob
+import random
 import parser
 import pytest
 from mock import patch
@@ -58,6 +59,53 @@ def do_test_frame(bits):
             else:
                 return p.pretty()
 
+FORMAT_LINE="1603705113.238834 ['0011000000010100000000011001111', '0000011000000000011100100111010', '0000000100111111000001111011001', '0001000010010000000010011000110', '0101111001111111011101101111010', '0100000001000011010010010011100', '0000001110000000000010000000110', '0000000000000000000000000000000', '0001110111111000010110101100111', '0100111001000000000001001111101']"
+
+def test_format_lists():
+    # --format prints bit fields, also inside lists, like the '0'/'1' strings they were
+    lines=[]
+    with open("../output01.bits") as f:
+        for (n,line) in enumerate(f):
+            q=parser.Message(line.strip(),n+1).upgrade()
+            if not q.error and "descrambled" in q.__dict__:
+                lines.append(parser.frame_line(q,["globaltime","descrambled","header"]))
+    assert lines
+    assert not [l for l in lines if "BitStream" in l]
+    assert [l for l in lines if l.startswith("1603705113.238834 ")][0].startswith(FORMAT_LINE+" ")
+
+@pytest.mark.parametrize("kind,n,lengths", [
+    (2,64,(32,32)), (3,96,(32,32,32)), ('lcw',46,(7,13,26)), (3,96,(80,16)), (2,124,(62,62))])
+def test_split_batch(kind,n,lengths):
+    pytest.importorskip("numpy")
+    r=random.Random(n)
+    perm=parser.interleaver(kind,n)
+    values=[0,(1<<n)-1]+[r.getrandbits(n) for _ in range(500)]
+    assert perm.split_batch(values,lengths)==[list(perm.split(parser.BitStream(v,n),lengths)) for v in values]
+
+def test_predeinterleave():
+    # --batch decodes like one frame at a time
+    pytest.importorskip("numpy")
+    for corpus in ("../output01.bits","../output02.bits","../output03.bits","../output04.bits"):
+        with open(corpus) as f:
+            lines=[line.strip() for line in f]
+        msgs=[parser.Message(line,n+1) for (n,line) in enumerate(lines)]
+        parser.syndrome_cache.clear()
+        pres=parser.predeinterleave(msgs)
+        assert len([pre for pre in pres if pre])>len(lines)//4
+        for (q,pre) in zip(msgs,pres):
+            if not pre:
+                continue
+            data=q.bitstream_raw[len(parser.iridium_access):]
+            assert list(pre['lcw'])==list(parser.de_interleave_lcw(data[:46]))
+            if 'bc' in pre:
+                assert list(pre['bc'])==list(parser.de_interleave(data[6:70]))
+            if 'ra' in pre:
+                assert list(pre['ra'])==list(parser.de_interleave3(data[:96]))
+        batched=[q.upgrade(pre).pretty() for (q,pre) in zip(msgs,pres)]
+        parser.syndrome_cache.clear()
+        single=[parser.Message(line,n+1).upgrade().pretty() for (n,line) in enumerate(lines)]
+        assert batched==single
+
 def bits_to_line(bits):
     bits=bits.replace(" ","")
     syms=(len(bits)-len(parser.iridium_access))/2
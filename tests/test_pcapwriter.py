@@ -0,0 +1,126 @@
+#!python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import io
+import os
+import struct
+import pcapwriter
+import pytest
+
+def blocks(data):
+    # (type, body) of each pcapng block, checking both length fields
+    res=[]
+    pos=0
+    while pos<len(data):
+        (typ,n)=struct.unpack_from("<LL",data,pos)
+        assert n%4==0 and n>=12
+        assert struct.unpack_from("<L",data,pos+n-4)[0]==n
+        res.append((typ,data[pos+8:pos+n-4]))
+        pos+=n
+    assert pos==len(data)
+    return res
+
+def options(body):
+    res={}
+    pos=0
+    while pos<len(body):
+        (code,n)=struct.unpack_from("<HH",body,pos)
+        if code==0:
+            break
+        res[code]=body[pos+4:pos+4+n]
+        pos+=4+n+(-n%4)
+    return res
+
+def records(data):  # (sec, usec, payload) of a classic pcap file
+    assert struct.unpack_from("<LHHlLLL",data,0)==(0xa1b2c3d4,2,4,0,0,0xffff,1)
+    res=[]
+    pos=24
+    while pos<len(data):
+        (sec,usec,caplen,length)=struct.unpack_from("<IIII",data,pos)
+        assert caplen==length
+        res.append((sec,usec,data[pos+16:pos+16+caplen]))
+        pos+=16+caplen
+    return res
+
+@pytest.mark.parametrize("name,n,expected", [
+    ("out.pcap",1,"out-1.pcap"),
+    ("out.pcapng.gz",2,"out-2.pcapng.gz"),
+    ("dir.x/out",3,"dir.x/out-3"),
+    ("a.b.pcap.xz",4,"a.b-4.pcap.xz"),
+])
+def test_rotated_name(name,n,expected):
+    assert pcapwriter.rotated_name(name,n)==expected
+
+def test_parse_size():
+    assert pcapwriter.parse_size("100")==100
+    assert pcapwriter.parse_size("2k")==2048
+    assert pcapwriter.parse_size("100M")==100<<20
+    with pytest.raises(ValueError):
+        pcapwriter.parse_size("1.5G")
+
+def test_pcap():
+    f=io.BytesIO()
+    w=pcapwriter.PcapWriter(f,bufsize=64)
+    w.write(1600000000.25,b"abc")
+    w.write(1600000001.5,b"x"*100,"UL")
+    w.close()
+    assert records(f.getvalue())==[(1600000000,250000,b"abc"),(1600000001,500000,b"x"*100)]
+
+def test_pcapng():
+    f=io.BytesIO()
+    w=pcapwriter.PcapngWriter(f,linktype=228)
+    for (t,data,iface) in ((1.5,b"a","DL"),(2.0,b"bcdef","UL"),(2.25,b"",None),(3.0,b"abcd","DL")):
+        w.write(1600000000+t,data,iface)
+    w.close()
+    b=blocks(f.getvalue())
+    assert [typ for (typ,_) in b]==[0x0a0d0d0a,1,6,1,6,1,6,6]
+    assert struct.unpack_from("<LHHq",b[0][1])==(0x1a2b3c4d,1,0,-1)
+    idbs=[body for (typ,body) in b if typ==1]
+    for body in idbs:
+        assert struct.unpack_from("<HHL",body)==(228,0,0xffff)
+        assert options(body[8:])[9]==b"\x09"
+    assert [options(body[8:]).get(2) for body in idbs]==[b"DL",b"UL",None]
+    epbs=[struct.unpack_from("<LLLLL",body)+(body[20:],) for (typ,body) in b if typ==6]
+    for (iface,hi,lo,caplen,length,data) in epbs:
+        assert caplen==length and len(data)==caplen+(-caplen%4)
+    assert [(iface,data[:caplen]) for (iface,_,_,caplen,_,data) in epbs]==[(0,b"a"),(1,b"bcdef"),(2,b""),(0,b"abcd")]
+    (iface,hi,lo)=epbs[1][:3]
+    assert (hi<<32)|lo==1600000002000000000
+
+def test_rotate_size(tmpdir):
+    name=str(tmpdir.join("out.pcap"))
+    with open(name,"wb") as f:
+        w=pcapwriter.PcapWriter(f,name,rotate_size=24+3*(16+10))
+        for i in range(10):
+            w.write(1600000000+i,b"%010d"%i)
+        w.close()
+        assert not f.closed # the caller's
+    names=[name]+[pcapwriter.rotated_name(name,n) for n in (1,2,3)]
+    assert sorted(os.listdir(str(tmpdir)))==sorted(os.path.basename(n) for n in names)
+    got=[]
+    for n in names:
+        with open(n,"rb") as g:
+            data=g.read()
+        assert len(data)<=24+3*(16+10)
+        got.extend(int(p) for (_,_,p) in records(data))
+    assert got==list(range(10))
+
+def test_rotate_time(tmpdir):
+    name=str(tmpdir.join("out.pcapng"))
+    with open(name,"wb") as f:
+        w=pcapwriter.PcapngWriter(f,name,rotate_time=60)
+        for t in (0,10,59,60,61,200,201):
+            w.write(1600000000+t,b"x","DL" if t%2 else "UL")
+        w.close()
+    counts=[]
+    for n in [name]+[pcapwriter.rotated_name(name,n) for n in (1,2)]:
+        with open(n,"rb") as g:
+            b=blocks(g.read())
+        assert b[0][0]==0x0a0d0d0a # every file is a complete section with its own IDBs
+        idbs=[body for (typ,body) in b if typ==1]
+        ifaces=set(struct.unpack_from("<L",body)[0] for (typ,body) in b if typ==6)
+        assert ifaces==set(range(len(idbs)))
+        counts.append(len([typ for (typ,_) in b if typ==6]))
+    assert counts==[3,2,2]
+    assert not os.path.exists(pcapwriter.rotated_name(name,3))
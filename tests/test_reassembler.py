@@ -0,0 +1,212 @@
+#!python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import math
+import random
+import parser
+import reassembler
+import pytest
+
+def fragment(time, freq, ctr, cont, data, ul, level=-30.0):
+    m=reassembler.MyObject()
+    (m.time,m.frequency,m.ctr,m.cont,m.data,m.ul,m.level)=(time,freq,ctr,cont,data,ul,level)
+    return m
+
+def sessions(seed, n, shuffle=0):
+    # n interleaved IDA sessions of 1-9 fragments each, some of them close
+    # in frequency, some with a lost fragment, in time order (moved up to
+    # shuffle places)
+    r=random.Random(seed)
+    frags=[]
+    for s in range(n):
+        freq=1626000000+r.choice([r.randrange(0,2000000),r.randrange(0,1200)])
+        t=r.uniform(0,n*20)
+        ul=r.random()<0.5
+        count=r.randrange(1,10)
+        lost=r.randrange(count) if r.random()<0.1 else None
+        for i in range(count):
+            if i!=lost:
+                frags.append(fragment(t,freq+r.randrange(-100,100),i%8,i<count-1,"%d/%d;"%(s,i),ul))
+            t+=r.uniform(5,275)
+    frags.sort(key=lambda m: m.time)
+    for i in range(len(frags)-shuffle):
+        j=i+r.randrange(shuffle+1)
+        (frags[i],frags[j])=(frags[j],frags[i])
+    return frags
+
+def linear(frags):
+    # the list scan ReassembleIDA.process did before the index
+    buf=[]
+    res=[]
+    for m in frags:
+        ok=False
+        for (idx,(freq,time,ctr,dat,cont,ul)) in enumerate(buf[:]):
+            if (freq-260)<m.frequency<(freq+260) and time[-1]<=m.time<=(time[-1]+280) and (ctr+1)%8==m.ctr and ul==m.ul:
+                del buf[idx]
+                dat=dat+m.data
+                time.append(m.time)
+                if m.cont:
+                    buf.append([m.frequency,time,m.ctr,dat,m.cont,m.ul])
+                else:
+                    res.append([dat,m.time,ul,m.level,freq])
+                ok=True
+                break
+        if ok:
+            pass
+        elif m.ctr==0 and not m.cont:
+            res.append([m.data,m.time,m.ul,m.level,m.frequency])
+        elif m.ctr==0 and m.cont:
+            buf.append([m.frequency,[m.time],m.ctr,m.data,m.cont,m.ul])
+        for (idx,(freq,time,ctr,dat,cont,ul)) in enumerate(buf[:]):
+            if time[-1]+1000<=m.time:
+                del buf[idx]
+                break
+    return res
+
+def indexed(frags):
+    r=reassembler.ReassembleIDA()
+    res=[]
+    for m in frags:
+        res.extend(r.process(m) or [])
+    return (r,res)
+
+@pytest.mark.parametrize("seed,n,shuffle", [(1,50,0),(2,300,0),(3,300,3),(4,1000,0)])
+def test_ida_index(seed,n,shuffle):
+    frags=sessions(seed,n,shuffle)
+    (r,res)=indexed(frags)
+    assert res==linear(frags)
+    assert len(res)>n//2
+
+def test_ida_expiry():
+    r=reassembler.ReassembleIDA()
+    r.process(fragment(0,1626000000,0,True,"a",False))
+    r.process(fragment(100,1626100000,0,True,"b",False))
+    assert len(r.buf)==2
+    r.process(fragment(1050,1626200000,0,True,"c",False)) # drops "a" only
+    assert sorted(e[3] for e in r.buf.values())==["b","c"]
+    assert r.stat_broken==1
+    assert r.process(fragment(1100,1626000000,1,False,"x",False)) is None # "a" is gone
+    assert r.process(fragment(1120,1626200050,1,False,"d",False))==[["cd",1120,False,-30.0,1626200000]]
+
+def test_dedupe():
+    d=reassembler.Dedupe(1,200)
+    assert not d.dupe(10.0,"a",1626000000)
+    assert d.dupe(10.5,"a",1626000150)      # repeat
+    assert not d.dupe(10.5,"a",1626000300)  # other frequency
+    assert not d.dupe(10.6,"b",1626000000)  # other key
+    assert d.dupe(11.0,"a",1626000000)      # exactly window apart
+    assert (d.hits,d.lookups)==(2,5)
+
+def test_dedupe_expiry():
+    d=reassembler.Dedupe(1,200)
+    for i in range(100):
+        assert not d.dupe(i*0.1,"k%d"%i,1626000000)
+    assert len(d.order)==11 and len(d.seen)==11 # the last window only
+    assert not d.dupe(20.0,"k99",1626000000)
+    assert list(d.order)==[(20.0,"k99")] and list(d.seen)==["k99"]
+    # only first sightings are kept, repeats don't extend the window
+    assert d.dupe(20.6,"k99",1626000000)
+    assert not d.dupe(21.2,"k99",1626000000)
+
+def test_ida_dupes():
+    r=reassembler.ReassembleIDA()
+    assert r.process(fragment(0,1626000000,0,False,"a",False))==[["a",0,False,-30.0,1626000000]]
+    assert r.process(fragment(0.2,1626000100,0,False,"a",False)) is None
+    assert r.process(fragment(0.2,1626000100,0,False,"a",True))==[["a",0.2,True,-30.0,1626000100]]
+    assert r.process(fragment(1.5,1626000000,0,False,"a",False))==[["a",1.5,False,-30.0,1626000000]]
+    assert r.stat_dupes==1
+
+def test_end_without_input():
+    for mode in ("ida","idapp","sbd","page","msg"):
+        r=reassembler.reassembler_for(mode)
+        r.run([])
+
+class Failing(reassembler.ReassembleMSG):
+    def end(self):
+        raise ValueError("end failed")
+
+class BrokenFilter(reassembler.ReassembleMSG):
+    types=None
+    def filter_line(self,q):
+        raise ValueError("filter_line failed")
+
+class BrokenProcess(reassembler.ReassembleMSG):
+    types=None
+    def filter_line(self,q):
+        return q
+    def process(self,q):
+        raise ValueError("process failed")
+
+class Ending(reassembler.ReassembleMSG):
+    ended=closed=False
+    def end(self):
+        super(Ending,self).end()
+        self.ended=True
+    def close(self):
+        self.closed=True
+
+class ClosingIDA(reassembler.ReassembleIDA):
+    closed=False
+    def close(self):
+        self.closed=True
+
+@pytest.mark.parametrize("broken", [Failing, BrokenFilter, BrokenProcess])
+def test_fanout_end(broken):
+    # one mode failing, in end() or mid-stream, still closes every output
+    rs=[ClosingIDA(),broken(),Ending(),ClosingIDA()]
+    f=reassembler.Fanout(rs)
+    assert f.reassemblers==rs[:3] and rs[0].followers==(rs[3],)
+    with open("../output01.parsed") as lines:
+        with pytest.raises(ValueError):
+            f.run(lines)
+    assert rs[2].ended==(broken is Failing)
+    assert [r.closed for r in (rs[0],rs[2],rs[3])]==[True,True,True]
+
+# IRA frames with and without pages, and a MSG frame, which the bundled
+# captures do not have
+EXTRA=[
+    "RAW: i-1603705048-t1.ab 0048438.1316 1625645443 A:OK I:00000001265  51% 0.00081 144 001100000011000011110011101110101110010110010111010101100110011011101010011010110001011001001100111100111101010001100001010101110111010010000001001000011000000000001010010100000111011111111111111111111111111111111111111111111111111111111111101111111001011110101101101100110011111001110100001101110010010001100110",
+    "RAW: i-1603705048-t1.ab 0057737.8134 1618419600 A:no I:00000001513  58% inf 208 00110000001100001111001111010000011110111011111001010010101001111101110000001110011110010110001011110010110101110000000010000011010101001101011000011100111110111000100100110100100100111111111111111011111111111111111011111111111111111101111111111111100101111010110110100011011111100111010000110101001001000100011010010111101011011011001100111110001101001011000100100100011001101111100110001100011010000001101101100110101010100000100000111111",
+    "RWA: i-1603705048-t1.ab 0082225.1038 1619737192 A:OK I:00000002166  81% nan 208 11001100001111001111110010100100111000011111111111010001101000000001000001110110001000101001110001110110001110110001100100011111100000110010101000010001010010100111100000110111000100111111111111111111111111111111111110111111101111111111111111111111111011110101110111110011001111011111100000111010000010001001100101101011010110100111001110111101101110000011101000011000100110011111111110001011110010101110111111010111111011100101100000000001",
+    "RAW: 11-06-2020T10-20-30-r1 0004150.2517 1620885733 A:no I:00000000084  91% 0.99838  80 0011000000110000111100111110000000010011100110101111101011101001011101100010110000101000000100011010011011001001101110011000010101101010011001011100011101000100110000110000100001000100",
+    "RAW: foo 0057625.5320 1618962176 A:no I:00000001510  81% inf 144 001100000011000011110011001100111111001100110011111100111100110010100011011001010011110100110101010111110110010010000000100101110100100011010111101101110011101100100011110100010100011011011001110110111011111101011011111011000011110111110001110100110100001011000010010101100101011010010001110001000000111110011011",
+]
+
+def renamed(line, name):
+    p=line.split(" ",2)
+    return " ".join([p[0],name,p[2]])
+
+def frames():
+    with open("../output01.bits") as f:
+        lines=[line.strip() for line in f]+EXTRA
+    lines=lines+[renamed(line,"i-1603705048-t1.ab") for line in lines]+[renamed(line,"j-1603705048-t1") for line in lines]
+    res=[]
+    for (n,line) in enumerate(lines):
+        q=parser.Message(line,n+1).upgrade()
+        if not q.parse_error:  # ERR: lines the text path can't read either
+            res.append(q)
+    return res
+
+FRAMES=frames()
+
+def same(a,b):
+    return a==b or (isinstance(a,float) and isinstance(b,float) and math.isnan(a) and math.isnan(b))
+
+@pytest.mark.parametrize("mode", ["ida","page","msg","stats"])
+def test_filter_frame(mode):
+    # a frame passed in directly gives the record of its -o line output
+    r=reassembler.reassembler_for(mode)
+    found=0
+    for q in FRAMES:
+        s=reassembler.split_line(parser.frame_line(q,None))
+        line=None
+        if r.types is None or s.typ in r.types:
+            line=r.filter_line(s)
+        frame=r.filter_frame(q)
+        assert (line is None)==(frame is None)
+        if frame is not None:
+            found+=1
+            for (k,v) in vars(frame).items():
+                assert same(v,vars(line)[k]),(k,v,vars(line)[k])
+    assert found>=3
@@ -0,0 +1,67 @@
+#!python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+import random
+import rs
+import rs6
+import reedsolo
+import reedsolo6
+import pytest
+
+def reference(m, lib, data):
+    # rs_fix() as it was, straight through reedsolo's rs_correct_msg
+    data=data+([0]*m.elen)
+    r=list(range(len(data)-m.elen,len(data)))
+    try:
+        (cmsg,crs)=lib.rs_correct_msg(data,m.nsym+m.elen,m.fcr,m.generator,erase_pos=r)
+    except lib.ReedSolomonError:
+        return (False,None,None)
+    except ZeroDivisionError:
+        return (False,None,None)
+    return (True,cmsg,crs[:m.nsym])
+
+def codewords(m, lib, seed, errors, count=40):
+    # (message, received symbols with errors at random places)
+    r=random.Random(seed)
+    n=(1<<m.c_exp)-1
+    k=31 if m is rs else 42
+    res=[]
+    for _ in range(count):
+        msg=[r.randint(0,n) for _ in range(k)]
+        data=list(lib.rs_encode_msg(msg,m.nsym+m.elen,fcr=m.fcr))[:k+m.nsym]
+        for pos in r.sample(range(len(data)),errors):
+            data[pos]^=r.randint(1,n)
+        res.append((msg,data))
+    return res
+
+# (module, reedsolo module, errors it can correct next to its erasures)
+CODES=[(rs,reedsolo,rs.nsym//2),(rs6,reedsolo6,rs6.nsym//2)]
+
+@pytest.mark.parametrize("m,lib,t", CODES)
+def test_syndromes(m,lib,t):
+    for (msg,data) in codewords(m,lib,1,0,10)+codewords(m,lib,2,1,10):
+        data=data+([0]*m.elen)
+        synd=lib.rs_calc_syndromes(data,m.nsym+m.elen,m.fcr,m.generator)
+        assert m.syndromes(data)==sum(s<<(8*i) for (i,s) in enumerate(synd[1:]))
+
+@pytest.mark.parametrize("m,lib,t", CODES)
+def test_correctable(m,lib,t):
+    for errors in range(t+1):
+        for (msg,data) in codewords(m,lib,errors,errors):
+            (ok,cmsg,csum)=m.rs_fix(data)
+            assert ok and list(cmsg)==msg
+            assert (ok,cmsg,csum)==reference(m,lib,data)
+
+@pytest.mark.parametrize("m,lib,t", CODES)
+def test_beyond(m,lib,t):
+    res=[]
+    for (msg,data) in codewords(m,lib,100,t+1,100):
+        res.append(m.rs_fix(data))
+        assert res[-1]==reference(m,lib,data)
+    assert len([x for x in res if not x[0]])>len(res)//2
+
+@pytest.mark.parametrize("m,lib,t", CODES)
+def test_batch(m,lib,t):
+    datas=[data for errors in (0,1,t+1) for (_,data) in codewords(m,lib,errors+200,errors,10)]
+    assert m.rs_fix_batch(datas)==[m.rs_fix(data) for data in datas]